@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: domain -> university lookups, linear scan vs. suffix index.
+
+Usage: python benchmarks/bench_domain_index.py [--universities FILE]
+
+Without --universities a synthetic list shaped like the Hipo list
+(~10k universities, 1-3 domains each) is generated.
+"""
+
+import json
+import random
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+# pylint: disable=wrong-import-position
+from domain_index import build_domain_index, lookup_university
+from main import get_university
+
+
+def synthetic_university_list(count, rng):
+    tlds = ["edu", "edu.cn", "ac.uk", "ac.jp", "edu.au", "de", "ac.kr", "edu.tw"]
+    return [
+        {
+            "name": f"University {i}",
+            "domains": [f"u{i}-{j}.{rng.choice(tlds)}" for j in range(rng.randint(1, 3))],
+        }
+        for i in range(count)
+    ]
+
+
+def sample_domains(uni_list, count, rng):
+    """Mix exact, subdomain and non-university domains like a commit stream."""
+    domains = []
+    for _ in range(count):
+        roll = rng.random()
+        university = rng.choice(uni_list)
+        if roll < 0.2:
+            domains.append(rng.choice(university["domains"]))
+        elif roll < 0.4:
+            domains.append(f"mail.cs.{rng.choice(university['domains'])}")
+        else:
+            domains.append(f"corp{rng.randint(0, 500)}.example.com")
+    return domains
+
+
+def old_scan_check(domain, all_domains):
+    """The per-commit check main() used before the index."""
+    if domain in all_domains:
+        return True
+    parts = domain.split(".")
+    parent_domains = [".".join(parts[i:]) for i in range(0, len(parts))]
+    return not all(parent not in all_domains for parent in parent_domains)
+
+
+def timed(label, func, domains):
+    start = time.perf_counter()
+    for domain in domains:
+        func(domain)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {len(domains) / elapsed:>14,.0f} lookups/s")
+    return elapsed
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--universities", type=str, help="university list JSON file")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.universities:
+        uni_list = json.loads(Path(args.universities).read_text(encoding="utf-8"))
+    else:
+        uni_list = synthetic_university_list(10000, rng)
+    domains = sample_domains(uni_list, args.lookups, rng)
+
+    start = time.perf_counter()
+    all_domains = set(d for u in uni_list for d in u["domains"])
+    domain_index = build_domain_index(uni_list)
+    print(f"{len(uni_list)} universities, index built in "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for domain in domains:
+        assert lookup_university(domain, domain_index) is get_university(domain, uni_list)
+
+    print("scan loop check")
+    old = timed("  set + parent list", lambda d: old_scan_check(d, all_domains), domains)
+    new = timed("  suffix index", lambda d: lookup_university(d, domain_index), domains)
+    print(f"  speedup {old / new:.1f}x")
+
+    print("university resolution")
+    old = timed("  get_university()", lambda d: get_university(d, uni_list), domains)
+    new = timed("  lookup_university()", lambda d: lookup_university(d, domain_index), domains)
+    print(f"  speedup {old / new:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: memory and time of the aggregated commits, nested dicts vs. slotted records.
+
+Usage: python benchmarks/bench_model.py [--commits N] [--authors N] [--domains N]
+
+Synthetic university commit records are aggregated twice: into the nested
+[name, count, [dict, ...]] author lists add_commit() used to build, and
+through the current add_commit() into Author/Commit records. For each the
+memory retained after aggregation (tracemalloc), the aggregation time and
+the time to serialize all authors to result.json form are printed.
+"""
+
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+# pylint: disable=wrong-import-position
+from git_log import parse_raw_date
+from model import to_json
+from scan import add_commit, new_results
+
+FIRST_DATE = 1_100_000_000
+TIMEZONES = ("+0800", "-0700", "+0000", "+0900")
+
+
+def synthetic_records(count, authors, domains, seed):
+    """Yield (domain, record) pairs shaped like the scan's, on university domains.
+
+    Records are created as they are consumed, like the parsed `git log`
+    stream, so only what the aggregation keeps stays in memory.
+    """
+    rng = random.Random(seed)
+    people = []
+    for i in range(authors):
+        domain = f"cs.u{rng.randrange(domains)}.edu"
+        people.append((f"Author {i}", f"author{i}@{domain}", domain))
+    for i in range(count):
+        name, email, domain = rng.choice(people)
+        yield domain, {
+            "commit": f"{rng.getrandbits(160):040x}",
+            "name": name,
+            "email": email,
+            "summary": f"subsystem: change {i} of the synthetic history",
+            "date": parse_raw_date(f"{FIRST_DATE + i * 600} {rng.choice(TIMEZONES)}"),
+            "files": rng.randint(1, 8),
+            "insertions": rng.randint(0, 400),
+            "deletions": rng.randint(0, 200),
+        }
+
+
+def legacy_add_commit(results, email_domain, record):
+    """The nested-list aggregation add_commit() performed before the slotted model."""
+    if email_domain not in results["patches"]:
+        results["patches"][email_domain] = 0
+        results["lines"][email_domain] = 0
+        results["authors"][email_domain] = {}
+        results["shas"][email_domain] = []
+    results["patches"][email_domain] += 1
+    results["lines"][email_domain] += record["insertions"] + record["deletions"]
+    results["shas"][email_domain].append(record["commit"])
+    authors = results["authors"][email_domain]
+    if record["email"] not in authors:
+        authors[record["email"]] = [record["name"], 0, []]
+    authors[record["email"]][1] += 1
+    authors[record["email"]][2].append({
+        "commit": record["commit"],
+        "summary": record["summary"],
+        "date": record["date"],
+        "files": record["files"],
+        "lines": f'-{record["deletions"]}/+{record["insertions"]}',
+    })
+
+
+def legacy_authors(authors_map):
+    return [
+        {"email": email, "name": name, "count": count, "commits": commits}
+        for authors in authors_map.values() for email, (name, count, commits) in authors.items()
+    ]
+
+
+def current_authors(authors_map):
+    return [author for authors in authors_map.values() for author in authors.values()]
+
+
+def measure(label, add, list_authors, records):
+    """Aggregate records with add() and print retained bytes and timings.
+
+    The aggregate time includes creating the synthetic records.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = new_results()
+    for domain, record in records:
+        add(results, domain, record)
+    aggregate_seconds = time.perf_counter() - start
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    size = len(json.dumps(list_authors(results["authors"]), ensure_ascii=False,
+                          default=to_json))
+    serialize_seconds = time.perf_counter() - start
+    print(f"{label:<18} {retained / (1 << 20):>9.1f} MiB {aggregate_seconds:>9.2f}s "
+          f"{serialize_seconds:>11.2f}s {size / (1 << 20):>9.1f} MiB")
+    return retained
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--commits", type=int, default=300_000)
+    parser.add_argument("--authors", type=int, default=20_000)
+    parser.add_argument("--domains", type=int, default=800)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    def records():
+        return synthetic_records(args.commits, args.authors, args.domains, args.seed)
+
+    print(f"{args.commits} commits, {args.authors} authors, {args.domains} domains")
+    print(f'{"model":<18} {"retained":>13} {"aggregate":>10} {"serialize":>12} {"json":>13}')
+    legacy = measure("nested dicts", legacy_add_commit, legacy_authors, records())
+    current = measure("slotted records", add_commit, current_authors, records())
+    print(f"memory saved {1 - current / legacy:.0%}")
+
+
+if __name__ == "__main__":
+    main()
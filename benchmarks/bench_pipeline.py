@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark: time every stage of main() on a synthetic git repo.
+
+Usage: python benchmarks/bench_pipeline.py [--commits N] [--extractor log twophase batch gitpython]
+                                           [--detail-format html shared store] [--output FILE]
+
+The repository is built locally with `git fast-import` (no network) from a
+synthetic university list, so university and non-university authors, patch
+sizes and history length can be varied freely. Every extractor/detail-format
+combination runs main() in a scratch output directory, and the per-stage
+timings are written as JSON for tracking regressions between runs.
+"""
+
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from itertools import product
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+# pylint: disable=wrong-import-position
+from bench_domain_index import synthetic_university_list
+from main import main as run_main
+
+FIRST_DATE = 1_600_000_000
+TIMEZONES = ("+0800", "-0700", "+0000", "+0900")
+
+
+def synthetic_authors(count, university_ratio, uni_list, rng):
+    """Return (name, email) pairs, a university_ratio share on university domains."""
+    authors = []
+    for i in range(count):
+        if rng.random() < university_ratio:
+            domain = rng.choice(rng.choice(uni_list)["domains"])
+            if rng.random() < 0.5:
+                domain = f"cs.{domain}"
+        else:
+            domain = f"corp{rng.randint(0, 50)}.example.com"
+        authors.append((f"Author {i}", f"author{i}@{domain}"))
+    return authors
+
+
+def synthetic_file(lines, rng):
+    return "".join(f"line {rng.getrandbits(32):08x}\n" for _ in range(lines)).encode("utf-8")
+
+
+def fast_import_stream(commits, authors, files, files_per_commit, patch_lines, rng):
+    """Yield a `git fast-import` stream of a linear history on master."""
+    for i in range(commits):
+        name, email = rng.choice(authors)
+        date = f"{FIRST_DATE + i * 600} {TIMEZONES[i % len(TIMEZONES)]}"
+        message = f"subsystem: change {i}\n\nSynthetic commit {i}.\n".encode("utf-8")
+        parts = [
+            b"commit refs/heads/master\n",
+            f"mark :{i + 1}\n".encode("utf-8"),
+            f"author {name} <{email}> {date}\n".encode("utf-8"),
+            f"committer {name} <{email}> {date}\n".encode("utf-8"),
+            f"data {len(message)}\n".encode("utf-8"), message,
+        ]
+        if i:
+            parts.append(f"from :{i}\n".encode("utf-8"))
+        for path in rng.sample(files, files_per_commit):
+            content = synthetic_file(patch_lines, rng)
+            parts.append(f"M 100644 inline {path}\ndata {len(content)}\n".encode("utf-8"))
+            parts.append(content)
+        parts.append(b"\n")
+        yield b"".join(parts)
+
+
+def build_repo(path, commits, authors, files_per_commit, patch_lines, rng):
+    """Create a git repository at path with a synthetic master history."""
+    subprocess.run(["git", "init", "-q", "-b", "master", path], check=True)
+    files = [f"drivers/sub{i % 16}/file{i}.c" for i in range(max(64, files_per_commit))]
+    with subprocess.Popen(["git", "-C", path, "fast-import", "--quiet"],
+                          stdin=subprocess.PIPE) as process:
+        for chunk in fast_import_stream(commits, authors, files, files_per_commit,
+                                        patch_lines, rng):
+            process.stdin.write(chunk)
+        process.stdin.close()
+        if process.wait():
+            raise RuntimeError("git fast-import failed")
+    subprocess.run(["git", "-C", path, "checkout", "-q", "master"], check=True)
+
+
+def tree_size(path):
+    """Return (files, bytes) of everything below path."""
+    count = total = 0
+    for root, _, files in os.walk(path):
+        count += len(files)
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return count, total
+
+
+def run_once(repo_path, uni_file, out_dir, extractor, detail_format, jobs):
+    """Run main() in an empty out_dir and return its timings."""
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    cwd = os.getcwd()
+    os.chdir(out_dir)
+    try:
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            stats = run_main([
+                "--path", repo_path, "--university-list", uni_file,
+                "--extractor", extractor, "--detail-format", detail_format,
+                "--jobs", str(jobs),
+            ])
+        total = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+    detail_files, detail_bytes = tree_size(os.path.join(out_dir, "detail"))
+    return {
+        "scanned": stats["scanned"],
+        "total_seconds": total,
+        "commits_per_second": stats["scanned"] / max(total, 1e-9),
+        "stages": stats["stages"],
+        "artifact_bytes": tree_size(out_dir)[1],
+        "detail_files": detail_files,
+        "detail_bytes": detail_bytes,
+    }
+
+
+def git_version():
+    return subprocess.run(["git", "--version"], capture_output=True, text=True,
+                          check=True).stdout.strip()
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--authors", type=int, default=200)
+    parser.add_argument("--university-ratio", type=float, default=0.3,
+                        help="share of authors with a university email domain")
+    parser.add_argument("--universities", type=int, default=10000,
+                        help="size of the synthetic university list")
+    parser.add_argument("--files-per-commit", type=int, default=2)
+    parser.add_argument("--patch-lines", type=int, default=40,
+                        help="lines rewritten in every touched file")
+    parser.add_argument("--extractor", nargs="+", choices=("log", "twophase", "batch", "gitpython"),
+                        default=["log", "gitpython"])
+    parser.add_argument("--detail-format", nargs="+", choices=("html", "shared", "store"),
+                        default=["html"])
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=str,
+                        help="build the repo and outputs here and keep them (default: temp dir)")
+    parser.add_argument("--output", type=str, default="bench_pipeline.json")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # run_once() changes into the output directory, so every path is absolute
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="bench-pipeline-"))
+    os.makedirs(workdir, exist_ok=True)
+    repo_path = os.path.join(workdir, "repo")
+    uni_file = os.path.join(workdir, "universities.json")
+    try:
+        uni_list = synthetic_university_list(args.universities, rng)
+        with open(uni_file, "w", encoding="utf-8") as file:
+            json.dump(uni_list, file)
+
+        start = time.perf_counter()
+        shutil.rmtree(repo_path, ignore_errors=True)
+        authors = synthetic_authors(args.authors, args.university_ratio, uni_list, rng)
+        build_repo(repo_path, args.commits, authors, args.files_per_commit,
+                   args.patch_lines, rng)
+        print(f"Built {args.commits} commits in {time.perf_counter() - start:.1f}s")
+
+        runs = []
+        for extractor, detail_format in product(args.extractor, args.detail_format):
+            jobs = args.jobs if extractor != "gitpython" else 1
+            for repeat in range(args.repeat):
+                out_dir = os.path.join(workdir, f"out-{extractor}-{detail_format}")
+                run = run_once(repo_path, uni_file, out_dir, extractor, detail_format, jobs)
+                runs.append({"extractor": extractor, "detail_format": detail_format,
+                             "jobs": jobs, "repeat": repeat, **run})
+                stages = "  ".join(f"{name} {seconds:.2f}s"
+                                   for name, seconds in run["stages"].items())
+                print(f"{extractor:<10} {detail_format:<7} {run['total_seconds']:7.2f}s  "
+                      f"{stages}  detail {run['detail_files']:,} files "
+                      f"{run['detail_bytes']:,} bytes")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "benchmark": "pipeline",
+        "created": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git": git_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "params": {
+            "commits": args.commits,
+            "authors": args.authors,
+            "university_ratio": args.university_ratio,
+            "universities": args.universities,
+            "files_per_commit": args.files_per_commit,
+            "patch_lines": args.patch_lines,
+            "seed": args.seed,
+        },
+        "runs": runs,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Load test: requests/s and latency percentiles of the src/serve.py query service.
+
+Usage: python benchmarks/bench_serve.py [--url URL | --dir DIR | --result FILE]
+                                        [--threads N] [--seconds S]
+
+Without --url, src/serve.py is started on a free local port over the
+ranking in --dir or --result, or over a synthetic ranking of --commits
+commits. It runs in its own process, so the client threads do not compete
+with it for the GIL. N client threads each keep one connection open and
+replay a mix of filtered and paginated queries sampled from the served data.
+"""
+
+import http.client
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+# pylint: disable=wrong-import-position
+from detail_manifest import percentiles
+from main import add_rankings, write_sharded_result_files
+from model import Author, Commit
+
+SERVE = Path(__file__).resolve().parents[1] / "src" / "serve.py"
+FIRST_DATE = 1_600_000_000
+SUMMARY_WORDS = ("net", "mm", "drm", "usb", "fix", "add", "remove", "driver", "leak", "cleanup")
+
+
+def synthetic_ranking(commits, universities, authors_per_university, rng):
+    """Return result entries shaped like process_results() output."""
+    result = []
+    per_author = max(1, commits // (universities * authors_per_university))
+    for u in range(universities):
+        domain = f"u{u}.edu"
+        authors = []
+        for a in range(authors_per_university):
+            authors.append(Author(f"author{a}@{domain}", f"Author {u}-{a}", [
+                Commit(f"{rng.getrandbits(160):040x}",
+                       f"{rng.choice(SUMMARY_WORDS)}: {rng.choice(SUMMARY_WORDS)} {i}",
+                       FIRST_DATE + rng.randrange(0, 5 * 365 * 86400), 480, 1,
+                       rng.randrange(1, 100), rng.randrange(0, 50))
+                for i in range(per_author)
+            ]))
+        result.append({"name": f"University {u}", "domains": [domain], "university": None,
+                       "count": per_author * len(authors),
+                       "lines": sum(c.insertions + c.deletions for a in authors for c in a.commits),
+                       "authors": authors})
+    result.sort(key=lambda item: (item["count"], item["lines"]), reverse=True)
+    return add_rankings(result)
+
+
+def get_json(host, port, path):
+    connection = http.client.HTTPConnection(host, port)
+    connection.request("GET", path)
+    payload = json.loads(connection.getresponse().read())
+    connection.close()
+    return payload
+
+
+def query_mix(host, port, rng, count=500):
+    """Return count request paths mixing every endpoint and filter, sampled from the served data."""
+    ids = [row["id"] for row in get_json(host, port, "/api/universities?limit=1000")["items"]]
+    commits = get_json(host, port, "/api/commits?limit=1000")["items"]
+    commits += get_json(host, port, f"/api/commits?limit=1000&offset={len(commits) * 10}")["items"]
+    emails = sorted({commit["email"] for commit in commits})
+    domains = sorted({email.split("@")[-1] for email in emails})
+    paths = []
+    for _ in range(count):
+        since = rng.choice(commits)["date"][:10]
+        paths.append(rng.choice([
+            "/api/universities?limit=20",
+            f"/api/universities?since={since}&limit=20",
+            f"/api/universities?summary={quote(rng.choice(SUMMARY_WORDS))}&limit=20",
+            f"/api/authors?domain={quote(rng.choice(domains))}&since={since}&limit=20",
+            f"/api/authors?university={rng.choice(ids)}&limit=20&offset=10",
+            f"/api/commits?email={quote(rng.choice(emails))}&limit=20",
+            f"/api/commits?university={rng.choice(ids)}&since={since}&limit=50",
+            "/api/meta",
+        ]))
+    return paths
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(argv, port, timeout=120):
+    """Start src/serve.py with argv on port and wait until it answers."""
+    process = subprocess.Popen([sys.executable, str(SERVE), "--port", str(port), *argv],
+                               stdout=subprocess.PIPE, text=True)
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            return process, get_json("127.0.0.1", port, "/api/meta")
+        except OSError:
+            if process.poll() is not None or time.perf_counter() > deadline:
+                process.kill()
+                raise RuntimeError("serve.py did not start") from None
+            time.sleep(0.05)
+
+
+def client(host, port, paths, deadline, latencies, errors):
+    """Replay paths on one keep-alive connection until deadline."""
+    connection = http.client.HTTPConnection(host, port)
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        connection.request("GET", path)
+        response = connection.getresponse()
+        response.read()
+        latencies.append((path.split("?")[0], time.perf_counter() - start))
+        if response.status != 200:
+            errors.append(path)
+    connection.close()
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--url", type=str, help="load test a running service instead")
+    parser.add_argument("--dir", type=str, help="serve the summary.json and authors/ in DIR")
+    parser.add_argument("--result", type=str, help="serve a single-file result.json")
+    parser.add_argument("--commits", type=int, default=200_000)
+    parser.add_argument("--universities", type=int, default=300)
+    parser.add_argument("--authors", type=int, default=20, help="authors per university")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            if not args.dir and not args.result:
+                cwd = os.getcwd()
+                os.chdir(tmp)
+                try:
+                    with redirect_stdout(io.StringIO()):
+                        write_sharded_result_files({"meta": {}, "data": synthetic_ranking(
+                            args.commits, args.universities, args.authors, rng)}, compact=True)
+                finally:
+                    os.chdir(cwd)
+            host, port = "127.0.0.1", free_port()
+            start = time.perf_counter()
+            server, meta = start_server(["--result", args.result] if args.result
+                                        else ["--dir", args.dir or tmp], port)
+            print(f'Serving {meta["universities"]} universities, {meta["authors"]} authors and '
+                  f'{meta["commits"]} commits, ready in {time.perf_counter() - start:.2f}s')
+        paths = query_mix(host, port, rng)
+
+        latencies, errors = [], []
+        deadline = time.perf_counter() + args.seconds
+        threads = [threading.Thread(target=client, args=(host, port, rng.sample(paths, len(paths)),
+                                                          deadline, latencies, errors))
+                   for _ in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if server:
+            server.terminate()
+            server.wait()
+
+    def milliseconds(values):
+        return "  ".join(f"{key} {value * 1000:.2f}ms" for key, value in percentiles(values).items())
+
+    print(f"{len(latencies)} requests in {elapsed:.1f}s with {args.threads} threads: "
+          f"{len(latencies) / elapsed:,.0f} requests/s, {len(errors)} errors")
+    print(f"{'all':<18} {milliseconds([latency for _, latency in latencies])}")
+    for endpoint in sorted({endpoint for endpoint, _ in latencies}):
+        print(f"{endpoint:<18} {milliseconds([latency for name, latency in latencies if name == endpoint])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Periodic checkpoints of a running scan, so an interrupted full scan can resume.
+
+A checkpoint file is a journal: a header line with the scan key, then one
+line per checkpoint with the university commit records matched since the
+previous one and the number of commits scanned so far. Replaying the
+records through add_commit() rebuilds the aggregates exactly, and every
+checkpoint only writes what is new. A line is written and synced in one
+piece; a torn last line is ignored, so the file always ends at the last
+complete checkpoint.
+"""
+
+import json
+import os
+import time
+
+from scan import add_commit, new_results
+
+CHECKPOINT_FILE = "checkpoint.jsonl"
+CHECKPOINT_VERSION = 1
+# default time between checkpoints of a scan
+CHECKPOINT_SECONDS = 60
+
+
+def _encode(value):
+    return (json.dumps(value, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class Checkpointer:
+    """Journal the commits of a scan to path every few commits or seconds.
+
+    key identifies the scan (revision range, extractor, university list).
+    A checkpoint is due after every_commits commits or every_seconds
+    seconds, whichever comes first; 0 disables either. With a loaded
+    checkpoint as resumed, position starts at the commits it covers and new
+    checkpoints are appended to it.
+    """
+
+    def __init__(self, path, key, every_commits=0, every_seconds=CHECKPOINT_SECONDS, resumed=None):
+        self.path = path
+        self.key = key
+        self.every_commits = every_commits
+        self.every_seconds = every_seconds
+        self.position = resumed["scanned"] if resumed else 0
+        self.written = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self._started = resumed is not None
+        if resumed:
+            # drop a torn line after the last complete checkpoint
+            with open(path, "r+b") as file:
+                file.truncate(resumed["size"])
+        self._records = []
+        self._pending = 0
+        self._last = time.perf_counter()
+
+    def update(self, sha, email_domain=None, record=None):
+        """Count the scanned commit sha and save a checkpoint if one is due.
+
+        record is journaled when the commit matched email_domain.
+        """
+        self.position += 1
+        self._pending += 1
+        if email_domain is not None:
+            self._records.append([email_domain, record])
+        if self.every_commits and self._pending >= self.every_commits:
+            self.save(sha)
+        elif self.every_seconds and time.perf_counter() - self._last >= self.every_seconds:
+            self.save(sha)
+
+    def save(self, sha):
+        """Append a checkpoint that covers the scan up to and including commit sha."""
+        start = time.perf_counter()
+        data = _encode({"scanned": self.position, "commit": sha, "records": self._records})
+        mode = "ab"
+        if not self._started:
+            data = _encode({"version": CHECKPOINT_VERSION, **self.key}) + data
+            mode = "wb"
+        with open(self.path, mode) as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        self._started = True
+        self.written += 1
+        self.bytes += len(data)
+        self._records = []
+        self._pending = 0
+        self._last = time.perf_counter()
+        self.seconds += self._last - start
+
+    def stats(self):
+        """Return the number, total size and write time of the saved checkpoints."""
+        return {"written": self.written, "bytes": self.bytes, "seconds": self.seconds}
+
+    def remove(self):
+        """Delete the checkpoint once the scan it covers is saved elsewhere."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def load_checkpoint(path=CHECKPOINT_FILE):
+    """Load the last complete checkpoint of path, or return None if there is none.
+
+    Returns the header fields with "scanned" and "commit" of the last
+    checkpoint, all journaled "records" and the "size" of the complete part.
+    """
+    try:
+        with open(path, "rb") as file:
+            lines = file.read().split(b"\n")
+    except OSError:
+        return None
+    try:
+        checkpoint = json.loads(lines[0])
+    except ValueError:
+        return None
+    if not isinstance(checkpoint, dict) or checkpoint.get("version") != CHECKPOINT_VERSION:
+        return None
+    checkpoint["records"] = []
+    size = len(lines[0]) + 1
+    # the part after the last newline is empty or torn
+    for line in lines[1:-1]:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            break
+        checkpoint.update(scanned=entry["scanned"], commit=entry["commit"])
+        checkpoint["records"].extend(entry["records"])
+        size += len(line) + 1
+    if "scanned" not in checkpoint:
+        return None
+    checkpoint["size"] = size
+    return checkpoint
+
+
+def resume_point(checkpoint, key):
+    """Return checkpoint if the scan described by key can continue from it, otherwise None."""
+    if checkpoint is None:
+        print("No checkpoint, scanning from the start")
+        return None
+    for name, value in key.items():
+        if checkpoint.get(name) != value:
+            print(f"Checkpoint was saved for another {name}, scanning from the start")
+            return None
+    print(f'Resuming after {checkpoint["scanned"]} commits, '
+          f'at commit {checkpoint["commit"][:12]}')
+    return checkpoint
+
+
+def checkpoint_results(checkpoint):
+    """Rebuild the per-domain aggregates of the commits a checkpoint covers."""
+    results = new_results()
+    for email_domain, record in checkpoint["records"]:
+        add_commit(results, email_domain, record)
+    return results
@@ -0,0 +1,122 @@
+"""Content hashes of the detail pages, so that unchanged pages are not rendered again."""
+
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = "detail-manifest.json"
+MANIFEST_VERSION = 2
+
+
+def digest(*parts):
+    """Return the SHA-256 hex digest of JSON-serializable parts."""
+    return hashlib.sha256(
+        json.dumps(parts, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+
+
+def item_shas(item, shas_map):
+    """Return the patch SHAs of a result entry in detail page order."""
+    return [sha for domain in item["domains"] for sha in shas_map.get(domain, ())]
+
+
+def paginate(sizes, page_bytes, patch_cap=None):
+    """Split patches of the given byte sizes into pages of at most page_bytes.
+
+    A patch counts with at most patch_cap bytes, the part a page shows. Every
+    page holds at least one patch, so a patch over the budget gets a page of
+    its own. Returns the (start, end) index range of every page.
+    """
+    ranges = []
+    start = used = 0
+    for index, size in enumerate(sizes):
+        cost = min(size, patch_cap) if patch_cap else size
+        if index > start and used + cost > page_bytes:
+            ranges.append((start, index))
+            start, used = index, 0
+        used += cost
+    if start < len(sizes):
+        ranges.append((start, len(sizes)))
+    return ranges
+
+
+def page_layout(processed_result, shas_map, sizes, page_bytes, patch_cap=None):
+    """Return {id: [SHAs of each page]} for every result entry with patches.
+
+    Pages are packed from the oldest patch, so new commits only fill or split
+    the first (newest) page and the boundaries of the older pages stay put.
+    A split changes the page count, which every page of the entry shows, but
+    happens only once per page_bytes of new patches.
+    """
+    layout = {}
+    for item in processed_result:
+        shas = item_shas(item, shas_map)
+        if shas:
+            count = len(shas)
+            ranges = paginate([sizes[sha] for sha in reversed(shas)], page_bytes, patch_cap)
+            layout[item["id"]] = [shas[count - end:count - start] for start, end in reversed(ranges)]
+    return layout
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """Return {"p<point>": value} by the nearest-rank method, plus "max"."""
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    result = {f"p{point}": ordered[max(0, -(-point * len(ordered) // 100) - 1)] for point in points}
+    result["max"] = ordered[-1]
+    return result
+
+
+def build_manifest(processed_result, layout, settings, sizes, shells=False):
+    """Return the manifest of every detail page the result needs.
+
+    Pages are keyed "<id>/<page>" and hashed from the university name, the
+    page count and the SHAs shown on the page (`git show` of a SHA does not
+    change). With shells, "<id>/shell" covers the shared-format shell pages.
+    settings (templates, format, locales, page budget) apply to every page.
+    sizes, the `git show` size of every SHA, is kept so later runs can lay
+    out the pages without fetching the patches again.
+    """
+    pages = {}
+    for item in processed_result:
+        item_pages = layout.get(item["id"], [])
+        if shells and item_pages:
+            pages[f'{item["id"]}/shell'] = digest(item["name"], len(item_pages))
+        for page, shas in enumerate(item_pages, 1):
+            pages[f'{item["id"]}/{page}'] = digest(item["name"], len(item_pages), shas)
+    return {"version": MANIFEST_VERSION, "settings": settings, "pages": pages, "sizes": sizes}
+
+
+def diff_manifests(old, new):
+    """Return (changed, stale) page keys, or None if old cannot be reused.
+
+    changed are the pages of new that are missing from old or hash
+    differently, stale the pages of old that new no longer has.
+    """
+    if old is None or old.get("settings") != new["settings"]:
+        return None
+    old_pages = old["pages"]
+    changed = {key for key, value in new["pages"].items() if old_pages.get(key) != value}
+    stale = set(old_pages) - set(new["pages"])
+    return changed, stale
+
+
+def load_manifest(path):
+    """Load a saved manifest, or return None if it is missing or unusable."""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(manifest, path):
+    """Atomically write manifest to path."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
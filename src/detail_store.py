@@ -0,0 +1,314 @@
+"""Compressed, content-addressed patch store read by the static detail viewer.
+
+Patch texts are packed in commit order into gzip chunks named by the hash of
+their content. detail-store.json locates every stored SHA in its chunk, so
+later runs only fetch the patches of new commits. Each university gets a
+small page map, and detail/view.html fetches and inflates only the chunks of
+the requested page.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+STORE_DIR = os.path.join("detail", "_store")
+STORE_INDEX_FILE = "detail-store.json"
+STORE_VERSION = 1
+VIEWER_FILE = os.path.join("detail", "view.html")
+# raw bytes packed into one chunk before it is compressed
+CHUNK_BYTES = 256 * 1024
+# a chunk whose live patches fill less than this share of it is repacked
+MIN_LIVE_RATIO = 0.5
+GZIP_LEVEL = 6
+# .gz keeps --precompress from compressing the chunks a second time
+CHUNK_SUFFIX = ".gz"
+
+
+class DetailStore:
+    """Patch texts in gzip chunks under root, located by commit SHA.
+
+    index is a loaded detail-store.json, or None to start from an empty
+    store. settings describe how the patch texts were fetched; an index
+    saved with other settings is dropped, since its texts may differ. New
+    patches go through append(); finish() drops the SHAs that are no longer
+    shown, repacks mostly dead chunks and deletes unused ones.
+    """
+
+    def __init__(self, root, index=None, chunk_bytes=CHUNK_BYTES, settings=None):
+        self.root = root
+        if index is not None and index.get("settings") != settings:
+            index = None
+        if index is not None and not all(os.path.exists(self.chunk_path(name))
+                                         for name in index["chunks"]):
+            index = None  # the chunks were not kept with the index
+        self.settings = settings
+        if index is None:
+            shutil.rmtree(root, ignore_errors=True)
+        os.makedirs(root, exist_ok=True)
+        self.chunk_bytes = chunk_bytes
+        # chunk name -> raw size, SHA -> [chunk name, offset, length]
+        self.chunks = dict(index["chunks"]) if index else {}
+        self.locations = dict(index["patches"]) if index else {}
+        self.written = 0
+        self._parts = []
+        self._pending = []
+        self._size = 0
+
+    def missing(self, shas):
+        """Return the SHAs in shas that are not stored yet, in order."""
+        return [sha for sha in shas if sha not in self.locations]
+
+    def append(self, sha, text):
+        """Store the patch text of sha."""
+        self._append(sha, text.encode("utf-8", "surrogateescape"))
+
+    def _append(self, sha, data):
+        self._pending.append((sha, self._size, len(data)))
+        self._parts.append(data)
+        self._size += len(data)
+        if self._size >= self.chunk_bytes:
+            self._flush()
+
+    def _flush(self):
+        if not self._parts:
+            return
+        data = gzip.compress(b"".join(self._parts), compresslevel=GZIP_LEVEL, mtime=0)
+        name = hashlib.sha256(data).hexdigest()[:20]
+        path = self.chunk_path(name)
+        if not os.path.exists(path):
+            with open(f"{path}.tmp", "wb") as file:
+                file.write(data)
+            os.replace(f"{path}.tmp", path)
+            self.written += 1
+        for sha, offset, length in self._pending:
+            self.locations[sha] = [name, offset, length]
+        self.chunks[name] = self._size
+        self._parts, self._pending, self._size = [], [], 0
+
+    def chunk_path(self, name):
+        return os.path.join(self.root, f"{name}{CHUNK_SUFFIX}")
+
+    def read_chunk(self, name):
+        """Return the inflated bytes of a chunk."""
+        with open(self.chunk_path(name), "rb") as file:
+            return gzip.decompress(file.read())
+
+    def patch(self, sha):
+        """Return the stored patch text of sha."""
+        name, offset, length = self.locations[sha]
+        return self.read_chunk(name)[offset:offset + length].decode("utf-8", "surrogateescape")
+
+    def _live_bytes(self):
+        live = dict.fromkeys(self.chunks, 0)
+        for name, _, length in self.locations.values():
+            live[name] += length
+        return live
+
+    def finish(self, shas):
+        """Keep only the patches of shas, repack sparse chunks and delete dead ones.
+
+        Returns the number of patches moved out of repacked chunks.
+        """
+        self._flush()
+        keep = set(shas)
+        self.locations = {sha: location for sha, location in self.locations.items() if sha in keep}
+        live = self._live_bytes()
+        sparse = {name for name, size in self.chunks.items() if 0 < live[name] < size * MIN_LIVE_RATIO}
+        moved = sorted(
+            (location for location in self.locations.items() if location[1][0] in sparse),
+            key=lambda location: (location[1][0], location[1][1]),
+        )
+        data = {}
+        for sha, (name, offset, length) in moved:
+            if name not in data:
+                data = {name: self.read_chunk(name)}
+            self._append(sha, data[name][offset:offset + length])
+        self._flush()
+        for name, size in self._live_bytes().items():
+            if size == 0:
+                del self.chunks[name]
+                if os.path.exists(self.chunk_path(name)):
+                    os.remove(self.chunk_path(name))
+        return len(moved)
+
+    def disk_bytes(self):
+        """Return the total size of the chunk files."""
+        return sum(os.path.getsize(self.chunk_path(name)) for name in self.chunks)
+
+    def save(self, path):
+        """Atomically write the store index to path."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": STORE_VERSION, "settings": self.settings,
+                       "chunks": self.chunks, "patches": self.locations},
+                      file, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+
+def load_store_index(path):
+    """Load a saved store index, or return None if it is missing or unusable."""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or index.get("version") != STORE_VERSION:
+        return None
+    return index
+
+
+def item_pages(item, item_layout, locations):
+    """Return the page map of one result entry for the viewer.
+
+    item_layout lists the SHAs of each page. chunks lists the chunk names
+    the entry uses; each page is a list of [chunk index, offset, length]
+    triples, one per patch.
+    """
+    chunks = {}
+    pages = []
+    for shas in item_layout:
+        page = []
+        for sha in shas:
+            name, offset, length = locations[sha]
+            page.append([chunks.setdefault(name, len(chunks)), offset, length])
+        pages.append(page)
+    return {"name": item["name"], "chunks": list(chunks), "pages": pages}
+
+
+def write_item_pages(store, processed_result, layout):
+    """Write <id>.json page maps next to the chunks and delete those of old ids.
+
+    Returns the total size of the page maps.
+    """
+    names = set()
+    size = 0
+    for item in processed_result:
+        name = f'{item["id"]}.json'
+        names.add(name)
+        text = json.dumps(item_pages(item, layout.get(item["id"], []), store.locations),
+                          ensure_ascii=False, separators=(",", ":"))
+        with open(os.path.join(store.root, name), "w", encoding="utf-8") as file:
+            file.write(text)
+        size += len(text.encode("utf-8"))
+    for name in os.listdir(store.root):
+        if name.endswith(".json") and name not in names:
+            os.remove(os.path.join(store.root, name))
+    return size
+
+
+VIEWER_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title></title>
+    <style>
+{style}    </style>
+</head>
+<body>
+    <div class="detail-header">
+        <a class="back-link" href="../index.html"></a>
+        <h1></h1>
+    </div>
+    <div class="container">
+        <div class="pagination"></div>
+        <div id="patches"></div>
+        <div class="pagination"></div>
+    </div>
+    <script>
+    var MESSAGES = {messages};
+{script}    </script>
+</body>
+</html>"""
+
+# Renders detail/view.html?id=<id>&lang=<locale>&page=<n>. Chunks are
+# fetched, so the viewer needs to be served over HTTP.
+VIEWER_JS = """    (function () {
+        var params = new URLSearchParams(window.location.search);
+        var itemId = parseInt(params.get("id"), 10);
+        var locale = MESSAGES[params.get("lang")] ? params.get("lang") : "en";
+        var messages = MESSAGES[locale];
+        var requested = parseInt(params.get("page"), 10) || 1;
+        var patches = document.getElementById("patches");
+
+        function escapeHtml(text) {
+            return text.replace(/&/g, "&amp;").replace(/"/g, "&quot;").replace(/'/g, "&#x27;")
+                .replace(/</g, "&lt;").replace(/>/g, "&gt;");
+        }
+
+        function href(i) {
+            return "view.html?id=" + itemId + "&lang=" + locale + (i === 1 ? "" : "&page=" + i);
+        }
+
+        function link(i, text) {
+            return "<a class='page-btn' href='" + href(i) + "'>" + text + "</a>";
+        }
+
+        function loadChunk(name) {
+            return fetch("_store/" + name + ".gz").then(function (response) {
+                if (!response.ok) throw new Error(response.status + " " + response.url);
+                return response.arrayBuffer();
+            }).then(function (buffer) {
+                var bytes = new Uint8Array(buffer);
+                // a server that sends .gz files with Content-Encoding: gzip
+                // hands over the inflated text already
+                if (bytes[0] !== 0x1f || bytes[1] !== 0x8b) return bytes;
+                var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+                return new Response(stream).arrayBuffer().then(function (inflated) {
+                    return new Uint8Array(inflated);
+                });
+            });
+        }
+
+        document.documentElement.lang = locale;
+        var back = document.querySelector(".back-link");
+        back.href = "../index.html?lang=" + locale;
+        back.innerHTML = "&larr; " + escapeHtml(messages.back_to_rankings);
+
+        fetch("_store/" + itemId + ".json").then(function (response) {
+            if (!response.ok) throw new Error(response.status + " " + response.url);
+            return response.json();
+        }).then(function (item) {
+            var title = messages.patches_contributed_by.replace("{name}", item.name);
+            document.title = title;
+            document.querySelector("h1").textContent = title;
+            var pageNum = item.pages.length;
+            var page = Math.min(Math.max(requested, 1), pageNum);
+            var pagination = "";
+            if (page > 1) pagination += link(page - 1, "&lt;&lt;" + escapeHtml(messages.prev));
+            for (var i = 1; i <= pageNum; i++) {
+                pagination += i === page
+                    ? "<span class='page-btn current'>[" + i + "]</span>"
+                    : link(i, String(i));
+            }
+            if (page < pageNum) pagination += link(page + 1, escapeHtml(messages.next) + "&gt;&gt;");
+            document.querySelectorAll(".pagination").forEach(function (element) {
+                element.innerHTML = pagination;
+            });
+
+            var entries = item.pages[page - 1] || [];
+            var needed = entries.map(function (entry) { return entry[0]; })
+                .filter(function (chunk, index, all) { return all.indexOf(chunk) === index; });
+            return Promise.all(needed.map(function (chunk) {
+                return loadChunk(item.chunks[chunk]);
+            })).then(function (loaded) {
+                var decoder = new TextDecoder();
+                patches.innerHTML = entries.map(function (entry) {
+                    var bytes = loaded[needed.indexOf(entry[0])].subarray(entry[1], entry[1] + entry[2]);
+                    return '<div class="patch-card"><pre>' + escapeHtml(decoder.decode(bytes)) + "</pre></div>";
+                }).join("\\n");
+            });
+        }).catch(function (error) {
+            patches.textContent = String(error);
+        });
+    })();
+"""
+
+
+def render_viewer(style, messages):
+    """Render the detail viewer page with the page CSS and the localized messages."""
+    # "</" cannot end the inline script early when escaped
+    encoded = json.dumps(messages, ensure_ascii=False).replace("</", "<\\/")
+    return VIEWER_TEMPLATE.format(style=style, messages=encoded, script=VIEWER_JS)
@@ -0,0 +1,44 @@
+"""Hash index over university domains for O(labels) email domain lookups."""
+
+
+def build_domain_index(uni_list):
+    """Map every university domain to (position, university record).
+
+    When several universities list the same domain, the earliest one in
+    uni_list wins, as with a linear scan.
+    """
+    index = {}
+    for position, university in enumerate(uni_list):
+        for domain in university["domains"]:
+            index.setdefault(domain, (position, university))
+    return index
+
+
+def domain_suffixes(domain):
+    """Yield domain and each of its parent domains, longest first.
+
+    "cs.foo.edu" yields "cs.foo.edu", "foo.edu" and "edu".
+    """
+    yield domain
+    dot = domain.find(".")
+    while dot != -1:
+        yield domain[dot + 1:]
+        dot = domain.find(".", dot + 1)
+
+
+def lookup_university(domain, domain_index):
+    """Return the university record for domain, or None.
+
+    Same semantics as get_university(): an exact match wins, otherwise the
+    earliest university in the list that owns any parent domain.
+    """
+    entry = domain_index.get(domain)
+    if entry is not None:
+        return entry[1]
+
+    best = None
+    for suffix in domain_suffixes(domain):
+        entry = domain_index.get(suffix)
+        if entry is not None and (best is None or entry[0] < best[0]):
+            best = entry
+    return best[1] if best is not None else None
@@ -0,0 +1,117 @@
+"""Read commits through long-lived `git cat-file --batch` and `git diff-tree --stdin`."""
+
+import codecs
+import subprocess
+
+from git_log import git_command, parse_numstat, parse_raw_date
+from stages import count_git_process
+
+# diff-tree echoes input lines that are not object names and flushes its
+# output, which marks the end of each commit's --numstat block.
+DIFF_TREE_SENTINEL = b"#end\n"
+
+
+def parse_commit_object(sha, data):
+    """Parse a raw commit object into a record without statistics.
+
+    The record carries the parents so that diff-tree can be asked for the
+    first-parent diff of merges.
+    """
+    header, _, message = data.partition(b"\n\n")
+    parents = []
+    author = b""
+    encoding = "utf-8"
+    for line in header.split(b"\n"):
+        if line.startswith(b"parent "):
+            parents.append(line[7:].decode("ascii"))
+        elif line.startswith(b"author ") and not author:
+            author = line[7:]
+        elif line.startswith(b"encoding "):
+            encoding = line[9:].decode("ascii", "replace")
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding = "utf-8"
+    ident, _, raw_date = author.decode(encoding, "replace").rpartition("> ")
+    name, _, email = ident.rpartition("<")
+    return {
+        "commit": sha,
+        "name": name.rstrip(" "),
+        "email": email,
+        "summary": message.decode(encoding, "replace").split("\n", 1)[0],
+        "date": parse_raw_date(raw_date),
+        "parents": parents,
+    }
+
+
+class GitBatch:
+    """One `git cat-file --batch` and one `git diff-tree --stdin` coprocess.
+
+    Commit objects stream out of cat-file as `git rev-list` feeds it
+    through a pipe, and --numstat is requested from diff-tree only for the
+    commits that need statistics, so per-commit cost is a pipe write and
+    read instead of a fork and exec. Use one instance per worker process.
+    """
+
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        count_git_process()
+        self._diff_tree = subprocess.Popen(
+            git_command(repo_path, "diff-tree", "--stdin", "--no-commit-id", "--numstat",
+                        "--no-renames", "--root", "-r", "--no-color"),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+
+    def iter_commits(self, rev, skip=0, max_count=None):
+        """Yield a record without statistics for every commit of rev, in log order."""
+        options = [f"--skip={skip}"]
+        if max_count is not None:
+            options.append(f"--max-count={max_count}")
+        rev_list_command = git_command(self.repo_path, "rev-list", *options, rev, "--")
+        count_git_process()
+        with subprocess.Popen(rev_list_command, stdout=subprocess.PIPE) as rev_list:
+            count_git_process()
+            with subprocess.Popen(
+                git_command(self.repo_path, "cat-file", "--batch"),
+                stdin=rev_list.stdout, stdout=subprocess.PIPE,
+            ) as cat_file:
+                rev_list.stdout.close()
+                for line in cat_file.stdout:
+                    sha, object_type, size = line.decode("ascii").split()
+                    data = cat_file.stdout.read(int(size) + 1)[:-1]
+                    if object_type == "commit":
+                        yield parse_commit_object(sha, data)
+                if cat_file.wait() != 0:
+                    raise subprocess.CalledProcessError(cat_file.returncode, "git cat-file")
+            if rev_list.wait() != 0:
+                raise subprocess.CalledProcessError(rev_list.returncode, rev_list_command)
+
+    def add_stats(self, record):
+        """Complete record with the files/insertions/deletions of its first-parent diff."""
+        line = " ".join([record["commit"], *record["parents"][:1]])
+        self._diff_tree.stdin.write(line.encode("ascii") + b"\n" + DIFF_TREE_SENTINEL)
+        self._diff_tree.stdin.flush()
+        lines = []
+        for output in self._diff_tree.stdout:
+            if output == DIFF_TREE_SENTINEL:
+                break
+            lines.append(output)
+        else:
+            raise subprocess.CalledProcessError(self._diff_tree.wait(), "git diff-tree")
+        record["files"], record["insertions"], record["deletions"] = parse_numstat(
+            b"".join(lines).decode("utf-8", "replace")
+        )
+        del record["parents"]
+        return record
+
+    def close(self):
+        """Stop the diff-tree coprocess."""
+        self._diff_tree.stdin.close()
+        self._diff_tree.wait()
+        self._diff_tree.stdout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
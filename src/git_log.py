@@ -0,0 +1,269 @@
+"""Stream commit records out of long-lived `git` processes."""
+
+import subprocess
+import threading
+from datetime import datetime, timedelta, timezone
+
+import git
+
+from stages import count_git_process
+
+# One NUL-separated header per commit, followed by the --numstat block.
+# NUL never appears in commit headers, messages or textual numstat output.
+LOG_FORMAT = "%x00%H%x00%an%x00%ae%x00%ad%x00%B%x00"
+LOG_FIELDS = 6
+READ_SIZE = 1 << 16
+# `git show` applies .mailmap by default, which would make the text of a
+# commit change with the repository's .mailmap instead of depending on its
+# SHA alone
+SHOW_OPTIONS = ("--no-mailmap",)
+
+
+def git_command(repo_path, *args):
+    """Build a git command line that runs inside repo_path."""
+    return ["git", "-C", str(repo_path), *args]
+
+
+class CountingGit(git.Git):
+    """GitPython command wrapper that counts the git processes it starts."""
+
+    def execute(self, *args, **kwargs):  # pylint: disable=arguments-differ
+        count_git_process()
+        return super().execute(*args, **kwargs)
+
+
+class CountingRepo(git.Repo):
+    """git.Repo whose commands, including its cat-file coprocesses, are counted."""
+
+    GitCommandWrapperType = CountingGit
+
+
+def open_repo(repo_path):
+    """Open repo_path with GitPython, counting the git processes it starts."""
+    return CountingRepo(repo_path)
+
+
+def parse_raw_date(raw_date):
+    """Convert a `--date=raw` value into the ISO string GitPython produces."""
+    timestamp, offset = raw_date.split(" ")
+    sign = -1 if offset.startswith("-") else 1
+    minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+    tz = timezone(timedelta(minutes=sign * minutes))
+    return datetime.fromtimestamp(int(timestamp), tz).isoformat()
+
+
+def parse_numstat(text):
+    """Sum a --numstat block the same way GitPython's Stats does."""
+    files = insertions = deletions = 0
+    for line in text.splitlines():
+        parts = line.split("\t", 2)
+        if len(parts) != 3:
+            continue
+        insertions += int(parts[0]) if parts[0] != "-" else 0
+        deletions += int(parts[1]) if parts[1] != "-" else 0
+        files += 1
+    return files, insertions, deletions
+
+
+def build_commit_record(fields):
+    """Turn one group of log fields into a commit record."""
+    sha, name, email, raw_date, message, numstat = (
+        field.decode("utf-8", "replace") for field in fields
+    )
+    files, insertions, deletions = parse_numstat(numstat)
+    return {
+        "commit": sha,
+        "name": name,
+        "email": email,
+        "summary": message.split("\n", 1)[0],
+        "date": parse_raw_date(raw_date),
+        "files": files,
+        "insertions": insertions,
+        "deletions": deletions,
+    }
+
+
+def log_command(repo_path, *args):
+    """Build a `git log` command line that emits LOG_FORMAT records."""
+    return git_command(
+        repo_path, "log", f"--format={LOG_FORMAT}", "--date=raw",
+        "--numstat", "--no-renames", "--diff-merges=first-parent", "--no-color", *args,
+    )
+
+
+def parse_log_stream(stream):
+    """Yield the commit records of a LOG_FORMAT `git log` output stream."""
+    pending = []
+    fields = []
+    started = False
+    while True:
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            break
+        parts = chunk.split(b"\x00")
+        pending.append(parts[0])
+        for part in parts[1:]:
+            token = b"".join(pending)
+            pending = [part]
+            if not started:
+                # Everything before the first NUL is empty.
+                started = True
+                continue
+            fields.append(token)
+            if len(fields) == LOG_FIELDS:
+                yield build_commit_record(fields)
+                fields = []
+    if started:
+        fields.append(b"".join(pending))
+        if len(fields) == LOG_FIELDS:
+            yield build_commit_record(fields)
+
+
+def count_commits(repo_path, rev, exclude=()):
+    """Return the number of commits of rev with one `git rev-list --count`.
+
+    Counting walks the commit graph only, so a progress total is known
+    without holding the history in memory.
+    """
+    command = git_command(repo_path, "rev-list", "--count", rev,
+                          *(f"^{sha}" for sha in exclude), "--")
+    count_git_process()
+    return int(subprocess.run(command, stdout=subprocess.PIPE, check=True).stdout)
+
+
+def iter_log_commits(repo_path, rev, skip=0, max_count=None, exclude=()):
+    """Yield one record per commit reachable from rev, in `git log` order.
+
+    A single `git log` process walks the history; its stdout is parsed as it
+    arrives. Statistics match `Commit.stats.total`: renames are disabled and
+    merges are diffed against their first parent. skip and max_count select
+    a contiguous slice of that order; commits reachable from any of exclude
+    are left out.
+    """
+    options = [f"--skip={skip}"]
+    if max_count is not None:
+        options.append(f"--max-count={max_count}")
+    command = log_command(repo_path, *options, rev, *(f"^{sha}" for sha in exclude), "--")
+    count_git_process()
+    with subprocess.Popen(command, stdout=subprocess.PIPE) as process:
+        yield from parse_log_stream(process.stdout)
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, command)
+
+
+def iter_commit_emails(repo_path, rev):
+    """Yield (sha, author email) for every commit of rev, in `git log` order.
+
+    Only `%H %ae` is printed, so git neither diffs commits nor formats
+    messages; this is the cheap first phase of the two-phase scan.
+    """
+    command = git_command(repo_path, "log", "--format=%H %ae", "--no-color", rev, "--")
+    count_git_process()
+    with subprocess.Popen(command, stdout=subprocess.PIPE) as process:
+        for line in process.stdout:
+            sha, _, email = line.rstrip(b"\n").decode("utf-8", "replace").partition(" ")
+            yield sha, email
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, command)
+
+
+def iter_commit_records(repo_path, shas):
+    """Yield the record of every sha, in the given order.
+
+    The SHAs are handed to one `git log --no-walk=unsorted --stdin` process,
+    so the records equal those of iter_log_commits() for the same commits.
+    """
+    shas = list(shas)
+    if not shas:
+        return
+    command = log_command(repo_path, "--no-walk=unsorted", "--stdin")
+    count_git_process()
+    with subprocess.Popen(
+        command, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    ) as process:
+        process.stdin.write("".join(f"{sha}\n" for sha in shas).encode())
+        process.stdin.close()
+        yield from parse_log_stream(process.stdout)
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, command)
+
+
+def iter_patch_ids(repo_path, shas):
+    """Yield (sha, patch id) from `git patch-id --stable` for each sha with a diff.
+
+    All SHAs go through one `git diff-tree --stdin -p | git patch-id` pipeline.
+    Merges and empty commits have no diff and are not reported.
+    """
+    shas = list(shas)
+    if not shas:
+        return
+    diff_tree_command = git_command(
+        repo_path, "diff-tree", "--stdin", "-p", "--root", "-r", "--no-renames", "--no-color"
+    )
+    count_git_process()
+    with subprocess.Popen(
+        diff_tree_command, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    ) as diff_tree:
+        count_git_process()
+        with subprocess.Popen(
+            git_command(repo_path, "patch-id", "--stable"),
+            stdin=diff_tree.stdout, stdout=subprocess.PIPE,
+        ) as patch_id:
+            diff_tree.stdout.close()
+
+            def feed():
+                diff_tree.stdin.write("".join(f"{sha}\n" for sha in shas).encode())
+                diff_tree.stdin.close()
+
+            # feed from a thread: diff-tree output is consumed while we write
+            writer = threading.Thread(target=feed, daemon=True)
+            writer.start()
+            for line in patch_id.stdout:
+                patch, sha = line.decode("ascii").split()
+                yield sha, patch
+            writer.join()
+            if patch_id.wait() != 0:
+                raise subprocess.CalledProcessError(patch_id.returncode, "git patch-id")
+        if diff_tree.wait() != 0:
+            raise subprocess.CalledProcessError(diff_tree.returncode, diff_tree_command)
+
+
+def _decode_patch(lines):
+    """Decode buffered `git show` lines the way GitPython does."""
+    text = b"".join(lines).decode("utf-8", "surrogateescape")
+    return text[:-1] if text.endswith("\n") else text
+
+
+def iter_show_patches(repo_path, shas):
+    """Yield (sha, text) for each sha, matching `repo.git.show(*SHOW_OPTIONS, sha)`.
+
+    All SHAs are handed to one `git show --stdin` process and its output is
+    split back into per-commit texts at the `commit <sha>` header lines.
+    """
+    shas = list(shas)
+    if not shas:
+        return
+    command = git_command(repo_path, "show", *SHOW_OPTIONS, "--stdin")
+    count_git_process()
+    with subprocess.Popen(
+        command, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    ) as process:
+        process.stdin.write("".join(f"{sha}\n" for sha in shas).encode())
+        process.stdin.close()
+
+        index = -1
+        lines = []
+        for line in process.stdout:
+            next_index = index + 1
+            if (next_index < len(shas)
+                    and line.startswith(f"commit {shas[next_index]}".encode())):
+                if index >= 0:
+                    # Drop the blank separator line git puts between commits.
+                    yield shas[index], _decode_patch(lines[:-1])
+                index = next_index
+                lines = []
+            lines.append(line)
+        if index >= 0:
+            yield shas[index], _decode_patch(lines)
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, command)
@@ -0,0 +1,59 @@
+"""Write generated JSON and its JS wrapper piece by piece in a single pass."""
+
+import json
+
+from model import to_json
+
+
+def json_encoder(compact=False):
+    """Return the encoder of the generated files: indented, or minified when compact."""
+    if compact:
+        return json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=to_json)
+    return json.JSONEncoder(ensure_ascii=False, indent=2, default=to_json)
+
+
+def _iter_json(value, encoder, depth, level):
+    indent = encoder.indent or 0
+    if depth == 0 or not isinstance(value, (dict, list)) or not value:
+        text = encoder.encode(value)
+        # JSON strings escape newlines, so every newline is indentation
+        yield text.replace("\n", "\n" + " " * (indent * level)) if indent and level else text
+        return
+    inner = "\n" + " " * (indent * (level + 1)) if indent else ""
+    if isinstance(value, dict):
+        yield "{"
+        for index, (key, item) in enumerate(value.items()):
+            # json turns int, float, bool and None keys into their JSON text
+            key = key if isinstance(key, str) else encoder.encode(key)
+            yield (encoder.item_separator if index else "") + inner
+            yield encoder.encode(key) + encoder.key_separator
+            yield from _iter_json(item, encoder, depth - 1, level + 1)
+        closing = "}"
+    else:
+        yield "["
+        for index, item in enumerate(value):
+            yield (encoder.item_separator if index else "") + inner
+            yield from _iter_json(item, encoder, depth - 1, level + 1)
+        closing = "]"
+    yield ("\n" + " " * (indent * level) if indent else "") + closing
+
+
+def iter_json(value, compact=False, depth=2):
+    """Yield the text of dump_json(value, compact) in pieces.
+
+    Dicts and lists in the top depth levels are written here element by
+    element, and each element below them is encoded on its own, so no piece
+    is larger than one such element. The joined pieces equal json.dumps().
+    """
+    return _iter_json(value, json_encoder(compact), depth, 0)
+
+
+def write_json_and_js(value, json_path, js_path, js_prefix, compact=False, depth=2):
+    """Stream value to json_path and, as `<js_prefix><json>;`, to js_path at the same time."""
+    with open(json_path, "w", encoding="utf-8") as json_file, \
+            open(js_path, "w", encoding="utf-8") as js_file:
+        js_file.write(js_prefix)
+        for piece in iter_json(value, compact, depth):
+            json_file.write(piece)
+            js_file.write(piece)
+        js_file.write(";\n")
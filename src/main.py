@@ -1,20 +1,118 @@
 #!/usr/bin/env python3
 """Generate ranked contributions of university-affiliated commits from a Git repo."""
 
+import cProfile
+import hashlib
 import json
 import os
+import queue
+import re
 import shutil
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
 from argparse import ArgumentParser
 from datetime import datetime
 
-import git
-import requests
 from tqdm import tqdm
 
 import pytz
 
+from checkpoint import (
+    CHECKPOINT_FILE,
+    CHECKPOINT_SECONDS,
+    Checkpointer,
+    checkpoint_results,
+    load_checkpoint,
+    resume_point,
+)
+from detail_manifest import (
+    MANIFEST_FILE,
+    build_manifest,
+    diff_manifests,
+    digest,
+    load_manifest,
+    item_shas,
+    page_layout,
+    percentiles,
+    save_manifest,
+)
+from detail_store import (
+    STORE_DIR,
+    STORE_INDEX_FILE,
+    VIEWER_FILE,
+    DetailStore,
+    load_store_index,
+    render_viewer,
+    write_item_pages,
+)
+from domain_index import build_domain_index, lookup_university
+from json_stream import json_encoder, write_json_and_js
+from git_log import (
+    SHOW_OPTIONS,
+    count_commits,
+    iter_commit_emails,
+    iter_log_commits,
+    iter_show_patches,
+    open_repo,
+)
+from patch_store import PatchStore
+from precompress import COMPRESSED_SUFFIXES, available_formats, format_report, precompress
+from slices import (
+    RELEASE_TAG_PATTERN,
+    SLICE_KINDS,
+    SLICES_DIR,
+    bucket_commits,
+    map_releases,
+    monthly_trends,
+    ordered_keys,
+)
+from search_index import SEARCH_DIR, write_search_index
+from sources import parse_source, resolve_sources, scan_sources, sources_meta
+from stages import StageTimer, format_metrics, top_allocations
+from scan import (
+    match_commits,
+    scan_batch,
+    scan_batch_shard,
+    scan_gitpython,
+    scan_matched,
+    scan_records,
+    scan_shard,
+    scan_sharded,
+)
+from state import (
+    STATE_FILE,
+    incremental_base,
+    load_state,
+    merge_results,
+    save_state,
+)
+from university_list import UNIVERSITY_CACHE_DIR, load_university_list
+
 shanghai_tz = pytz.timezone("Asia/Shanghai")
 
+PATCH_STORE_DIR = "patch-store"
+METRICS_FILE = "metrics.json"
+AUTHORS_DIR = "authors"
+# generated files and directories covered by --precompress
+ARTIFACTS = ("summary.json", "summary.js", AUTHORS_DIR, SEARCH_DIR, "detail")
+LEGACY_ARTIFACTS = ("result.json", "result.js")
+# Rendered pages waiting for the writer thread of one detail worker
+WRITE_QUEUE_SIZE = 16
+# patches per page of generate_html_page() and of direct generate_all_html_files() calls
+DETAIL_PAGE_SIZE = 10
+# the pipeline lays out pages by bytes and cuts patches above the cap short
+DETAIL_PAGE_BYTES = 512 * 1024
+DETAIL_PATCH_CAP = 128 * 1024
+FULL_PATCH_DIR = os.path.join("detail", "_full")
+# placeholder for the localized link text to a capped patch's full text
+FULL_PATCH_LABEL = "<!--full-patch-->"
+PATCH_SHA = re.compile(r"commit ([0-9a-f]{40,64})\b")
+# bump when detail rendering or the fetched patch text changes in a way the
+# templates do not show; 2: patches are fetched without .mailmap
+DETAIL_RENDER_VERSION = 2
+
 DEFAULT_LOCALE = "en"
 SUPPORTED_LOCALES = ("en", "zh-CN", "zh-TW", "ja", "ko")
 MESSAGES = {
@@ -23,30 +121,35 @@ MESSAGES = {
         "patches_contributed_by": "Patches contributed by {name}",
         "prev": "Prev",
         "next": "Next",
+        "full_patch": "View the full patch",
     },
     "zh-CN": {
         "back_to_rankings": "返回排行榜",
         "patches_contributed_by": "{name} 贡献的补丁",
         "prev": "上一页",
         "next": "下一页",
+        "full_patch": "查看完整补丁",
     },
     "zh-TW": {
         "back_to_rankings": "返回排行榜",
         "patches_contributed_by": "{name} 貢獻的補丁",
         "prev": "上一頁",
         "next": "下一頁",
+        "full_patch": "查看完整補丁",
     },
     "ja": {
         "back_to_rankings": "ランキングに戻る",
         "patches_contributed_by": "{name} によるパッチ",
         "prev": "前へ",
         "next": "次へ",
+        "full_patch": "パッチ全文を表示",
     },
     "ko": {
         "back_to_rankings": "순위로 돌아가기",
         "patches_contributed_by": "{name}의 패치",
         "prev": "이전",
         "next": "다음",
+        "full_patch": "전체 패치 보기",
     },
 }
 
@@ -62,105 +165,542 @@ def detail_dir(locale):
     return os.path.join("detail", locale)
 
 
-def main():
+def shared_detail_dir():
+    """Return the directory for locale-independent detail content."""
+    return os.path.join("detail", "_shared")
+
+
+def main(argv=None):
+    """Run the pipeline and return the scanned commit count and stage timings."""
     parser = ArgumentParser()
     parser.add_argument("--branch", type=str, default="master")
     parser.add_argument("--path", type=str, default="./linux")
     parser.add_argument("--repo", type=str, default="Linux Mainline")
-
-    args = parser.parse_args()
+    parser.add_argument("--source", type=parse_source, action="append",
+                        metavar="PATH:BRANCH[:LABEL]",
+                        help="scan this repository branch instead of --path/--branch; "
+                             "repeat to combine sources, counting each commit once")
+    parser.add_argument("--dedupe-patch-id", action="store_true",
+                        help="with --source, also count commits with the same "
+                             "`git patch-id --stable` (cherry-picks, backports) once")
+    parser.add_argument("--extractor", choices=("log", "twophase", "batch", "gitpython"),
+                        default="log",
+                        help="read commits from one streaming `git log` (default), "
+                             "in an email-only pass followed by a stats pass over the "
+                             "university commits, through `git cat-file --batch` and "
+                             "`git diff-tree --stdin` coprocesses, or through "
+                             "per-commit GitPython calls")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"only scan commits added since the state saved in {STATE_FILE}")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"continue an interrupted scan from {CHECKPOINT_FILE}")
+    parser.add_argument("--checkpoint-every", type=int, default=0, metavar="COMMITS",
+                        help="save a scan checkpoint after this many commits (default: off)")
+    parser.add_argument("--checkpoint-seconds", type=float, default=CHECKPOINT_SECONDS,
+                        help="save a scan checkpoint after this many seconds; 0 disables "
+                             f"(default {CHECKPOINT_SECONDS})")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="scan history shards and render detail pages "
+                             "in this many worker processes")
+    parser.add_argument("--university-list", type=str, default=UNIVERSITY_CACHE_DIR,
+                        help="university list JSON file, or cache directory for the "
+                             f"downloaded list (default: {UNIVERSITY_CACHE_DIR})")
+    parser.add_argument("--slices", action="store_true",
+                        help=f"also write per-year, per-month and per-release rankings and "
+                             f"monthly trends to {SLICES_DIR}/")
+    parser.add_argument("--release-tags", type=str, default=RELEASE_TAG_PATTERN,
+                        help="regular expression selecting the release tags for --slices")
+    parser.add_argument("--search-index", action="store_true",
+                        help=f"also write a sharded search index of commit summaries, authors "
+                             f"and domains to {SEARCH_DIR}/")
+    parser.add_argument("--legacy-result", action="store_true",
+                        help="also write the single-file result.json and result.js")
+    parser.add_argument("--compact", action="store_true",
+                        help="write minified JSON/JS instead of indented output")
+    parser.add_argument("--precompress", action="store_true",
+                        help="write .gz (and .br with brotli installed) next to every artifact")
+    parser.add_argument("--profile", action="store_true",
+                        help="print per-stage time, CPU, throughput, lifetime peak RSS and git "
+                             f"process counts and write them to {METRICS_FILE}")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="with --profile, also trace allocations with tracemalloc")
+    parser.add_argument("--profile-scan", type=str, metavar="FILE",
+                        help="write a cProfile dump of the commit scan to FILE")
+    parser.add_argument("--detail-format", choices=("html", "shared", "store"), default="html",
+                        help="write full pages per locale (default), thin locale pages over "
+                             "content shared in detail/_shared/, or a compressed patch store in "
+                             "detail/_store/ read by one detail/view.html (needs HTTP)")
+    parser.add_argument("--page-bytes", type=int, default=DETAIL_PAGE_BYTES,
+                        help="byte budget of the patches shown on one detail page "
+                             f"(default {DETAIL_PAGE_BYTES})")
+    parser.add_argument("--patch-cap", type=int, default=DETAIL_PATCH_CAP,
+                        help=f"show at most this many bytes of a patch on its page and link "
+                             f"the full text in {FULL_PATCH_DIR}/; 0 disables "
+                             f"(default {DETAIL_PATCH_CAP}, not used by the store format)")
+    parser.add_argument("--rebuild-detail", action="store_true",
+                        help=f"render every detail page instead of only those whose "
+                             f"inputs changed since {MANIFEST_FILE} was written, or "
+                             f"rebuild the patch store instead of reusing {STORE_INDEX_FILE}")
+
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.page_bytes < 1 or args.patch_cap < 0:
+        parser.error("--page-bytes must be positive and --patch-cap not negative")
+    if args.jobs > 1 and args.extractor == "gitpython":
+        parser.error("--jobs requires the log extractor")
+    if args.source and (args.incremental or args.extractor != "log"):
+        parser.error("--source requires the log extractor and no --incremental")
+    if args.resume and (args.source or args.jobs > 1 or args.extractor == "twophase"):
+        parser.error("--resume requires a serial scan without --source, --jobs or twophase")
+    if args.checkpoint_every < 0 or args.checkpoint_seconds < 0:
+        parser.error("--checkpoint-every and --checkpoint-seconds must not be negative")
+    if args.dedupe_patch_id and not args.source:
+        parser.error("--dedupe-patch-id requires --source")
+    if args.jobs > 1 and args.extractor == "twophase":
+        print("--jobs does not shard the twophase scan, it only renders the detail pages "
+              "in parallel")
     branch = args.branch
     path = args.path
     repo_name = args.repo
 
-    repo = git.Repo(path)
+    timer = StageTimer()
+    if args.profile and args.profile_memory:
+        tracemalloc.start()
 
     print("Getting university list...")
-    university_list: list = requests.get(
-        "https://github.com/Hipo/university-domains-list/raw/master/world_universities_and_domains.json",
-        timeout=(5, 10)
-    ).json()
-
-    # assemble all domains into one set
-    all_domains = set(d for u in university_list for d in u["domains"])
-    # speed up domain check by caching
-    non_university_domain_cache = set()
-
-    print("Getting commits list...")
-    commits = list(repo.iter_commits(branch))
-
-    meta = {
-        "update": datetime.now(shanghai_tz).isoformat(),
-        "repo": repo_name,
-        "branch": branch,
-        "commit": repo.commit(branch).hexsha[0:12],
+    timer.begin("university_list")
+    university_list, domain_index, university_digest = load_university_list(
+        args.university_list
+    )
+    timer.add_items(len(university_list))
+
+    meta = {"update": datetime.now(shanghai_tz).isoformat()}
+    base = None
+    checkpoint = resumed = None
+    if args.source:
+        sources = resolve_sources(args.source)
+        meta.update(sources_meta(sources))
+    else:
+        repo = open_repo(path)
+        head = repo.commit(branch).hexsha
+        meta.update({
+            "repo": repo_name,
+            "branch": branch,
+            "commit": head[0:12],
+        })
+        if args.incremental:
+            base = incremental_base(load_state(), repo, branch, university_digest)
+        rev = f'{base["commit"]}..{head}' if base else head
+        # only serial scans visit the commits in an order a checkpoint can resume from
+        if args.jobs == 1 and args.extractor != "twophase":
+            key = {"rev": rev, "extractor": args.extractor, "universities": university_digest}
+            resumed = resume_point(load_checkpoint(), key) if args.resume else None
+            checkpoint = Checkpointer(CHECKPOINT_FILE, key, args.checkpoint_every,
+                                      args.checkpoint_seconds, resumed)
+    if args.detail_format == "store":
+        meta["detail_viewer"] = VIEWER_FILE.replace(os.sep, "/")
+
+    scan_start = time.perf_counter()
+    scan_profiler = cProfile.Profile() if args.profile_scan else None
+    if scan_profiler:
+        scan_profiler.enable()
+    if args.source:
+        timer.begin("scan")
+        results, scanned, commit_paths, duplicates = scan_sources(
+            sources, domain_index, args.dedupe_patch_id
+        )
+        timer.add_items(scanned)
+        print(f"Skipped {duplicates} commits already counted for another source")
+    else:
+        results, scanned = scan_repository(
+            repo, path, rev, args.extractor, args.jobs, domain_index, timer,
+            checkpoint, checkpoint_results(resumed) if resumed else None,
+        )
+    scan_seconds = time.perf_counter() - scan_start
+    if scan_profiler:
+        scan_profiler.disable()
+        scan_profiler.dump_stats(args.profile_scan)
+        print(f"Scan profile saved to {args.profile_scan}")
+    print(f"Scanned {scanned} commits in {scan_seconds:.1f}s "
+          f"({scanned / max(scan_seconds, 1e-9):.0f} commits/s)")
+
+    timer.begin("state")
+    if base:
+        results = merge_results(results, base)
+
+    if not args.source:
+        save_state({
+            "branch": branch,
+            "commit": head,
+            "universities": university_digest,
+            **results,
+        })
+        if checkpoint:
+            checkpoint.remove()
+    result_patches = results["patches"]
+    result_lines = results["lines"]
+    result_authors = results["authors"]
+    result_shas = results["shas"]
+
+    # Run the processing
+    timer.begin("process_results")
+    result = process_results(
+        result_patches, result_lines, result_authors, university_list, domain_index
+    )
+    timer.add_items(len(result))
+
+    timer.begin("write_results")
+    write_sharded_result_files({"meta": meta, "data": result}, compact=args.compact)
+    if args.legacy_result:
+        write_result_files({"meta": meta, "data": result}, compact=args.compact)
+    timer.add_items(len(result))
+
+    if args.slices:
+        timer.begin("slices")
+        if args.source:
+            repo_shas = {}
+            for sha, repo_path in commit_paths.items():
+                repo_shas.setdefault(repo_path, []).append(sha)
+        else:
+            repo_shas = {path: [sha for shas in result_shas.values() for sha in shas]}
+        releases = {}
+        for repo_path, shas in repo_shas.items():
+            releases.update(map_releases(repo_path, shas, args.release_tags))
+        slice_count = write_slice_files(
+            rank_slices(bucket_commits(result_authors, releases), result, university_list,
+                        domain_index),
+            releases, monthly_trends(result), compact=args.compact,
+        )
+        timer.add_items(slice_count)
+
+    if args.search_index:
+        timer.begin("search_index")
+        search_start = time.perf_counter()
+        stats = write_search_index(result, compact=args.compact)
+        print(f'Search index: {stats["tokens"]} tokens in {stats["shards"]} shards, '
+              f'{stats["bytes"]:,} bytes, built in {time.perf_counter() - search_start:.1f}s')
+        timer.add_items(stats["tokens"])
+    else:
+        # an index of an earlier run would point at ids that may have moved
+        shutil.rmtree(SEARCH_DIR, ignore_errors=True)
+
+    def fetch_patches(shas_map, patch_store):
+        if args.source:
+            store_source_patches(shas_map, commit_paths, patch_store)
+        elif args.extractor == "gitpython":
+            for key, shas in shas_map.items():
+                for sha in shas:
+                    patch_store.append(key, repo.git.show(*SHOW_OPTIONS, sha))
+        else:
+            store_patches(path, shas_map, patch_store)
+
+    if args.detail_format == "store":
+        write_detail_store(result, result_shas, fetch_patches, args, timer)
+    else:
+        write_detail_pages(result, result_shas, fetch_patches, args, timer)
+
+    if args.precompress:
+        formats = available_formats()
+        if "br" not in formats:
+            print("brotli is not installed, writing .gz only")
+        print("Precompressing artifacts...")
+        timer.begin("precompress")
+        artifacts = ARTIFACTS + (LEGACY_ARTIFACTS if args.legacy_result else ())
+        if args.slices:
+            artifacts += (SLICES_DIR,)
+        report, seconds = precompress(artifacts, formats, jobs=args.jobs)
+        for line in format_report(report, seconds):
+            print(line)
+        timer.add_items(sum(row["files"] for row in report.values()))
+    timer.end()
+
+    if args.profile:
+        write_metrics(timer, meta, args)
+    return {"scanned": scanned, "stages": timer.seconds}
+
+
+def write_metrics(timer, meta, args):
+    """Print the stage metrics table and save it to metrics.json."""
+    metrics = {"meta": meta, "options": vars(args), **timer.metrics()}
+    if tracemalloc.is_tracing():
+        metrics["top_allocations"] = top_allocations()
+        tracemalloc.stop()
+    for line in format_metrics(metrics):
+        print(line)
+    with open(METRICS_FILE, "w", encoding="utf-8") as file:
+        json.dump(metrics, file, ensure_ascii=False, indent=2)
+    print(f"Metrics saved to {METRICS_FILE}")
+
+
+def scan_repository(repo, path, rev, extractor, jobs, domain_index, timer,
+                    checkpoint=None, resumed=None):
+    """Run the enumerate and scan stages over rev and return (results, scanned).
+
+    Enumeration only counts the commits for the progress total; every
+    extractor then streams the history, so work starts with the first
+    commit and memory does not grow with the length of the history.
+
+    Serial scans hand every commit to checkpoint. With the aggregates of a
+    checkpoint as resumed, they skip the checkpoint.position commits it
+    covers and continue from there; scanned counts only the commits read.
+    """
+    skip = checkpoint.position if checkpoint else 0
+    timer.begin("enumerate")
+    total = count_commits(path, rev)
+    print("Total commits: ", total)
+    timer.add_items(total)
+    if extractor == "gitpython":
+        timer.begin("scan")
+        with tqdm(total=total, initial=skip) as progress:
+            results, scanned = scan_gitpython(repo.iter_commits(rev, skip=skip), domain_index,
+                                              progress, resumed, checkpoint)
+        timer.add_items(scanned)
+    elif extractor == "twophase":
+        # phase 1 streams only `%H %ae` and keeps the university commits
+        timer.begin("scan")
+        email_start = time.perf_counter()
+        with tqdm(total=total) as progress:
+            matched, scanned = match_commits(
+                iter_commit_emails(path, rev), domain_index, progress
+            )
+        print(f"Email pass: {len(matched)} of {scanned} commits from universities "
+              f"in {time.perf_counter() - email_start:.1f}s")
+        # phase 2 reads the stats of the matched commits only
+        stats_start = time.perf_counter()
+        results = scan_matched(path, matched)
+        timer.add_items(scanned)
+        print(f"Stats pass: {len(matched)} commits in "
+              f"{time.perf_counter() - stats_start:.1f}s")
+    else:
+        timer.begin("scan")
+        if jobs > 1:
+            shard_scanner = scan_batch_shard if extractor == "batch" else scan_shard
+            results, scanned = scan_sharded(
+                path, rev, total, jobs, domain_index, shard_scanner
+            )
+        else:
+            with tqdm(total=total, initial=skip) as progress:
+                if extractor == "batch":
+                    results, scanned = scan_batch(path, rev, domain_index, skip=skip,
+                                                  progress=progress, results=resumed,
+                                                  checkpoint=checkpoint)
+                else:
+                    results, scanned = scan_records(
+                        iter_log_commits(path, rev, skip=skip), domain_index, progress,
+                        resumed, checkpoint
+                    )
+        timer.add_items(scanned)
+    if checkpoint and checkpoint.written:
+        stats = checkpoint.stats()
+        timer.note("checkpoints", stats)
+        written, size, seconds = stats["written"], stats["bytes"], stats["seconds"]
+        print(f"Checkpoints: {written} written, {size:,} bytes in {seconds:.2f}s "
+              f"({seconds / max(timer.elapsed(), 1e-9):.1%} of the scan)")
+    return results, scanned
+
+
+def write_detail_pages(result, shas_map, fetch_patches, args, timer):
+    """Fetch the patches of the changed detail pages and render those pages.
+
+    fetch_patches(shas_map, patch_store) streams the `git show` text of the
+    SHAs into patch_store under their keys. Pages are laid out by the byte
+    size of their patches; sizes saved in the manifest spare refetching
+    known commits just to measure them, as long as they were fetched by the
+    same DETAIL_RENDER_VERSION.
+    """
+    print("Fetching patches...")
+    timer.begin("fetch_patches")
+    shared = args.detail_format == "shared"
+    old_manifest = load_manifest(MANIFEST_FILE)
+    known = {}
+    if old_manifest and old_manifest["settings"].get("render") == DETAIL_RENDER_VERSION:
+        known = old_manifest["sizes"]
+    shown = [sha for item in result for sha in item_shas(item, shas_map)]
+    result_detail = PatchStore(PATCH_STORE_DIR)
+    unknown = [sha for sha in shown if sha not in known]
+    # every patch is stored under its own SHA
+    fetch_patches({sha: [sha] for sha in unknown}, result_detail)
+    sizes = {sha: known[sha] if sha in known else result_detail.size(sha) for sha in shown}
+    layout = page_layout(result, shas_map, sizes, args.page_bytes, args.patch_cap)
+    manifest = build_manifest(
+        result, layout, detail_settings(args.detail_format, args.page_bytes, args.patch_cap),
+        sizes, shells=shared,
+    )
+    diff = None if args.rebuild_detail else diff_manifests(old_manifest, manifest)
+    changed, stale = diff if diff else (set(manifest["pages"]), set())
+    # only the patches of pages that are rendered again are fetched
+    refetch = [sha for key in changed for sha in layout_page(layout, key)
+               if not result_detail.count(sha)]
+    fetch_patches({sha: [sha] for sha in refetch}, result_detail)
+    patch_count = len(unknown) + len(refetch)
+    timer.add_items(patch_count)
+
+    print("Save patches to detail dir...")
+    timer.begin("detail_pages")
+    if os.path.exists(MANIFEST_FILE):
+        # until the new manifest is saved, a failed run forces a full rebuild
+        os.remove(MANIFEST_FILE)
+    if diff is None:
+        shutil.rmtree("detail", ignore_errors=True)
+        if os.path.exists(STORE_INDEX_FILE):
+            os.remove(STORE_INDEX_FILE)
+    else:
+        remove_detail_pages(stale, shared=shared)
+
+    generate_all_html_files(result, result_detail, jobs=args.jobs, shared=shared, pages=changed,
+                            layout=layout, patch_cap=args.patch_cap)
+    result_detail.remove()
+    oversized = {sha for sha, size in sizes.items() if args.patch_cap and size > args.patch_cap}
+    remove_full_patches(oversized)
+    save_manifest(manifest, MANIFEST_FILE)
+    print(f"Rendered {len(changed)} of {len(manifest['pages'])} detail pages, "
+          f"removed {len(stale)}")
+    print(page_size_report(layout, sizes, args.patch_cap, oversized))
+    timer.add_items(patch_count)
+
+
+def write_detail_store(result, shas_map, fetch_patches, args, timer):
+    """Add the patches of new commits to the detail store and write the viewer.
+
+    Patches already in the store are not fetched again, unless the store
+    was filled with other fetch settings; the page maps and detail/view.html
+    are rewritten on every run. Stored patches are shown whole, so pages are
+    laid out by their full size.
+    """
+    print("Fetching patches...")
+    timer.begin("fetch_patches")
+    shown = [sha for item in result for sha in item_shas(item, shas_map)]
+    store = DetailStore(STORE_DIR, None if args.rebuild_detail else load_store_index(STORE_INDEX_FILE),
+                        settings=store_settings())
+    missing = store.missing(shown)
+    # keyed by SHA, so every patch is appended under its own SHA
+    fetch_patches({sha: [sha] for sha in missing}, store)
+    timer.add_items(len(missing))
+
+    print("Save patches to detail store...")
+    timer.begin("detail_pages")
+    for stale in (MANIFEST_FILE, STORE_INDEX_FILE):
+        # until the new index is saved, a failed run forces a full rebuild
+        if os.path.exists(stale):
+            os.remove(stale)
+    for locale in SUPPORTED_LOCALES:
+        shutil.rmtree(detail_dir(locale), ignore_errors=True)
+    shutil.rmtree(shared_detail_dir(), ignore_errors=True)
+    moved = store.finish(shown)
+    sizes = {sha: store.locations[sha][2] for sha in shown}
+    layout = page_layout(result, shas_map, sizes, args.page_bytes)
+    page_bytes = write_item_pages(store, result, layout)
+    with open(VIEWER_FILE, "w", encoding="utf-8") as file:
+        file.write(render_viewer(DETAIL_PAGE_CSS, MESSAGES))
+    store.save(STORE_INDEX_FILE)
+    print(f"Stored {len(missing)} new of {len(shown)} patches, repacked {moved}; "
+          f"{len(store.chunks)} chunks ({store.written} written), "
+          f"{store.disk_bytes() + page_bytes:,} bytes in {len(store.chunks) + len(result) + 1} files")
+    print(page_size_report(layout, sizes))
+    timer.add_items(len(missing))
+
+
+def layout_page(layout, key):
+    """Return the SHAs of the page behind a manifest page key; shells have none."""
+    item_id, page = key.split("/")
+    return [] if page == "shell" else layout[int(item_id)][int(page) - 1]
+
+
+def page_size_report(layout, sizes, patch_cap=None, oversized=()):
+    """Summarize the byte sizes of the laid out pages, as shown (capped) patches."""
+    page_sizes = [
+        sum(min(sizes[sha], patch_cap) if patch_cap else sizes[sha] for sha in shas)
+        for pages in layout.values() for shas in pages
+    ]
+    stats = "  ".join(f"{name} {value:,}" for name, value in percentiles(page_sizes).items())
+    report = f"Page bytes over {len(page_sizes)} pages: {stats}"
+    if oversized:
+        report += f"; {len(oversized)} patches over {patch_cap:,} bytes capped"
+    return report
+
+
+def store_patches(repo_path, shas_map, patch_store):
+    """Stream the `git show` text of every commit in shas_map into patch_store."""
+    matched = [(domain, sha) for domain, shas in shas_map.items() for sha in shas]
+    patches = iter_show_patches(repo_path, [sha for _, sha in matched])
+    for (domain, _), (_, patch) in zip(matched, patches):
+        patch_store.append(domain, patch)
+
+
+def store_source_patches(shas_map, commit_paths, patch_store):
+    """store_patches() for commits read from several repositories.
+
+    Every repository gets one `git show --stdin` stream of its own commits,
+    which are consumed in shas_map order so the store keeps that order.
+    """
+    repo_shas = {}
+    for shas in shas_map.values():
+        for sha in shas:
+            repo_shas.setdefault(commit_paths[sha], []).append(sha)
+    streams = {
+        repo_path: iter_show_patches(repo_path, shas) for repo_path, shas in repo_shas.items()
     }
+    for domain, shas in shas_map.items():
+        for sha in shas:
+            _, patch = next(streams[commit_paths[sha]])
+            patch_store.append(domain, patch)
 
-    # exec command and turn pipe to iterator
-    result_patches = {}
-    result_lines = {}
-    result_detail = {}
-    result_authors = {}
-    print("Total commits: ", len(commits))
-    for commit in tqdm(commits):
-        email = commit.author.email
-        if not email:
-            continue
-        # get email domain
-        email_domain = email.split("@")[-1]
-        # check if the domain is in the non_university_domain cache
-        if email_domain in non_university_domain_cache:
-            continue
-        if email_domain not in all_domains:
-            # check if its parent domains belong to a university
-            parts = email_domain.split(".")
-            parent_domains = [".".join(parts[i:]) for i in range(0, len(parts))]
-            if all(parent not in all_domains for parent in parent_domains):
-                non_university_domain_cache.add(email_domain)
-                continue
 
-        # cache commit stats
-        commit_stats = commit.stats.total
-
-        # initialize result for this domain if not exists
-        if email_domain not in result_patches:
-            result_patches[email_domain] = 0
-            result_lines[email_domain] = 0
-            result_detail[email_domain] = []
-            result_authors[email_domain] = {}
-
-        result_patches[email_domain] += 1
-        result_lines[email_domain] += commit_stats["lines"]
-        result_detail[email_domain].append(repo.git.show(commit.hexsha))
-
-        # update author information
-        if email not in result_authors[email_domain]:
-            result_authors[email_domain][email] = [commit.author.name, 0, []]
-        result_authors[email_domain][email][1] += 1
-        result_authors[email_domain][email][2].append(
-            {
-                "commit": commit.hexsha,
-                "summary": commit.summary,
-                "date": commit.authored_datetime.isoformat(),
-                "files": commit_stats["files"],
-                "lines": f'-{commit_stats["deletions"]}/+{commit_stats["insertions"]}'
-            }
-        )
+def detail_settings(detail_format, page_bytes=DETAIL_PAGE_BYTES, patch_cap=DETAIL_PATCH_CAP,
+                    locales=SUPPORTED_LOCALES):
+    """Return the inputs shared by every detail page, for the page manifest."""
+    return {
+        "render": DETAIL_RENDER_VERSION,
+        "templates": digest(DETAIL_PAGE_TEMPLATE, DETAIL_SHELL_TEMPLATE, DETAIL_PAGE_CSS,
+                            DETAIL_VIEWER_JS, MESSAGES),
+        "format": detail_format,
+        "locales": list(locales),
+        "page_bytes": page_bytes,
+        "patch_cap": patch_cap,
+    }
 
-    # Run the processing
-    result = process_results(result_patches, result_lines, result_authors, university_list)
 
-    write_result_files({"meta": meta, "data": result})
+def store_settings():
+    """Return the inputs of the patch texts kept in the detail store."""
+    return {"render": DETAIL_RENDER_VERSION, "show": list(SHOW_OPTIONS)}
+
+
+def remove_full_patches(keep):
+    """Delete the full texts of capped patches whose SHA is not in keep."""
+    if not os.path.isdir(FULL_PATCH_DIR):
+        return
+    for name in os.listdir(FULL_PATCH_DIR):
+        if name.split(".", 1)[0] not in keep:
+            os.remove(os.path.join(FULL_PATCH_DIR, name))
 
-    print("Save patches to detail dir...")
-    shutil.rmtree("detail", ignore_errors=True)
 
-    generate_all_html_files(result, result_detail)
+def detail_page_paths(key, locales=SUPPORTED_LOCALES, shared=False):
+    """Return the files written for one manifest page key."""
+    item_id, page = key.split("/")
+    if page == "shell":
+        return [os.path.join(detail_dir(locale), detail_page_href(item_id, 1)) for locale in locales]
+    if shared:
+        return [os.path.join(shared_detail_dir(), detail_content_href(item_id, int(page)))]
+    return [os.path.join(detail_dir(locale), detail_page_href(item_id, int(page)))
+            for locale in locales]
 
 
+def remove_detail_pages(keys, locales=SUPPORTED_LOCALES, shared=False):
+    """Delete the files of stale manifest page keys and their compressed siblings."""
+    for key in keys:
+        for path in detail_page_paths(key, locales, shared):
+            for file_path in (path, *(path + suffix for suffix in COMPRESSED_SUFFIXES)):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+
 
 def get_university(domain_name, uni_list):
-    """Get the university information for a given domain."""
+    """Get the university information for a given domain.
+
+    Linear reference implementation; the pipeline uses the prebuilt index in
+    domain_index.lookup_university(), which returns the same record.
+    """
     # Check exact domain match first
     for university in uni_list:
         if domain_name in university["domains"]:
@@ -176,29 +716,110 @@ def get_university(domain_name, uni_list):
     return None
 
 
-def write_result_files(result_payload):
-    """Write result data as JSON and as a local-file-friendly JS payload."""
-    result_json = json.dumps(result_payload, ensure_ascii=False, indent=2)
-    with open("result.json", "w", encoding="utf-8") as file:
-        file.write(result_json)
+def dump_json(value, compact=False):
+    """Serialize value for a generated file, minified when compact is set.
 
-    with open("result.js", "w", encoding="utf-8") as file:
-        file.write(f"window.__LINUX_EDU_RANK_RESULT__ = {result_json};\n")
+    Author and Commit records are converted to their result.json form here.
+    """
+    return json_encoder(compact).encode(value)
+
+
+def write_result_files(result_payload, compact=False):
+    """Write result data as JSON and as a local-file-friendly JS payload.
+
+    Both files are streamed university by university in one pass.
+    """
+    write_json_and_js(result_payload, "result.json", "result.js",
+                      "window.__LINUX_EDU_RANK_RESULT__ = ", compact)
 
     print("Result saved to result.json and result.js")
 
 
+def write_sharded_result_files(result_payload, compact=False):
+    """Write a compact ranking summary plus one author shard per university.
+
+    summary.json/summary.js hold every field except the author lists, which
+    go to authors/<id>.json and authors/<id>.js so the page can load them
+    only when a row is expanded.
+    """
+    shutil.rmtree(AUTHORS_DIR, ignore_errors=True)
+    os.makedirs(AUTHORS_DIR)
+
+    summary = []
+    for item in result_payload["data"]:
+        summary.append({key: value for key, value in item.items() if key != "authors"})
+        # one author at a time
+        write_json_and_js(
+            item["authors"],
+            os.path.join(AUTHORS_DIR, f'{item["id"]}.json'),
+            os.path.join(AUTHORS_DIR, f'{item["id"]}.js'),
+            "(window.__LINUX_EDU_RANK_AUTHORS__ = window.__LINUX_EDU_RANK_AUTHORS__ || {})"
+            f'[{item["id"]}] = ',
+            compact, depth=1,
+        )
+
+    write_json_and_js({"meta": result_payload["meta"], "data": summary}, "summary.json",
+                      "summary.js", "window.__LINUX_EDU_RANK_SUMMARY__ = ", compact)
+
+    print(f"Summary saved to summary.json and summary.js, authors to {AUTHORS_DIR}/")
+
+
+def rank_slices(buckets, ranked_results, uni_list, domain_index):
+    """Rank every slice bucket and keep the compact per-university fields.
+
+    Entries link to the all-time ranking through its id.
+    """
+    ids = {item["name"]: item["id"] for item in ranked_results}
+    rankings = {}
+    for kind, kind_buckets in buckets.items():
+        rankings[kind] = {}
+        for key, (patches_map, lines_map, authors_map) in kind_buckets.items():
+            rankings[kind][key] = [
+                {
+                    "id": ids[item["name"]],
+                    "rank": item["rank"],
+                    "name": item["name"],
+                    "count": item["count"],
+                    "lines": item["lines"],
+                    "contributor_count": item["contributor_count"],
+                }
+                for item in process_results(
+                    patches_map, lines_map, authors_map, uni_list, domain_index
+                )
+            ]
+    return rankings
+
+
+def write_slice_files(rankings, releases, trends, compact=False):
+    """Write slices/index.json, one ranking file per slice and slices/trends.json.
+
+    Returns the number of slice rankings written.
+    """
+    shutil.rmtree(SLICES_DIR, ignore_errors=True)
+    index = {}
+    for kind in SLICE_KINDS:
+        keys = ordered_keys(kind, rankings[kind], releases)
+        index[kind] = keys
+        os.makedirs(os.path.join(SLICES_DIR, kind))
+        for key in keys:
+            with open(os.path.join(SLICES_DIR, kind, f"{key}.json"), "w", encoding="utf-8") as file:
+                file.write(dump_json({"kind": kind, "key": key, "data": rankings[kind][key]},
+                                     compact))
+
+    with open(os.path.join(SLICES_DIR, "index.json"), "w", encoding="utf-8") as file:
+        file.write(dump_json(index, compact))
+    with open(os.path.join(SLICES_DIR, "trends.json"), "w", encoding="utf-8") as file:
+        file.write(dump_json(trends, compact=True))
+
+    count = sum(len(keys) for keys in index.values())
+    print(f"{count} slice rankings and monthly trends saved to {SLICES_DIR}/")
+    return count
+
+
 def transform_author_data(authors_map, target_domain):
-    """Transform author data for a specific domain into a structured format."""
-    authors = []
-    for author_email, author_info in authors_map.get(target_domain, {}).items():
-        authors.append({
-            "email": author_email,
-            "name": author_info[0],
-            "count": author_info[1],
-            "commits": author_info[2],
-        })
-    return sorted(authors, key=lambda x: x["count"], reverse=True)
+    """Return the Author records of a domain, most commits first."""
+    return sorted(authors_map.get(target_domain, {}).values(),
+                  key=lambda author: author.count, reverse=True)
 
 
 def create_domain_result(domain_name, patches_count, lines_count, university, authors_map):
@@ -226,7 +847,10 @@ def create_domain_result(domain_name, patches_count, lines_count, university, au
 
 
 def merge_university_results(results):
-    """Merge results from the same university."""
+    """Merge results from the same university.
+
+    The first entry of each university is extended in place.
+    """
     merged_results = {}
 
     for item in results:
@@ -234,7 +858,7 @@ def merge_university_results(results):
         domain_name = item["domains"][0]  # Each item has exactly one domain at this point
 
         if university_name not in merged_results:
-            merged_results[university_name] = item.copy()
+            merged_results[university_name] = item
         else:
             # Merge with existing entry
             existing = merged_results[university_name]
@@ -243,43 +867,37 @@ def merge_university_results(results):
                 existing["authors"].extend(item["authors"])
                 existing["count"] += item["count"]
                 existing["lines"] += item["lines"]
-                existing["authors"].sort(key=lambda x: x["count"], reverse=True)
+                existing["authors"].sort(key=lambda author: author.count, reverse=True)
 
     return list(merged_results.values())
 
 
 def add_rankings(sorted_results):
-    """Add ID and rank fields to sorted results."""
-    # Add sequential IDs
-    results_with_ids = []
+    """Add ID, rank and contributor_count fields to sorted results in place."""
+    previous = None
     for index, item in enumerate(sorted_results):
-        item_with_id = item.copy()
-        item_with_id["id"] = index + 1
-        results_with_ids.append(item_with_id)
-
-    # Add rankings (same count gets same rank)
-    results_with_ranks = []
-    for item in results_with_ids:
-        if not results_with_ranks or item["count"] != results_with_ranks[-1]["count"]:
-            rank = item["id"]
+        # Add sequential IDs
+        item["id"] = index + 1
+        # Add rankings (same count gets same rank)
+        if previous is None or item["count"] != previous["count"]:
+            item["rank"] = item["id"]
         else:
-            rank = results_with_ranks[-1]["rank"]
-
-        item_with_rank = item.copy()
-        item_with_rank["rank"] = rank
-        item_with_rank["contributor_count"] = len(item_with_rank["authors"])
-        results_with_ranks.append(item_with_rank)
+            item["rank"] = previous["rank"]
+        item["contributor_count"] = len(item["authors"])
+        previous = item
 
-    return results_with_ranks
+    return sorted_results
 
 
-def process_results(patches_map, lines_map, authors_map, uni_list):
+def process_results(patches_map, lines_map, authors_map, uni_list, domain_index=None):
     """Process raw results into final ranked format."""
     # Create initial results with university information
+    if domain_index is None:
+        domain_index = build_domain_index(uni_list)
     initial_results = []
     for domain_name, patches_count in patches_map.items():
         lines_count = lines_map[domain_name]
-        university = get_university(domain_name, uni_list)
+        university = lookup_university(domain_name, domain_index)
         result_item = create_domain_result(domain_name, patches_count, lines_count, university, authors_map)
         initial_results.append(result_item)
 
@@ -329,69 +947,39 @@ def escape_html_content(content):
                   .replace(">", "&gt;"))
 
 
-def generate_html_page(item_id, title, patches, page, page_size=10, locale=DEFAULT_LOCALE):
-    """Generate HTML pages for patches with pagination."""
-    total = len(patches)
-    page_num = (total + page_size - 1) // page_size  # Ceiling division
-
-    def get_href(page_num_local):
-        return f"{item_id}.html" if page_num_local == 1 else f"{item_id}_{page_num_local}.html"
-
-    start_idx = (page - 1) * page_size
-    end_idx = min(start_idx + page_size, total)
-    page_patches = patches[start_idx:end_idx]
-
-    pagination = create_pagination_html(page, page_num, get_href, locale)
-
-    # Create content
-    content_parts = []
-    for patch in page_patches:
-        escaped_patch = escape_html_content(patch)
-        content_parts.append(
-            f'<div class="patch-card"><pre>{escaped_patch}</pre></div>'
-        )
-    content = "\n".join(content_parts)
-
-    template = """<!DOCTYPE html>
-<html lang="{locale}">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title}</title>
-    <style>
-    * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-    body {{
+DETAIL_PAGE_CSS = """    * { margin: 0; padding: 0; box-sizing: border-box; }
+    body {
         background: #f0f2f5;
         font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto,
                      'Helvetica Neue', Arial, sans-serif;
         color: #262626;
-    }}
-    .detail-header {{
+    }
+    .detail-header {
         background: linear-gradient(135deg, #1a1a2e 0%, #16213e 50%, #0f3460 100%);
         color: #fff;
         padding: 36px 32px 32px;
         text-align: center;
-    }}
-    .detail-header h1 {{
+    }
+    .detail-header h1 {
         font-size: 22px;
         font-weight: 700;
         margin-bottom: 10px;
-    }}
-    .back-link {{
+    }
+    .back-link {
         display: inline-block;
         color: rgba(255,255,255,0.7);
         text-decoration: none;
         font-size: 14px;
         transition: color 0.2s;
-    }}
-    .back-link:hover {{ color: #fff; }}
-    .container {{
+    }
+    .back-link:hover { color: #fff; }
+    .container {
         max-width: 960px;
         margin: -16px auto 40px;
         padding: 0 20px;
         position: relative;
-    }}
-    .pagination {{
+    }
+    .pagination {
         background: #fff;
         border-radius: 8px;
         box-shadow: 0 1px 3px rgba(0,0,0,0.08);
@@ -402,8 +990,8 @@ def generate_html_page(item_id, title, patches, page, page_size=10, locale=DEFAU
         flex-wrap: wrap;
         align-items: center;
         gap: 4px;
-    }}
-    .page-btn {{
+    }
+    .page-btn {
         display: inline-block;
         padding: 4px 12px;
         border-radius: 6px;
@@ -413,26 +1001,33 @@ def generate_html_page(item_id, title, patches, page, page_size=10, locale=DEFAU
         background: #f5f5f5;
         border: 1px solid #f0f0f0;
         transition: all 0.2s;
-    }}
-    a.page-btn:hover {{
+    }
+    a.page-btn:hover {
         color: #1677ff;
         border-color: #1677ff;
         background: #e6f4ff;
-    }}
-    .page-btn.current {{
+    }
+    .page-btn.current {
         background: #1677ff;
         color: #fff;
         border-color: #1677ff;
         font-weight: 600;
-    }}
-    .patch-card {{
+    }
+    .patch-card {
         background: #fff;
         border-radius: 8px;
         box-shadow: 0 1px 3px rgba(0,0,0,0.08);
         margin-bottom: 16px;
         overflow: hidden;
-    }}
-    .patch-card pre {{
+    }
+    .patch-truncated {
+        padding: 8px 20px;
+        border-top: 1px solid #f0f0f0;
+        font-size: 13px;
+        color: #8c8c8c;
+    }
+    .patch-truncated a { color: #1677ff; }
+    .patch-card pre {
         padding: 20px;
         margin: 0;
         font-family: 'SFMono-Regular', Consolas, 'Liberation Mono', Menlo, monospace;
@@ -442,14 +1037,23 @@ def generate_html_page(item_id, title, patches, page, page_size=10, locale=DEFAU
         white-space: pre-wrap;
         word-wrap: break-word;
         color: #333;
-    }}
-    @media (max-width: 576px) {{
-        .detail-header {{ padding: 24px 16px 20px; }}
-        .detail-header h1 {{ font-size: 18px; }}
-        .container {{ padding: 0 12px; }}
-        .patch-card pre {{ padding: 12px; font-size: 12px; }}
-    }}
-    </style>
+    }
+    @media (max-width: 576px) {
+        .detail-header { padding: 24px 16px 20px; }
+        .detail-header h1 { font-size: 18px; }
+        .container { padding: 0 12px; }
+        .patch-card pre { padding: 12px; font-size: 12px; }
+    }
+"""
+
+DETAIL_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="{locale}">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    <style>
+{style}    </style>
 </head>
 <body>
     <div class="detail-header">
@@ -468,50 +1072,337 @@ def generate_html_page(item_id, title, patches, page, page_size=10, locale=DEFAU
 </body>
 </html>"""
 
-    html_content = template.format(
+# Thin localized page for --detail-format shared. One shell per university
+# and locale; detail.js renders the pagination for ?page=N and loads that
+# page's patch content from detail/_shared/.
+DETAIL_SHELL_TEMPLATE = """<!DOCTYPE html>
+<html lang="{locale}">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    <link rel="stylesheet" href="../_shared/detail.css">
+</head>
+<body data-item-id="{item_id}" data-page-num="{page_num}" data-prev="{prev}" data-next="{next}"
+      data-full-patch="{full_patch}">
+    <div class="detail-header">
+        <a class="back-link" href="../../index.html?lang={locale}">&larr; {back_to_rankings}</a>
+        <h1>{title}</h1>
+    </div>
+    <div class="container">
+        <div class="pagination"></div>
+        <div id="patches"></div>
+        <div class="pagination"></div>
+    </div>
+    <script src="../_shared/detail.js"></script>
+</body>
+</html>"""
+
+DETAIL_VIEWER_JS = """(function () {
+    var body = document.body;
+    var itemId = body.dataset.itemId;
+    var pageNum = parseInt(body.dataset.pageNum, 10);
+    var page = parseInt(new URLSearchParams(window.location.search).get("page"), 10) || 1;
+    page = Math.min(Math.max(page, 1), pageNum);
+
+    function href(i) {
+        return i === 1 ? itemId + ".html" : itemId + ".html?page=" + i;
+    }
+
+    function link(i, text) {
+        return "<a class='page-btn' href='" + href(i) + "'>" + text + "</a>";
+    }
+
+    var pagination = "";
+    if (page > 1) pagination += link(page - 1, "&lt;&lt;" + body.dataset.prev);
+    for (var i = 1; i <= pageNum; i++) {
+        pagination += i === page
+            ? "<span class='page-btn current'>[" + i + "]</span>"
+            : link(i, String(i));
+    }
+    if (page < pageNum) pagination += link(page + 1, body.dataset.next + "&gt;&gt;");
+    document.querySelectorAll(".pagination").forEach(function (element) {
+        element.innerHTML = pagination;
+    });
+
+    // A script tag (unlike fetch) also works for pages opened via file://
+    var script = document.createElement("script");
+    script.src = "../_shared/" + (page === 1 ? itemId : itemId + "_" + page) + ".js";
+    script.onload = function () {
+        document.getElementById("patches").innerHTML = window.__LINUX_EDU_RANK_PATCHES__ || "";
+        document.querySelectorAll(".patch-truncated a").forEach(function (element) {
+            element.textContent = body.dataset.fullPatch;
+        });
+    };
+    document.body.appendChild(script);
+})();
+"""
+
+
+def detail_page_href(item_id, page):
+    """Return the file name of a detail page."""
+    return f"{item_id}.html" if page == 1 else f"{item_id}_{page}.html"
+
+
+def detail_content_href(item_id, page):
+    """Return the file name of a page's shared patch content."""
+    return f"{item_id}.js" if page == 1 else f"{item_id}_{page}.js"
+
+
+def cap_patch(patch, patch_cap):
+    """Return (shown text, shown bytes, total bytes) of a patch over patch_cap bytes, else None.
+
+    The shown text ends at the last line break within the cap.
+    """
+    # a character takes at most four bytes in UTF-8
+    if not patch_cap or len(patch) * 4 <= patch_cap:
+        return None
+    data = patch.encode("utf-8", "surrogateescape")
+    if len(data) <= patch_cap:
+        return None
+    cut = data.rfind(b"\n", 0, patch_cap) + 1 or patch_cap
+    return data[:cut].decode("utf-8", "surrogateescape"), cut, len(data)
+
+
+def full_patch_name(patch):
+    """Return the file name of a capped patch's full text, named by its commit SHA."""
+    match = PATCH_SHA.match(patch)
+    if match:
+        return f"{match.group(1)}.txt"
+    return f'{hashlib.sha256(patch.encode("utf-8", "surrogateescape")).hexdigest()}.txt'
+
+
+def render_patch_content(page_patches, patch_cap=None, full_patches=None):
+    """Escape the patches of one page and join them into the page body.
+
+    Patches over patch_cap bytes are cut short and link to their full text;
+    (file name, patch) of each is appended to full_patches.
+    """
+    content_parts = []
+    for patch in page_patches:
+        capped = cap_patch(patch, patch_cap)
+        if capped is None:
+            escaped_patch = escape_html_content(patch)
+            content_parts.append(
+                f'<div class="patch-card"><pre>{escaped_patch}</pre></div>'
+            )
+            continue
+        shown, shown_bytes, total_bytes = capped
+        name = full_patch_name(patch)
+        if full_patches is not None:
+            full_patches.append((name, patch))
+        content_parts.append(
+            f'<div class="patch-card"><pre>{escape_html_content(shown)}</pre>'
+            f'<div class="patch-truncated">{shown_bytes:,} / {total_bytes:,} B &middot; '
+            f'<a href="../_full/{name}" target="_blank">{FULL_PATCH_LABEL}</a></div></div>'
+        )
+    return "\n".join(content_parts)
+
+
+def render_html_page(item_id, title, content, page, page_num, locale=DEFAULT_LOCALE):
+    """Wrap a prerendered page body in the localized page chrome."""
+    def get_href(page_num_local):
+        return detail_page_href(item_id, page_num_local)
+
+    pagination = create_pagination_html(page, page_num, get_href, locale)
+    if FULL_PATCH_LABEL in content:
+        content = content.replace(FULL_PATCH_LABEL, escape_html_content(message(locale, "full_patch")))
+
+    return DETAIL_PAGE_TEMPLATE.format(
         locale=locale,
         title=escape_html_content(title),
+        style=DETAIL_PAGE_CSS,
         pagination=pagination,
         content=content,
         back_to_rankings=message(locale, "back_to_rankings"),
     )
 
-    return html_content, get_href(page)
 
+def render_shell_page(item_id, title, page_num, locale=DEFAULT_LOCALE):
+    """Render the localized page that shows a university's shared patch content."""
+    return DETAIL_SHELL_TEMPLATE.format(
+        locale=locale,
+        title=escape_html_content(title),
+        item_id=item_id,
+        page_num=page_num,
+        prev=escape_html_content(message(locale, "prev")),
+        next=escape_html_content(message(locale, "next")),
+        full_patch=escape_html_content(message(locale, "full_patch")),
+        back_to_rankings=message(locale, "back_to_rankings"),
+    )
+
+
+def render_shared_content(content):
+    """Wrap a page body as a script that the shell pages can load from file://."""
+    return f"window.__LINUX_EDU_RANK_PATCHES__ = {json.dumps(content, ensure_ascii=False)};\n"
 
-def generate_all_html_files(processed_result, result_detailed, locales=SUPPORTED_LOCALES):
-    """Generate all HTML files for the results."""
-    for locale in locales:
-        os.makedirs(detail_dir(locale), exist_ok=True)
 
-    for item in processed_result:
-        domains = item["domains"]
-        item_id = item["id"]
-
-        # Collect all patches for this item
-        patches = []
-        for domain_name in domains:
-            patches.extend(result_detailed[domain_name])
-
-        # Generate paginated HTML files
-        page_size = 10
-        total_patches = len(patches)
-        page_num = (total_patches + page_size - 1) // page_size
-
-        for locale in locales:
-            title = message(locale, "patches_contributed_by").format(name=item["name"])
-            for page in range(1, page_num + 1):
-                html_content, filename = generate_html_page(
-                    item_id, title, patches, page, page_size, locale
+def generate_html_page(item_id, title, patches, page, page_size=DETAIL_PAGE_SIZE,
+                       locale=DEFAULT_LOCALE):
+    """Generate HTML pages for patches with pagination."""
+    total = len(patches)
+    page_num = (total + page_size - 1) // page_size  # Ceiling division
+
+    start_idx = (page - 1) * page_size
+    end_idx = min(start_idx + page_size, total)
+    content = render_patch_content(patches[start_idx:end_idx])
+
+    html_content = render_html_page(item_id, title, content, page, page_num, locale)
+    return html_content, detail_page_href(item_id, page)
+
+
+def write_html_file(output_path, html_content):
+    """Write one HTML page, replacing characters UTF-8 cannot encode."""
+    with open(output_path, "w", encoding="utf-8") as file:
+        try:
+            file.write(html_content)
+        except UnicodeEncodeError:
+            safe_content = html_content.encode("utf-8", "replace").decode("utf-8")
+            file.write(safe_content)
+
+
+def drain_writes(writes, errors):
+    """Write queued (path, html) pages until a None sentinel arrives."""
+    while True:
+        item = writes.get()
+        if item is None:
+            return
+        if errors:
+            continue  # keep draining so the producer never blocks
+        try:
+            write_html_file(*item)
+        except OSError as error:
+            errors.append(error)
+
+
+def generate_university_pages(item_id, name, patches, locales=SUPPORTED_LOCALES,
+                              page_size=DETAIL_PAGE_SIZE, shared=False, page_num=None, shells=True,
+                              patch_cap=None):
+    """Render and write every detail page of one university.
+
+    Each page's patches are read and escaped once and the body is shared by
+    all locales; only the title, back link and pagination differ. Pages go
+    through a bounded queue to a writer thread so rendering overlaps I/O.
+    With shared=True each body is written once to detail/_shared/ and each
+    locale only gets one thin shell page for the whole university.
+
+    With page_num set, patches maps only the pages to render to their
+    patches, and shells=False leaves the shell pages as they are. Patches
+    over patch_cap bytes are cut short, and their full text is written once
+    to detail/_full/.
+    """
+    if page_num is None:
+        page_num = (len(patches) + page_size - 1) // page_size
+        pages = ((page, patches[(page - 1) * page_size:page * page_size])
+                 for page in range(1, page_num + 1))
+    else:
+        pages = ((page, patches[page][:]) for page in sorted(patches))
+    titles = {
+        locale: message(locale, "patches_contributed_by").format(name=name)
+        for locale in locales
+    }
+
+    writes = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+    errors = []
+    writer = threading.Thread(target=drain_writes, args=(writes, errors))
+    writer.start()
+    try:
+        if shared and page_num and shells:
+            for locale in locales:
+                output_path = os.path.join(detail_dir(locale), detail_page_href(item_id, 1))
+                writes.put((output_path, render_shell_page(
+                    item_id, titles[locale], page_num, locale
+                )))
+        for page, page_patches in pages:
+            full_patches = []
+            content = render_patch_content(page_patches, patch_cap, full_patches)
+            for full_name, patch in full_patches:
+                full_path = os.path.join(FULL_PATCH_DIR, full_name)
+                if not os.path.exists(full_path):
+                    writes.put((full_path, patch))
+            if shared:
+                content_path = os.path.join(
+                    shared_detail_dir(), detail_content_href(item_id, page)
                 )
+                writes.put((content_path, render_shared_content(content)))
+                continue
+            for locale in locales:
+                html_content = render_html_page(
+                    item_id, titles[locale], content, page, page_num, locale
+                )
+                output_path = os.path.join(detail_dir(locale), detail_page_href(item_id, page))
+                writes.put((output_path, html_content))
+    finally:
+        writes.put(None)
+        writer.join()
+    if errors:
+        raise errors[0]
+
+
+def generate_all_html_files(processed_result, result_detailed, locales=SUPPORTED_LOCALES,
+                            jobs=1, shared=False, pages=None, layout=None, patch_cap=None):
+    """Generate all HTML files for the results.
+
+    With jobs > 1 universities are rendered concurrently in worker processes.
+    With shared=True patch content is written once for all locales. With
+    pages (a set of manifest page keys) only those pages are written; layout
+    maps each id to the SHAs of its pages, and result_detailed is a
+    PatchStore holding every patch under its SHA. Without pages, every
+    university gets pages of DETAIL_PAGE_SIZE patches.
+    """
+    for locale in locales:
+        os.makedirs(detail_dir(locale), exist_ok=True)
+    if patch_cap:
+        os.makedirs(FULL_PATCH_DIR, exist_ok=True)
+    if shared:
+        os.makedirs(shared_detail_dir(), exist_ok=True)
+        with open(os.path.join(shared_detail_dir(), "detail.css"), "w", encoding="utf-8") as file:
+            file.write(DETAIL_PAGE_CSS)
+        with open(os.path.join(shared_detail_dir(), "detail.js"), "w", encoding="utf-8") as file:
+            file.write(DETAIL_VIEWER_JS)
+
+    def tasks():
+        for item in processed_result:
+            domains = item["domains"]
+            if pages is not None:
+                item_layout = layout.get(item["id"], [])
+                page_num = len(item_layout)
+                item_pages = {
+                    page: result_detailed.patches(shas)
+                    for page, shas in enumerate(item_layout, 1) if f'{item["id"]}/{page}' in pages
+                }
+                shells = f'{item["id"]}/shell' in pages
+                if item_pages or shells:
+                    yield item["id"], item["name"], item_pages, {
+                        "page_num": page_num, "shells": shells,
+                    }
+                continue
 
-                output_path = os.path.join(detail_dir(locale), filename)
-                with open(output_path, "w", encoding="utf-8") as file:
-                    try:
-                        file.write(html_content)
-                    except UnicodeEncodeError:
-                        safe_content = html_content.encode("utf-8", "replace").decode("utf-8")
-                        file.write(safe_content)
+            # Collect all patches for this item; a PatchStore reads them lazily
+            if isinstance(result_detailed, PatchStore):
+                patches = result_detailed.patches(domains)
+            else:
+                patches = []
+                for domain_name in domains:
+                    patches.extend(result_detailed[domain_name])
+            yield item["id"], item["name"], patches, {}
+
+    if jobs <= 1:
+        for item_id, name, patches, options in tasks():
+            generate_university_pages(item_id, name, patches, locales, shared=shared,
+                                      patch_cap=patch_cap, **options)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(
+                generate_university_pages, item_id, name, patches, locales, shared=shared,
+                patch_cap=patch_cap, **options
+            )
+            for item_id, name, patches, options in tasks()
+        ]
+        for future in futures:
+            future.result()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+"""Compact in-memory records of the aggregated university commits and authors.
+
+Commits keep the timestamp, UTC offset and diff counters as integers; the
+ISO date and the "-d/+i" string of the documented result.json schema are
+produced by to_json() when the records are serialized.
+"""
+
+import sys
+from datetime import datetime, timedelta, timezone
+
+_timezones = {}
+_offsets = {}
+
+
+def _timezone(offset):
+    """Return a shared timezone for a UTC offset in minutes."""
+    tz = _timezones.get(offset)
+    if tz is None:
+        tz = _timezones[offset] = timezone(timedelta(minutes=offset))
+    return tz
+
+
+class Commit:
+    """One university commit: SHA, summary, authored time and diff statistics."""
+
+    __slots__ = ("sha", "summary", "timestamp", "offset", "files", "insertions", "deletions")
+
+    def __init__(self, sha, summary, timestamp, offset, files, insertions, deletions):
+        self.sha = sha
+        self.summary = summary
+        self.timestamp = timestamp
+        self.offset = offset
+        self.files = files
+        self.insertions = insertions
+        self.deletions = deletions
+
+    @property
+    def date(self):
+        """The authored date as the ISO string GitPython produces."""
+        return datetime.fromtimestamp(self.timestamp, _timezone(self.offset)).isoformat()
+
+    @property
+    def lines(self):
+        return f"-{self.deletions}/+{self.insertions}"
+
+    def to_json(self):
+        return {
+            "commit": self.sha,
+            "summary": self.summary,
+            "date": self.date,
+            "files": self.files,
+            "lines": self.lines,
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, Commit):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"Commit({self.sha[0:12]!r}, {self.date!r}, {self.lines!r})"
+
+
+class Author:
+    """One author email of a domain with its commits, newest first."""
+
+    __slots__ = ("email", "name", "commits")
+
+    def __init__(self, email, name, commits=None):
+        self.email = email
+        self.name = name
+        self.commits = [] if commits is None else commits
+
+    @property
+    def count(self):
+        return len(self.commits)
+
+    def to_json(self):
+        return {"email": self.email, "name": self.name, "count": self.count,
+                "commits": self.commits}
+
+    def __eq__(self, other):
+        if not isinstance(other, Author):
+            return NotImplemented
+        return (self.email, self.name, self.commits) == (other.email, other.name, other.commits)
+
+    def __repr__(self):
+        return f"Author({self.email!r}, {self.name!r}, {self.count} commits)"
+
+
+def parse_date(date):
+    """Split an ISO date with offset into (timestamp, offset in minutes)."""
+    value = datetime.fromisoformat(date)
+    offset = int(value.utcoffset().total_seconds()) // 60
+    # share one int object per offset instead of one per commit
+    return int(value.timestamp()), _offsets.setdefault(offset, offset)
+
+
+def commit_from_record(record):
+    """Build a Commit from a scanned commit record."""
+    timestamp, offset = parse_date(record["date"])
+    return Commit(record["commit"], record["summary"], timestamp, offset,
+                  record["files"], record["insertions"], record["deletions"])
+
+
+def commit_from_json(entry):
+    """Build a Commit back from its to_json() form."""
+    timestamp, offset = parse_date(entry["date"])
+    deletions, _, insertions = entry["lines"].partition("/")
+    return Commit(entry["commit"], entry["summary"], timestamp, offset,
+                  entry["files"], int(insertions[1:]), int(deletions[1:]))
+
+
+def new_author(record):
+    """Start an Author for the email and name of a commit record, interned."""
+    return Author(sys.intern(record["email"]), sys.intern(record["name"]))
+
+
+def authors_from_json(authors_map):
+    """Convert a per-domain {email: author JSON} map back to Author records."""
+    return {
+        domain: {
+            email: Author(sys.intern(email), sys.intern(author["name"]),
+                          [commit_from_json(entry) for entry in author["commits"]])
+            for email, author in authors.items()
+        }
+        for domain, authors in authors_map.items()
+    }
+
+
+def to_json(value):
+    """json.dump() default hook that serializes Commit and Author records."""
+    if isinstance(value, (Commit, Author)):
+        return value.to_json()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,90 @@
+"""Append-only on-disk store for patch texts, read back lazily by page."""
+
+import os
+import shutil
+from array import array
+from collections.abc import Sequence
+
+SEGMENT_FILE = "patches.seg"
+
+
+class PatchStore:
+    """Patch texts appended to one segment file with a per-domain offset index.
+
+    Only offsets and lengths stay in memory; texts are written as they arrive
+    and read back on demand, so memory does not grow with patch volume.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        shutil.rmtree(root, ignore_errors=True)
+        os.makedirs(root)
+        self.path = os.path.join(root, SEGMENT_FILE)
+        self._writer = open(self.path, "ab")  # pylint: disable=consider-using-with
+        self._size = 0
+        self._index = {}
+
+    def append(self, domain, text):
+        """Append the patch text for a commit of domain."""
+        data = text.encode("utf-8", "surrogateescape")
+        self._writer.write(data)
+        entries = self._index.setdefault(domain, (array("Q"), array("Q")))
+        entries[0].append(self._size)
+        entries[1].append(len(data))
+        self._size += len(data)
+
+    def count(self, domain):
+        """Return the number of patches stored for domain."""
+        return len(self._index[domain][0]) if domain in self._index else 0
+
+    def size(self, domain):
+        """Return the total UTF-8 size of the patches stored for domain."""
+        return sum(self._index[domain][1]) if domain in self._index else 0
+
+    def patches(self, domains):
+        """Return a lazy sequence over the patches of domains, in order."""
+        self._writer.flush()
+        offsets, lengths = array("Q"), array("Q")
+        for domain in domains:
+            if domain in self._index:
+                offsets.extend(self._index[domain][0])
+                lengths.extend(self._index[domain][1])
+        return StoredPatches(self.path, offsets, lengths)
+
+    def close(self):
+        """Close the segment writer."""
+        self._writer.close()
+
+    def remove(self):
+        """Close the store and delete its files."""
+        self.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class StoredPatches(Sequence):
+    """Read-only view of stored patches; slicing reads only the slice from disk.
+
+    Views only hold the segment path and offsets, so they can be pickled and
+    handed to worker processes.
+    """
+
+    def __init__(self, path, offsets, lengths):
+        self._path = path
+        self._offsets = offsets
+        self._lengths = lengths
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._read(self._offsets[index], self._lengths[index])
+        return self._read([self._offsets[index]], [self._lengths[index]])[0]
+
+    def _read(self, offsets, lengths):
+        texts = []
+        with open(self._path, "rb") as file:
+            for offset, length in zip(offsets, lengths):
+                file.seek(offset)
+                texts.append(file.read(length).decode("utf-8", "surrogateescape"))
+        return texts
@@ -0,0 +1,111 @@
+"""Write precompressed .gz (and .br when brotli is installed) siblings of generated files."""
+
+import gzip
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+except ImportError:  # optional: pip install Brotli
+    brotli = None
+
+COMPRESSED_SUFFIXES = (".gz", ".br")
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+def available_formats():
+    """Return the compressed formats that can be written here."""
+    return ("gz", "br") if brotli is not None else ("gz",)
+
+
+def iter_artifact_files(path):
+    """Yield path itself, or every file below it, skipping compressed siblings."""
+    if os.path.isfile(path):
+        yield path
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.endswith(COMPRESSED_SUFFIXES):
+                yield os.path.join(root, name)
+
+
+def compress_file(path, formats):
+    """Write path.<format> for every format and return {"raw": n, format: n, ...}.
+
+    Siblings at least as new as path are kept, so pages that were not
+    rewritten since the last run are not compressed again.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    siblings = [f"{path}.{fmt}" for fmt in formats]
+    if all(os.path.exists(sibling) and os.stat(sibling).st_mtime_ns >= mtime
+           for sibling in siblings):
+        return dict({"raw": os.path.getsize(path)},
+                    **{fmt: os.path.getsize(sibling) for fmt, sibling in zip(formats, siblings)})
+    with open(path, "rb") as file:
+        data = file.read()
+    sizes = {"raw": len(data)}
+    for fmt in formats:
+        if fmt == "gz":
+            # mtime=0 keeps the output reproducible across runs
+            compressed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+        else:
+            compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+        with open(f"{path}.{fmt}", "wb") as file:
+            file.write(compressed)
+        sizes[fmt] = len(compressed)
+    return sizes
+
+
+def precompress(paths, formats=None, jobs=1):
+    """Compress every file under paths and return (report, seconds).
+
+    report maps each entry of paths that exists to its file count and its
+    total raw and compressed sizes.
+    """
+    formats = tuple(formats or available_formats())
+    start = time.perf_counter()
+    files = [(group, file) for group in paths if os.path.exists(group)
+             for file in iter_artifact_files(group)]
+    report = {group: dict({"files": 0, "raw": 0}, **{fmt: 0 for fmt in formats})
+              for group, _ in files}
+
+    def record(group, sizes):
+        report[group]["files"] += 1
+        for key, size in sizes.items():
+            report[group][key] += size
+
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(compress_file, [file for _, file in files],
+                                   [formats] * len(files), chunksize=64)
+            for (group, _), sizes in zip(files, results):
+                record(group, sizes)
+    else:
+        for group, file in files:
+            record(group, compress_file(file, formats))
+    return report, time.perf_counter() - start
+
+
+def format_report(report, seconds):
+    """Render the per-artifact size report as text lines."""
+    formats = [fmt for fmt in ("gz", "br") if any(fmt in row for row in report.values())]
+    total = {"files": 0, "raw": 0, **{fmt: 0 for fmt in formats}}
+    for row in report.values():
+        for key in total:
+            total[key] += row[key]
+
+    header = f'{"artifact":<16}{"files":>8}{"raw":>14}' + "".join(
+        f"{fmt:>22}" for fmt in formats
+    )
+    lines = [header]
+    for name, row in list(report.items()) + [("total", total)]:
+        line = f'{name:<16}{row["files"]:>8,}{row["raw"]:>14,}'
+        for fmt in formats:
+            ratio = row[fmt] / row["raw"] * 100 if row["raw"] else 0.0
+            line += f"{row[fmt]:>14,} ({ratio:5.1f}%)"
+        lines.append(line)
+    lines.append(f'Precompressed {total["files"]} files in {seconds:.1f}s')
+    return lines
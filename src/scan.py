@@ -0,0 +1,230 @@
+"""Match commit records to universities and aggregate them per email domain."""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+from domain_index import lookup_university
+from git_batch import GitBatch
+from git_log import iter_commit_records, iter_log_commits
+from model import commit_from_record, new_author
+from stages import count_git_process, git_process_count
+from state import merge_results
+
+
+def new_results():
+    """Return empty per-domain aggregates."""
+    return {"patches": {}, "lines": {}, "authors": {}, "shas": {}}
+
+
+def university_email_domain(email, domain_index, non_university_domain_cache):
+    """Return the domain of email if it belongs to a university, else None."""
+    if not email:
+        return None
+    # get email domain
+    email_domain = email.split("@")[-1]
+    # check if the domain is in the non_university_domain cache
+    if email_domain in non_university_domain_cache:
+        return None
+    # check the domain and its parent domains against the index
+    if lookup_university(email_domain, domain_index) is None:
+        non_university_domain_cache.add(email_domain)
+        return None
+    return email_domain
+
+
+def add_commit(results, email_domain, record):
+    """Count one university commit record towards its email domain."""
+    patches_map = results["patches"]
+    lines_map = results["lines"]
+    authors_map = results["authors"]
+    # initialize result for this domain if not exists
+    if email_domain not in patches_map:
+        patches_map[email_domain] = 0
+        lines_map[email_domain] = 0
+        authors_map[email_domain] = {}
+        results["shas"][email_domain] = []
+
+    patches_map[email_domain] += 1
+    lines_map[email_domain] += record["insertions"] + record["deletions"]
+    results["shas"][email_domain].append(record["commit"])
+
+    # update author information
+    author = authors_map[email_domain].get(record["email"])
+    if author is None:
+        author = authors_map[email_domain][record["email"]] = new_author(record)
+    author.commits.append(commit_from_record(record))
+
+
+def scan_records(records, domain_index, progress=None, results=None, checkpoint=None):
+    """Aggregate the university commits among records.
+
+    Returns (results, scanned) where scanned counts every record read.
+    results continues the aggregates of an earlier, interrupted scan, and a
+    Checkpointer passed as checkpoint journals every record.
+    """
+    results = new_results() if results is None else results
+    # speed up domain check by caching
+    non_university_domain_cache = set()
+    scanned = 0
+    for record in records:
+        scanned += 1
+        if progress is not None:
+            progress.update(1)
+        email_domain = university_email_domain(
+            record["email"], domain_index, non_university_domain_cache
+        )
+        if email_domain is not None:
+            add_commit(results, email_domain, record)
+        if checkpoint is not None:
+            checkpoint.update(record["commit"], email_domain, record)
+    return results, scanned
+
+
+def scan_gitpython(commits, domain_index, progress=None, results=None, checkpoint=None):
+    """scan_records() over GitPython Commit objects.
+
+    commits is consumed lazily (e.g. `repo.iter_commits(rev)`), and
+    `commit.stats` is only read for university commits.
+    """
+    results = new_results() if results is None else results
+    non_university_domain_cache = set()
+    scanned = 0
+    for commit in commits:
+        scanned += 1
+        if progress is not None:
+            progress.update(1)
+        email_domain = university_email_domain(
+            commit.author.email, domain_index, non_university_domain_cache
+        )
+        if email_domain is None:
+            if checkpoint is not None:
+                checkpoint.update(commit.hexsha)
+            continue
+
+        # cache commit stats
+        commit_stats = commit.stats.total
+        record = {
+            "commit": commit.hexsha,
+            "name": commit.author.name,
+            "email": commit.author.email,
+            "summary": commit.summary,
+            "date": commit.authored_datetime.isoformat(),
+            "files": commit_stats["files"],
+            "insertions": commit_stats["insertions"],
+            "deletions": commit_stats["deletions"],
+        }
+        add_commit(results, email_domain, record)
+        if checkpoint is not None:
+            checkpoint.update(commit.hexsha, email_domain, record)
+    return results, scanned
+
+
+def match_commits(emails, domain_index, progress=None):
+    """First phase of the two-phase scan: pick the university commits.
+
+    emails yields (sha, email) pairs. Returns ([(sha, email_domain), ...],
+    scanned) for the matching commits, in input order. Each distinct
+    non-university domain is looked up only once.
+    """
+    matched = []
+    non_university_domain_cache = set()
+    scanned = 0
+    for sha, email in emails:
+        scanned += 1
+        if progress is not None:
+            progress.update(1)
+        email_domain = university_email_domain(email, domain_index, non_university_domain_cache)
+        if email_domain is not None:
+            matched.append((sha, email_domain))
+    return matched, scanned
+
+
+def scan_matched(repo_path, matched):
+    """Second phase of the two-phase scan: aggregate the matched commits.
+
+    Name, date, message and --numstat statistics are read for the matched
+    SHAs only, through a single `git log --stdin` process.
+    """
+    results = new_results()
+    records = iter_commit_records(repo_path, [sha for sha, _ in matched])
+    for (_, email_domain), record in zip(matched, records):
+        add_commit(results, email_domain, record)
+    return results
+
+
+def scan_shard(repo_path, rev, skip, max_count, domain_index):
+    """Scan the max_count commits of rev that follow the first skip commits."""
+    records = iter_log_commits(repo_path, rev, skip=skip, max_count=max_count)
+    return scan_records(records, domain_index)
+
+
+def scan_batch(repo_path, rev, domain_index, skip=0, max_count=None, progress=None,
+               results=None, checkpoint=None):
+    """Scan rev through a GitBatch, reading statistics of university commits only.
+
+    Returns (results, scanned) like scan_records().
+    """
+    results = new_results() if results is None else results
+    non_university_domain_cache = set()
+    scanned = 0
+    with GitBatch(repo_path) as batch:
+        for record in batch.iter_commits(rev, skip=skip, max_count=max_count):
+            scanned += 1
+            if progress is not None:
+                progress.update(1)
+            email_domain = university_email_domain(
+                record["email"], domain_index, non_university_domain_cache
+            )
+            if email_domain is not None:
+                add_commit(results, email_domain, batch.add_stats(record))
+            if checkpoint is not None:
+                checkpoint.update(record["commit"], email_domain, record)
+    return results, scanned
+
+
+def scan_batch_shard(repo_path, rev, skip, max_count, domain_index):
+    """scan_shard() through a GitBatch owned by the worker process."""
+    return scan_batch(repo_path, rev, domain_index, skip=skip, max_count=max_count)
+
+
+def counted_shard(shard_scanner, *args):
+    """Run shard_scanner in a worker and add the git processes it started.
+
+    Returns (results, scanned, git_processes); pool workers are reused, so
+    only the launches of this shard are reported.
+    """
+    before = git_process_count()
+    results, scanned = shard_scanner(*args)
+    return results, scanned, git_process_count() - before
+
+
+def scan_sharded(repo_path, rev, total, jobs, domain_index, shard_scanner=scan_shard):
+    """Scan rev in `jobs` worker processes and merge their partial results.
+
+    The history is cut into contiguous `git log --skip/--max-count` shards.
+    Merging the shards in log order reproduces a serial scan exactly, down
+    to the order of each author's commit list. The git processes of the
+    workers are added to this process's count.
+    """
+    shard_size = max(1, -(-total // jobs))  # ceiling division
+    bounds = [(skip, min(shard_size, total - skip)) for skip in range(0, total, shard_size)]
+    shard_results = [None] * len(bounds)
+    scanned = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor, tqdm(total=total) as progress:
+        futures = {
+            executor.submit(counted_shard, shard_scanner, repo_path, rev, skip, count,
+                            domain_index): index
+            for index, (skip, count) in enumerate(bounds)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            shard_results[index], shard_scanned, git_processes = future.result()
+            count_git_process(git_processes)
+            scanned += shard_scanned
+            progress.update(shard_scanned)
+
+    results = new_results()
+    for shard in shard_results:
+        results = merge_results(results, shard)
+    return results, scanned
@@ -0,0 +1,128 @@
+"""Build a static inverted index of commit summaries, authors and domains, split into prefix shards."""
+
+import os
+import re
+import shutil
+
+from json_stream import json_encoder, write_json_and_js
+
+SEARCH_DIR = "search"
+SEARCH_INDEX_VERSION = 1
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 40
+# a shard above this many bytes of JSON is split by one more prefix character
+SHARD_BYTES = 64 * 1024
+# \w includes "_", so snake_case identifiers such as function names stay whole
+TOKEN_SEPARATOR = re.compile(r"[^\w]+")
+SAFE_SHARD_NAME = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Return the distinct lowercase word tokens of text that are worth indexing."""
+    return {
+        token for token in TOKEN_SEPARATOR.split(text.lower())
+        if MIN_TOKEN_LENGTH <= len(token) <= MAX_TOKEN_LENGTH
+    }
+
+
+def build_postings(ranked_results):
+    """Return {token: entry} for the ranked result entries.
+
+    An entry has up to three parts, each keyed by the university id:
+    "u" lists the ids whose name or domains contain the token, "a" the
+    indexes of matching authors in authors/<id>.json, and "c" the positions
+    of matching commits, counting through the commits of those authors in
+    order.
+    """
+    postings = {}
+    for item in ranked_results:
+        item_id = item["id"]
+        for token in tokenize(" ".join([item["name"], *item["domains"]])):
+            postings.setdefault(token, {}).setdefault("u", []).append(item_id)
+        position = 0
+        for author_index, author in enumerate(item["authors"]):
+            for token in tokenize(f"{author.name} {author.email}"):
+                entry = postings.setdefault(token, {}).setdefault("a", {})
+                entry.setdefault(item_id, []).append(author_index)
+            for commit in author.commits:
+                for token in tokenize(commit.summary):
+                    entry = postings.setdefault(token, {}).setdefault("c", {})
+                    entry.setdefault(item_id, []).append(position)
+                position += 1
+    return postings
+
+
+def delta_encode(positions):
+    """Store ascending positions as the first one followed by the gaps."""
+    return [positions[0]] + [b - a for a, b in zip(positions, positions[1:])]
+
+
+def encode_entry(entry):
+    """Return the shard form of a postings entry, with commit positions delta-encoded."""
+    encoded = dict(entry)
+    if "c" in entry:
+        encoded["c"] = {item_id: delta_encode(positions) for item_id, positions in entry["c"].items()}
+    return encoded
+
+
+def split_shards(sizes, prefix_length=MIN_TOKEN_LENGTH, max_bytes=SHARD_BYTES):
+    """Group tokens into shards keyed by a token prefix.
+
+    Tokens start in shards of their first prefix_length characters; a shard
+    over max_bytes moves its longer tokens into shards one character longer,
+    so every token lives in the shard of its longest prefix that is a key.
+    """
+    groups = {}
+    for token in sizes:
+        groups.setdefault(token[:prefix_length], []).append(token)
+    shards = {}
+    for prefix, tokens in groups.items():
+        if sum(sizes[token] for token in tokens) <= max_bytes:
+            shards[prefix] = tokens
+            continue
+        short = [token for token in tokens if len(token) == len(prefix)]
+        longer = {token: sizes[token] for token in tokens if len(token) > len(prefix)}
+        if short:
+            shards[prefix] = short
+        shards.update(split_shards(longer, len(prefix) + 1, max_bytes))
+    return shards
+
+
+def shard_file(prefix):
+    """Return the file name stem of a shard; non-ASCII prefixes are hex-encoded."""
+    if SAFE_SHARD_NAME.fullmatch(prefix):
+        return prefix
+    return "_" + prefix.encode("utf-8").hex()
+
+
+def write_search_index(ranked_results, compact=False):
+    """Write search/index.json and the shards, and return the index stats."""
+    postings = build_postings(ranked_results)
+    encoded = {token: encode_entry(entry) for token, entry in postings.items()}
+    encoder = json_encoder(compact=True)
+    sizes = {token: len(encoder.encode({token: entry})) for token, entry in encoded.items()}
+    shards = split_shards(sizes)
+
+    shutil.rmtree(SEARCH_DIR, ignore_errors=True)
+    os.makedirs(SEARCH_DIR)
+    files = {}
+    for prefix, tokens in sorted(shards.items()):
+        files[prefix] = shard_file(prefix)
+        write_json_and_js(
+            {token: encoded[token] for token in sorted(tokens)},
+            os.path.join(SEARCH_DIR, f"{files[prefix]}.json"),
+            os.path.join(SEARCH_DIR, f"{files[prefix]}.js"),
+            "(window.__LINUX_EDU_RANK_SEARCH__ = window.__LINUX_EDU_RANK_SEARCH__ || {})"
+            f"[{encoder.encode(prefix)}] = ",
+            compact, depth=1,
+        )
+    shard_bytes = sum(os.path.getsize(os.path.join(SEARCH_DIR, f"{name}.json"))
+                      for name in files.values())
+    stats = {"tokens": len(postings), "shards": len(files), "bytes": shard_bytes}
+    write_json_and_js(
+        {"version": SEARCH_INDEX_VERSION, "min_length": MIN_TOKEN_LENGTH,
+         "max_length": MAX_TOKEN_LENGTH, "shards": files, "stats": stats},
+        os.path.join(SEARCH_DIR, "index.json"), os.path.join(SEARCH_DIR, "index.js"),
+        "window.__LINUX_EDU_RANK_SEARCH_INDEX__ = ", compact, depth=1,
+    )
+    return stats
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""Answer filtered, paginated JSON queries about the generated ranking over local HTTP.
+
+The ranking (summary.json with authors/, or a single-file result.json) is
+loaded once into in-memory indexes by university, email domain, author
+email and commit date. A watcher thread reloads it when a newer file is
+written; queries keep using the previous indexes until the new ones are
+built.
+"""
+
+import json
+import os
+import threading
+import time
+from argparse import ArgumentParser
+from bisect import bisect_left
+from collections import namedtuple
+from itertools import accumulate
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from json_stream import json_encoder
+from model import commit_from_json
+from search_index import MAX_TOKEN_LENGTH, MIN_TOKEN_LENGTH, tokenize
+
+SUMMARY_FILE = "summary.json"
+AUTHORS_DIR = "authors"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+POLL_SECONDS = 1.0
+
+CommitEntry = namedtuple("CommitEntry", "timestamp university domain email name commit")
+# filters of the commit-level endpoints, and the parameters every list endpoint takes
+COMMIT_FILTERS = ("university", "domain", "email", "since", "until", "summary")
+PAGE_PARAMETERS = ("offset", "limit")
+
+
+class QueryError(ValueError):
+    """A query the service cannot answer; reported as 400 Bad Request."""
+
+
+def load_ranking(directory=".", result_file=None):
+    """Return (meta, data) from result_file, or from summary.json and authors/ in directory."""
+    if result_file:
+        with open(result_file, "r", encoding="utf-8") as file:
+            payload = json.load(file)
+        return payload["meta"], payload["data"]
+    with open(os.path.join(directory, SUMMARY_FILE), "r", encoding="utf-8") as file:
+        payload = json.load(file)
+    for item in payload["data"]:
+        with open(os.path.join(directory, AUTHORS_DIR, f'{item["id"]}.json'), "r", encoding="utf-8") as file:
+            item["authors"] = json.load(file)
+    return payload["meta"], payload["data"]
+
+
+def parse_time(text):
+    """Return the Unix timestamp of an ISO date or date-time; without an offset it is UTC."""
+    if text.endswith(("Z", "z")):
+        # fromisoformat() accepts a Z suffix only from Python 3.11 on
+        text = text[:-1] + "+00:00"
+    value = datetime.fromisoformat(text)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def rank_rows(rows):
+    """Sort rows by (count, lines) descending and rank them like add_rankings().
+
+    Rows keep their all-time ids; ties on count share the rank of the first.
+    """
+    rows.sort(key=lambda row: (-row["count"], -row["lines"], row["id"]))
+    previous = None
+    for position, row in enumerate(rows, 1):
+        row["rank"] = previous["rank"] if previous and previous["count"] == row["count"] else position
+        previous = row
+    return rows
+
+
+class RankingIndex:
+    """In-memory indexes over one loaded ranking.
+
+    Every university commit becomes a CommitEntry. The entries are kept in
+    date order overall and per university id, email domain and author
+    email, with prefix sums of their changed lines, so a date range of any
+    list is found by bisection and counted without visiting its commits.
+    Summary words are looked up in postings of the search index tokens,
+    which list the positions of their commits in date order.
+    """
+
+    def __init__(self, meta, data):
+        self.meta = meta
+        self.universities = [{key: value for key, value in item.items() if key != "authors"}
+                             for item in data]
+        entries = []
+        # email -> (name, university id, domain); list key -> emails of its authors
+        self.authors = {}
+        self.emails = {}
+        for item in data:
+            for author in item["authors"]:
+                email = author["email"]
+                # the aggregation keys authors by the domain part of their email
+                domain = email.split("@")[-1]
+                self.authors[email] = (author["name"], item["id"], domain)
+                for key in (None, ("university", item["id"]), ("domain", domain)):
+                    self.emails.setdefault(key, []).append(email)
+                for commit in map(commit_from_json, author["commits"]):
+                    entries.append(CommitEntry(commit.timestamp, item["id"], domain, email,
+                                               author["name"], commit))
+        self.author_count = len(self.authors)
+        entries.sort(key=lambda entry: entry.timestamp)
+        self.lists = {None: entries}
+        self.postings = {}
+        for position, entry in enumerate(entries):
+            for token in tokenize(entry.commit.summary):
+                self.postings.setdefault(token, []).append(position)
+            for key in (("university", entry.university), ("domain", entry.domain), ("email", entry.email)):
+                self.lists.setdefault(key, []).append(entry)
+        self.times = {key: [entry.timestamp for entry in values] for key, values in self.lists.items()}
+        # all-time author rankings, computed on first use
+        self._author_rows = {}
+        # lines[key][i] sums the lines changed by the first i entries of lists[key]
+        self.lines = {
+            key: list(accumulate((entry.commit.insertions + entry.commit.deletions for entry in values),
+                                 initial=0))
+            for key, values in self.lists.items()
+        }
+
+    def window(self, key, since=None, until=None):
+        """Return the (start, end) range of lists[key] dated in [since, until)."""
+        times = self.times.get(key, ())
+        start = bisect_left(times, since) if since is not None else 0
+        end = bisect_left(times, until) if until is not None else len(times)
+        return start, end
+
+    def count(self, key, since=None, until=None):
+        """Return the number of entries of lists[key] dated in [since, until)."""
+        start, end = self.window(key, since, until)
+        return end - start
+
+    def select(self, university=None, domain=None, email=None, since=None, until=None, summary=None):
+        """Return the commit entries matching every given filter, oldest first.
+
+        since is inclusive and until exclusive; both are Unix timestamps.
+        summary matches the commits whose summary has every word of it, as
+        split by the search index tokenizer.
+        """
+        entries, start, end = self.select_range(university, domain, email, since, until, summary)
+        return entries[start:end]
+
+    def select_range(self, university=None, domain=None, email=None, since=None, until=None,
+                     summary=None):
+        """select() as (entries, start, end), the matches being entries[start:end].
+
+        When an index list answers the filters by itself, entries is that
+        list and nothing is copied.
+        """
+        key = selective_key(university, domain, email)
+        start, end = self.window(key, since, until)
+        selected = None
+        checks = []
+        if summary:
+            words = sorted(self.words(summary), key=lambda word: len(self.postings.get(word, ())))
+            first, last = self.window(None, since, until)
+            positions = self.postings.get(words[0], [])
+            positions = positions[bisect_left(positions, first):bisect_left(positions, last)]
+            # start from the postings of the rarest word, unless the university,
+            # domain or email filter leaves fewer commits to check
+            if key is None or len(positions) < end - start:
+                for word in words[1:]:
+                    others = set(self.postings.get(word, ()))
+                    positions = [position for position in positions if position in others]
+                selected = [self.lists[None][position] for position in positions]
+                key = None
+            else:
+                checks.append(lambda entry: tokenize(entry.commit.summary).issuperset(words))
+        if university is not None and (key is None or key[0] != "university"):
+            checks.append(lambda entry: entry.university == university)
+        if domain is not None and (key is None or key[0] == "email"):
+            checks.append(lambda entry: entry.domain == domain)
+        if email is not None and key is None:
+            checks.append(lambda entry: entry.email == email)
+        if selected is None:
+            if not checks:
+                return self.lists.get(key, []), start, end
+            selected = self.lists.get(key, [])[start:end]
+        if checks:
+            selected = [entry for entry in selected if all(check(entry) for check in checks)]
+        return selected, 0, len(selected)
+
+    @staticmethod
+    def words(summary):
+        """Return the indexed words of a summary filter."""
+        words = tokenize(summary)
+        if not words:
+            raise QueryError(f"summary needs a word of {MIN_TOKEN_LENGTH} to {MAX_TOKEN_LENGTH} characters")
+        return words
+
+    def university_rows(self, since=None, until=None, summary=None):
+        """Return the university rows, ranked again over the matching commits when filtered."""
+        if since is None and until is None and not summary:
+            return self.universities
+        totals = {}
+        if summary:
+            for entry in self.select(since=since, until=until, summary=summary):
+                total = totals.setdefault(entry.university, [0, 0, set()])
+                total[0] += 1
+                total[1] += entry.commit.insertions + entry.commit.deletions
+                total[2].add(entry.email)
+        else:
+            for item in self.universities:
+                key = ("university", item["id"])
+                start, end = self.window(key, since, until)
+                if end > start:
+                    emails = [email for email in self.emails[key]
+                              if self.count(("email", email), since, until)]
+                    totals[item["id"]] = [end - start, self.lines[key][end] - self.lines[key][start], emails]
+        rows = []
+        for item in self.universities:
+            if item["id"] in totals:
+                count, lines, emails = totals[item["id"]]
+                rows.append({"id": item["id"], "name": item["name"], "domains": item["domains"],
+                             "university": item["university"], "count": count, "lines": lines,
+                             "contributor_count": len(emails)})
+        return rank_rows(rows)
+
+    def author_rows(self, university=None, domain=None, email=None, since=None, until=None, summary=None):
+        """Return per-author totals over the matching commits, most commits first.
+
+        "last" is the author's latest matching Commit.
+        """
+        all_time = since is None and until is None and not summary
+        if all_time and (university, domain, email) in self._author_rows:
+            return self._author_rows[university, domain, email]
+        # email -> [count, lines, latest commit]
+        totals = {}
+        if summary:
+            for entry in self.select(university, domain, email, since, until, summary):
+                total = totals.setdefault(entry.email, [0, 0, None])
+                total[0] += 1
+                total[1] += entry.commit.insertions + entry.commit.deletions
+                total[2] = entry.commit
+        else:
+            candidates = [email] if email is not None else self.emails.get(
+                selective_key(university, domain), [])
+            for candidate in candidates:
+                if candidate not in self.authors:
+                    continue
+                _, author_university, author_domain = self.authors[candidate]
+                if university not in (None, author_university) or domain not in (None, author_domain):
+                    continue
+                key = ("email", candidate)
+                start, end = self.window(key, since, until)
+                if end > start:
+                    totals[candidate] = [end - start, self.lines[key][end] - self.lines[key][start],
+                                         self.lists[key][end - 1].commit]
+        rows = []
+        for author_email, (count, lines, last) in totals.items():
+            name, author_university, author_domain = self.authors[author_email]
+            rows.append({"email": author_email, "name": name, "university": author_university,
+                         "domain": author_domain, "count": count, "lines": lines, "last": last})
+        rows.sort(key=lambda row: (-row["count"], -row["lines"], row["email"]))
+        if all_time:
+            self._author_rows[university, domain, email] = rows
+        return rows
+
+
+def selective_key(university=None, domain=None, email=None):
+    """Return the key of the shortest index list that covers the given filters."""
+    for name, value in (("email", email), ("domain", domain), ("university", university)):
+        if value is not None:
+            return name, value
+    return None
+
+
+def query_values(query, allowed):
+    """Return the last value of each query parameter, rejecting unknown ones."""
+    values = {}
+    for name, items in parse_qs(query, keep_blank_values=True).items():
+        if name not in allowed:
+            raise QueryError(f"unknown parameter {name!r}")
+        values[name] = items[-1]
+    return values
+
+
+def integer(values, name, default=None, minimum=0):
+    """Return values[name] as an integer of at least minimum, or default if it is missing."""
+    if name not in values:
+        return default
+    try:
+        number = int(values[name])
+    except ValueError:
+        raise QueryError(f"{name} must be an integer") from None
+    if number < minimum:
+        raise QueryError(f"{name} must be at least {minimum}")
+    return number
+
+
+def commit_filters(values):
+    """Return the select() keyword arguments of the commit filters in values."""
+    filters = {"university": integer(values, "university", minimum=1),
+               "domain": values.get("domain") or None, "email": values.get("email") or None,
+               "summary": values.get("summary") or None}
+    for name in ("since", "until"):
+        try:
+            filters[name] = parse_time(values[name]) if values.get(name) else None
+        except ValueError:
+            raise QueryError(f"{name} must be an ISO date or date-time") from None
+    return filters
+
+
+def page(rows, values):
+    """Return the offset/limit page of rows with the total count."""
+    offset, limit = page_bounds(values)
+    return {"total": len(rows), "offset": offset, "limit": limit, "items": rows[offset:offset + limit]}
+
+
+def page_newest_first(rows, values, start=0, end=None):
+    """page() of rows[start:end] read backwards, without copying the range."""
+    offset, limit = page_bounds(values)
+    end = len(rows) if end is None else end
+    last = max(end - offset, start)
+    items = rows[max(last - limit, start):last][::-1]
+    return {"total": end - start, "offset": offset, "limit": limit, "items": items}
+
+
+def page_bounds(values):
+    """Return the (offset, limit) query parameters of a page."""
+    offset = integer(values, "offset", 0)
+    limit = min(integer(values, "limit", DEFAULT_LIMIT, minimum=1), MAX_LIMIT)
+    return offset, limit
+
+
+def query_meta(service, _values):
+    """GET /api/meta: the ranking's meta, its source and what is indexed."""
+    index = service.index
+    return {"meta": index.meta, "source": service.source, "loaded": service.loaded,
+            "reloads": service.reloads, "universities": len(index.universities),
+            "authors": index.author_count, "commits": len(index.lists[None])}
+
+
+def query_universities(service, values):
+    """GET /api/universities: the ranking, filtered by name or domain.
+
+    With since, until or summary the universities are ranked again over the
+    matching commits only.
+    """
+    filters = commit_filters(values)
+    rows = service.index.university_rows(filters["since"], filters["until"], filters["summary"])
+    name = values.get("name", "").lower()
+    if name:
+        rows = [row for row in rows if name in row["name"].lower()]
+    if values.get("domain"):
+        rows = [row for row in rows if values["domain"] in row["domains"]]
+    return page(rows, values)
+
+
+def query_authors(service, values):
+    """GET /api/authors: authors ranked by their commits matching the filters."""
+    result = page(service.index.author_rows(**commit_filters(values)), values)
+    # dates are formatted for the returned page only
+    result["items"] = [dict(row, last=row["last"].date) for row in result["items"]]
+    return result
+
+
+def query_commits(service, values):
+    """GET /api/commits: the commits matching the filters, newest first."""
+    entries, start, end = service.index.select_range(**commit_filters(values))
+    result = page_newest_first(entries, values, start, end)
+    result["items"] = [dict(entry.commit.to_json(), email=entry.email, name=entry.name,
+                            university=entry.university) for entry in result["items"]]
+    return result
+
+
+# path -> (handler, accepted query parameters)
+ROUTES = {
+    "/api/meta": (query_meta, ()),
+    "/api/universities": (query_universities, ("name", "domain", "since", "until", "summary")
+                          + PAGE_PARAMETERS),
+    "/api/authors": (query_authors, COMMIT_FILTERS + PAGE_PARAMETERS),
+    "/api/commits": (query_commits, COMMIT_FILTERS + PAGE_PARAMETERS),
+}
+
+
+class RankingService:
+    """The current RankingIndex of a ranking on disk, rebuilt when the file changes.
+
+    The summary (or result_file) is written last by main(), so its size and
+    modification time tell when a new ranking is complete. A failed load
+    keeps the previous index and is retried at the next check.
+    """
+
+    def __init__(self, directory=".", result_file=None):
+        self.directory = directory
+        self.result_file = result_file
+        self.source = result_file or os.path.join(directory, SUMMARY_FILE)
+        self.index = None
+        self.loaded = None
+        self.reloads = 0
+        self._signature = None
+
+    def signature(self):
+        stat = os.stat(self.source)
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self):
+        """Rebuild the index if the source changed; return whether it did."""
+        signature = self.signature()
+        if signature == self._signature:
+            return False
+        meta, data = load_ranking(self.directory, self.result_file)
+        # replacing the attribute is atomic, running queries finish on the old index
+        self.index = RankingIndex(meta, data)
+        self.loaded = datetime.now(timezone.utc).isoformat()
+        self.reloads += self._signature is not None
+        self._signature = signature
+        return True
+
+    def watch(self, stop, interval=POLL_SECONDS):
+        """Check the source every interval seconds until stop is set."""
+        while not stop.wait(interval):
+            try:
+                start = time.perf_counter()
+                if self.reload():
+                    print(f"Reloaded {self.source} in {time.perf_counter() - start:.2f}s")
+            except (OSError, ValueError, KeyError) as error:
+                print(f"Reload of {self.source} failed, keeping the loaded ranking: {error}")
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Route GET requests to ROUTES and answer with JSON."""
+
+    # keep-alive lets dashboards and the load test reuse connections; without
+    # Nagle the body is not held back behind the headers waiting for an ACK
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    encoder = json_encoder(compact=True)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        url = urlsplit(self.path)
+        route = ROUTES.get(url.path.rstrip("/"))
+        if route is None:
+            self.send_json(404, {"error": f"unknown path {url.path}", "paths": sorted(ROUTES)})
+            return
+        handler, allowed = route
+        try:
+            self.send_json(200, handler(self.server.service, query_values(url.query, allowed)))
+        except QueryError as error:
+            self.send_json(400, {"error": str(error)})
+
+    def send_json(self, status, payload):
+        body = self.encoder.encode(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, verbose=False):
+    """Return a threaded HTTP server answering queries from service; port 0 picks a free one."""
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    """Load the ranking, watch it for changes and serve queries until interrupted."""
+    parser = ArgumentParser(description="Serve JSON queries over the generated ranking.")
+    parser.add_argument("--dir", type=str, default=".",
+                        help=f"directory holding {SUMMARY_FILE} and {AUTHORS_DIR}/ (default: .)")
+    parser.add_argument("--result", type=str, metavar="FILE",
+                        help="load a single-file result.json (--legacy-result) instead")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS,
+                        help=f"seconds between checks for a new ranking (default {POLL_SECONDS})")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    if args.poll <= 0:
+        parser.error("--poll must be positive")
+
+    service = RankingService(args.dir, args.result)
+    start = time.perf_counter()
+    service.reload()
+    index = service.index
+    print(f"Indexed {len(index.universities)} universities, {index.author_count} authors and "
+          f"{len(index.lists[None])} commits from {service.source} in {time.perf_counter() - start:.2f}s")
+
+    stop = threading.Event()
+    watcher = threading.Thread(target=service.watch, args=(stop, args.poll), daemon=True)
+    watcher.start()
+    server = make_server(service, args.host, args.port, args.verbose)
+    print(f"Serving {', '.join(sorted(ROUTES))} on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Split the matched commits into year, month and release slices."""
+
+import re
+import subprocess
+
+from git_log import git_command
+from model import Author
+from stages import count_git_process
+
+SLICES_DIR = "slices"
+SLICE_KINDS = ("year", "month", "release")
+# mainline releases: v2.6.12 ... v2.6.39, v3.0 ... v6.x, without -rc tags
+RELEASE_TAG_PATTERN = r"^v\d+\.\d+(\.\d+)?$"
+UNRELEASED = "unreleased"
+
+
+def release_tags(repo_path, pattern=RELEASE_TAG_PATTERN):
+    """Return the tags matching pattern that point to commits, in version order."""
+    count_git_process()
+    output = subprocess.run(
+        git_command(repo_path, "for-each-ref", "--sort=version:refname",
+                    "--format=%(refname:short) %(objecttype) %(*objecttype)", "refs/tags"),
+        stdout=subprocess.PIPE, check=True,
+    ).stdout.decode("utf-8", "replace")
+    regex = re.compile(pattern)
+    tags = []
+    for line in output.splitlines():
+        tag, _, types = line.partition(" ")
+        # lightweight tags have objecttype commit, annotated ones *objecttype
+        if regex.match(tag) and "commit" in types.split(" "):
+            tags.append(tag)
+    return tags
+
+
+def map_releases(repo_path, shas, pattern=RELEASE_TAG_PATTERN):
+    """Return {sha: first release tag that contains it} for the given shas.
+
+    Instead of one `git tag --contains` per commit, each release range
+    `<tag> ^<previous tag>` is listed once with `git rev-list` and only the
+    wanted SHAs are kept. Commits after the last release are left out.
+    """
+    wanted = set(shas)
+    releases = {}
+    previous = None
+    for tag in release_tags(repo_path, pattern):
+        command = git_command(repo_path, "rev-list", tag, *([f"^{previous}"] if previous else []))
+        count_git_process()
+        with subprocess.Popen(command, stdout=subprocess.PIPE) as process:
+            for line in process.stdout:
+                sha = line.decode("ascii").strip()
+                if sha in wanted:
+                    releases.setdefault(sha, tag)
+            if process.wait() != 0:
+                raise subprocess.CalledProcessError(process.returncode, command)
+        previous = tag
+    return releases
+
+
+def slice_keys(commit, releases=None):
+    """Return {kind: key} of the slices one Commit belongs to."""
+    date = commit.date
+    keys = {"year": date[0:4], "month": date[0:7]}
+    if releases is not None:
+        keys["release"] = releases.get(commit.sha, UNRELEASED)
+    return keys
+
+
+def bucket_commits(authors_map, releases=None):
+    """Split an authors map into per-slice (patches, lines, authors) maps.
+
+    Every bucket has the shape of the scan results, so the usual
+    process_results() ranks it. The per-commit entries collected by the
+    history walk carry everything needed; nothing is rescanned.
+    """
+    buckets = {kind: {} for kind in SLICE_KINDS}
+    for domain, authors in authors_map.items():
+        for email, author in authors.items():
+            for commit in author.commits:
+                for kind, key in slice_keys(commit, releases).items():
+                    patches_map, lines_map, slice_authors = buckets[kind].setdefault(
+                        key, ({}, {}, {})
+                    )
+                    patches_map[domain] = patches_map.get(domain, 0) + 1
+                    lines_map[domain] = (lines_map.get(domain, 0)
+                                         + commit.insertions + commit.deletions)
+                    slice_authors.setdefault(domain, {}).setdefault(
+                        email, Author(author.email, author.name)
+                    ).commits.append(commit)
+    return buckets
+
+
+def ordered_keys(kind, keys, releases=None):
+    """Order slice keys chronologically; releases follow tag order."""
+    if kind != "release":
+        return sorted(keys)
+    # map_releases() fills releases tag by tag, in version order
+    order = {tag: index for index, tag in enumerate(dict.fromkeys(releases.values()))}
+    return sorted(keys, key=lambda key: order.get(key, len(order)))
+
+
+def month_range(first, last):
+    """Return every "YYYY-MM" from first to last inclusive."""
+    year, month = int(first[0:4]), int(first[5:7])
+    months = []
+    while f"{year:04d}-{month:02d}" <= last:
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def monthly_trends(ranked_results):
+    """Return per-university monthly patch counts as compact arrays.
+
+    The result holds the continuous list of months and, per university id,
+    the index of its first active month and its counts from there on.
+    """
+    counts = {}
+    for item in ranked_results:
+        item_counts = counts[item["id"]] = {}
+        for author in item["authors"]:
+            for commit in author.commits:
+                month = commit.date[0:7]
+                item_counts[month] = item_counts.get(month, 0) + 1
+    active = [month for item_counts in counts.values() for month in item_counts]
+    if not active:
+        return {"months": [], "data": {}}
+    months = month_range(min(active), max(active))
+    position = {month: index for index, month in enumerate(months)}
+    data = {}
+    for item_id, item_counts in counts.items():
+        start = min(position[month] for month in item_counts)
+        end = max(position[month] for month in item_counts)
+        data[item_id] = {
+            "start": start,
+            "counts": [item_counts.get(month, 0) for month in months[start:end + 1]],
+        }
+    return {"months": months, "data": data}
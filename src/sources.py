@@ -0,0 +1,119 @@
+"""Scan several repositories and branches without counting a commit twice."""
+
+from argparse import ArgumentTypeError
+from concurrent.futures import ProcessPoolExecutor
+
+import git
+
+from git_log import iter_log_commits, iter_patch_ids, open_repo
+from scan import add_commit, new_results, university_email_domain
+from stages import count_git_process, git_process_count
+
+
+def parse_source(text):
+    """Parse a `--source path:branch[:label]` value; the label defaults to the branch."""
+    parts = text.split(":", 2)
+    if len(parts) < 2 or not parts[0] or not parts[1]:
+        raise ArgumentTypeError(f"expected path:branch[:label], got {text!r}")
+    path, branch = parts[0], parts[1]
+    label = parts[2] if len(parts) == 3 and parts[2] else branch
+    return {"path": path, "branch": branch, "label": label}
+
+
+def resolve_sources(sources):
+    """Add the head commit of every source and the earlier heads it can exclude.
+
+    A source skips the history reachable from the heads of the sources
+    before it that exist in its repository: those commits are counted there.
+    """
+    repos = [open_repo(source["path"]) for source in sources]
+    resolved = []
+    for index, (source, repo) in enumerate(zip(sources, repos)):
+        exclude = []
+        for earlier in resolved[:index]:
+            try:
+                repo.git.cat_file("-e", f'{earlier["commit"]}^{{commit}}')
+            except git.GitCommandError:
+                continue
+            exclude.append(earlier["commit"])
+        resolved.append(dict(source, commit=repo.commit(source["branch"]).hexsha,
+                             exclude=exclude))
+    return resolved
+
+
+def sources_meta(sources):
+    """Return the repo/branch/commit meta fields for a list of resolved sources."""
+    return {
+        "repo": " + ".join(source["label"] for source in sources),
+        "branch": ", ".join(source["branch"] for source in sources),
+        "commit": ", ".join(source["commit"][0:12] for source in sources),
+        "sources": [
+            {"label": source["label"], "branch": source["branch"],
+             "commit": source["commit"][0:12]}
+            for source in sources
+        ],
+    }
+
+
+def scan_source(repo_path, head, exclude, domain_index, with_patch_ids=False):
+    """Return ([(email_domain, record), ...], scanned, {sha: patch id}, git processes).
+
+    Runs in a worker process, so the git processes it started are returned
+    for the parent to count.
+    """
+    git_before = git_process_count()
+    matched = []
+    non_university_domain_cache = set()
+    scanned = 0
+    for record in iter_log_commits(repo_path, head, exclude=exclude):
+        scanned += 1
+        email_domain = university_email_domain(
+            record["email"], domain_index, non_university_domain_cache
+        )
+        if email_domain is not None:
+            matched.append((email_domain, record))
+    patch_ids = {}
+    if with_patch_ids:
+        patch_ids = dict(iter_patch_ids(repo_path, [record["commit"] for _, record in matched]))
+    return matched, scanned, patch_ids, git_process_count() - git_before
+
+
+def scan_sources(sources, domain_index, dedupe_patch_id=False):
+    """Scan resolved sources concurrently and merge them in the given order.
+
+    A commit is counted once, for the first source that contains it; with
+    dedupe_patch_id a commit whose `git patch-id --stable` was already seen
+    in an earlier source (a cherry-pick or backport) is skipped too; commits
+    of one source with the same diff, such as re-landed patches, all count.
+    Returns (results, scanned,
+    commit_paths, duplicates) where commit_paths maps every counted SHA to
+    the repository it was read from.
+    """
+    with ProcessPoolExecutor(max_workers=len(sources)) as executor:
+        futures = [
+            executor.submit(scan_source, source["path"], source["commit"], source["exclude"],
+                            domain_index, dedupe_patch_id)
+            for source in sources
+        ]
+        outcomes = [future.result() for future in futures]
+
+    results = new_results()
+    commit_paths = {}
+    # patch id -> index of the first source that counted it
+    patch_id_sources = {}
+    scanned = duplicates = 0
+    for index, (source, outcome) in enumerate(zip(sources, outcomes)):
+        matched, source_scanned, patch_ids, git_processes = outcome
+        count_git_process(git_processes)
+        scanned += source_scanned
+        for email_domain, record in matched:
+            patch_id = patch_ids.get(record["commit"])
+            if (record["commit"] in commit_paths
+                    or patch_id_sources.get(patch_id, index) != index):
+                duplicates += 1
+                continue
+            if patch_id is not None:
+                patch_id_sources.setdefault(patch_id, index)
+            commit_paths[record["commit"]] = source["path"]
+            add_commit(results, email_domain, record)
+    return results, scanned, commit_paths, duplicates
@@ -0,0 +1,166 @@
+"""Timing and resource metrics of the pipeline stages run by main()."""
+
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+_git_processes = 0  # pylint: disable=invalid-name
+
+
+def count_git_process(count=1):
+    """Record that count git subprocesses were started.
+
+    Called right before git is launched: at the subprocess calls of the
+    extractors and in the GitPython wrapper of git_log.open_repo(). Worker
+    processes count their own launches, and the parent adds what they
+    report with their results.
+    """
+    global _git_processes  # pylint: disable=global-statement
+    _git_processes += count
+
+
+def git_process_count():
+    """Return the number of git subprocesses counted so far."""
+    return _git_processes
+
+
+def cpu_seconds():
+    """Return user + system CPU time of this process and its reaped children."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def lifetime_peak_rss():
+    """Return the peak resident set size so far in bytes, or None if unknown.
+
+    This is the highest RSS of the process or of any reaped child since the
+    process started, not the peak of a single stage.
+    """
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageTimer:
+    """Record how long each named stage of a linear pipeline takes.
+
+    begin() closes the running stage and opens the next one, so the stages
+    of main() can be marked without restructuring it. Besides wall time
+    every stage records CPU time, the items it processed (add_items()), the
+    lifetime peak RSS when it ended, the git subprocesses it started and,
+    while tracemalloc is tracing, its peak traced memory.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.stages = {}
+        self._current = None
+        self._start = None
+        self._cpu = None
+        self._git = None
+
+    def begin(self, name):
+        """Finish the running stage, if any, and start timing name."""
+        self.end()
+        self._current = name
+        self.stages.setdefault(name, {
+            "wall_seconds": 0.0, "cpu_seconds": 0.0, "items": None,
+            "lifetime_peak_rss": None, "git_processes": 0,
+        })
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self._git = git_process_count()
+        self._cpu = cpu_seconds()
+        self._start = time.perf_counter()
+
+    def add_items(self, count):
+        """Count items processed by the running stage."""
+        stage = self.stages[self._current]
+        stage["items"] = (stage["items"] or 0) + count
+
+    def note(self, name, value):
+        """Attach an extra metric to the running stage."""
+        self.stages[self._current][name] = value
+
+    def elapsed(self):
+        """Return the wall time of the running stage so far."""
+        return time.perf_counter() - self._start
+
+    def end(self):
+        """Finish the running stage."""
+        if self._current is None:
+            return
+        elapsed = time.perf_counter() - self._start
+        self.seconds[self._current] = self.seconds.get(self._current, 0.0) + elapsed
+        stage = self.stages[self._current]
+        stage["wall_seconds"] += elapsed
+        stage["cpu_seconds"] += cpu_seconds() - self._cpu
+        stage["lifetime_peak_rss"] = lifetime_peak_rss()
+        stage["git_processes"] += git_process_count() - self._git
+        if tracemalloc.is_tracing():
+            stage["traced_peak"] = max(stage.get("traced_peak", 0),
+                                       tracemalloc.get_traced_memory()[1])
+        self._current = None
+
+    def metrics(self):
+        """Return the per-stage metrics with items/s and the run totals."""
+        stages = {}
+        for name, stage in self.stages.items():
+            items = stage["items"]
+            rate = items / stage["wall_seconds"] if items and stage["wall_seconds"] else None
+            stages[name] = dict(stage, items_per_second=rate)
+        return {
+            "stages": stages,
+            "total": {
+                "wall_seconds": sum(s["wall_seconds"] for s in stages.values()),
+                "cpu_seconds": sum(s["cpu_seconds"] for s in stages.values()),
+                "lifetime_peak_rss": lifetime_peak_rss(),
+                "git_processes": sum(s["git_processes"] for s in stages.values()),
+            },
+        }
+
+
+def top_allocations(limit=10):
+    """Return the biggest live tracemalloc allocations grouped by source line."""
+    statistics = tracemalloc.take_snapshot().statistics("lineno")[:limit]
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size": stat.size,
+            "count": stat.count,
+        }
+        for stat in statistics
+    ]
+
+
+def _format_bytes(size):
+    return "-" if size is None else f"{size / (1 << 20):,.1f} MiB"
+
+
+def _format_number(value, spec):
+    return "-" if value is None else format(value, spec)
+
+
+def format_metrics(metrics):
+    """Render the metrics as a table of text lines."""
+    header = (f'{"stage":<16}{"wall":>9}{"cpu":>9}{"items":>10}{"items/s":>12}'
+              f'{"lifetime rss":>13}{"git":>6}')
+    lines = [header]
+    rows = list(metrics["stages"].items()) + [("total", metrics["total"])]
+    for name, stage in rows:
+        lines.append(
+            f'{name:<16}{stage["wall_seconds"]:>8.2f}s{stage["cpu_seconds"]:>8.2f}s'
+            f'{_format_number(stage.get("items"), ","):>10}'
+            f'{_format_number(stage.get("items_per_second"), ",.0f"):>12}'
+            f'{_format_bytes(stage["lifetime_peak_rss"]):>13}{stage["git_processes"]:>6}'
+        )
+    return lines
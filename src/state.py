@@ -0,0 +1,113 @@
+"""Persist aggregation state between runs so later runs can scan incrementally."""
+
+import hashlib
+import json
+import os
+
+import git
+
+from model import Author, authors_from_json, to_json
+
+STATE_FILE = "state.json"
+STATE_VERSION = 2
+
+
+def university_list_digest(university_list):
+    """Return a stable digest of the university list contents."""
+    encoded = json.dumps(university_list, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def load_state(path=STATE_FILE):
+    """Load a saved state, or return None if it is missing or unusable."""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        return None
+    if "authors" in state:
+        state["authors"] = authors_from_json(state["authors"])
+    return state
+
+
+def save_state(state, path=STATE_FILE):
+    """Atomically write state to path."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({"version": STATE_VERSION, **state}, file, ensure_ascii=False, default=to_json)
+    os.replace(tmp_path, path)
+
+
+def incremental_base(state, repo, branch, digest):
+    """Return state if new commits can be merged into it, otherwise None.
+
+    A full rebuild is needed when there is no saved state, it was built for
+    another branch or university list, or its commit is no longer an ancestor
+    of the branch head (history was rewritten).
+    """
+    if state is None:
+        print("No saved state, running a full scan")
+        return None
+    if state.get("branch") != branch:
+        print("Saved state is for another branch, running a full scan")
+        return None
+    if state.get("universities") != digest:
+        print("University list changed, running a full scan")
+        return None
+    try:
+        if not repo.is_ancestor(state["commit"], repo.commit(branch).hexsha):
+            print("Saved commit is not an ancestor of the branch, running a full scan")
+            return None
+    except (git.GitCommandError, ValueError):
+        print("Saved commit is missing from the repository, running a full scan")
+        return None
+    return state
+
+
+def merge_counts(first_map, second_map):
+    """Add per-domain counters, keeping domains first seen in first_map first."""
+    merged = {domain: count + second_map.get(domain, 0) for domain, count in first_map.items()}
+    for domain, count in second_map.items():
+        merged.setdefault(domain, count)
+    return merged
+
+
+def merge_authors(first_map, second_map):
+    """Merge per-domain author maps as if first_map's commits were scanned first.
+
+    Commit lists are concatenated in that order and the display name comes
+    from first_map, matching what a single scan over both ranges records.
+    """
+    merged = {}
+    for domain in list(first_map) + [d for d in second_map if d not in first_map]:
+        first_authors = first_map.get(domain, {})
+        second_authors = second_map.get(domain, {})
+        authors = {}
+        for email, author in first_authors.items():
+            second = second_authors.get(email)
+            commits = author.commits + second.commits if second else author.commits
+            authors[email] = Author(author.email, author.name, commits)
+        for email, author in second_authors.items():
+            authors.setdefault(email, author)
+        merged[domain] = authors
+    return merged
+
+
+def merge_shas(first_map, second_map):
+    """Concatenate each domain's matched commit SHAs, first_map's first."""
+    merged = {domain: shas + second_map.get(domain, []) for domain, shas in first_map.items()}
+    for domain, shas in second_map.items():
+        merged.setdefault(domain, shas)
+    return merged
+
+
+def merge_results(first, second):
+    """Merge two sets of per-domain aggregates; see merge_authors()."""
+    return {
+        "patches": merge_counts(first["patches"], second["patches"]),
+        "lines": merge_counts(first["lines"], second["lines"]),
+        "authors": merge_authors(first["authors"], second["authors"]),
+        "shas": merge_shas(first["shas"], second["shas"]),
+    }
@@ -0,0 +1,172 @@
+"""Load the university domain list from a local file or a conditional-fetch cache."""
+
+import hashlib
+import json
+import os
+import pickle
+
+import requests
+
+from domain_index import build_domain_index
+from state import university_list_digest
+
+UNIVERSITY_LIST_URL = (
+    "https://github.com/Hipo/university-domains-list/raw/master/world_universities_and_domains.json"
+)
+UNIVERSITY_CACHE_DIR = "university-cache"
+RAW_FILE = "world_universities_and_domains.json"
+META_FILE = "meta.json"
+COMPILED_FILE = "compiled.pickle"
+COMPILED_VERSION = 1
+
+
+def compile_university_list(university_list):
+    """Build the precompiled form: the list, its domain index and digest."""
+    return {
+        "version": COMPILED_VERSION,
+        "digest": university_list_digest(university_list),
+        "list": university_list,
+        "index": build_domain_index(university_list),
+    }
+
+
+def load_university_list(source=UNIVERSITY_CACHE_DIR, url=UNIVERSITY_LIST_URL,
+                         cache_dir=UNIVERSITY_CACHE_DIR):
+    """Return (university_list, domain_index, digest).
+
+    source is either a JSON file or a cache directory. The compiled form of
+    a file is kept in cache_dir and reused while the file is unchanged. For
+    a directory the list is fetched from url with If-None-Match /
+    If-Modified-Since; the cached copy is used when the server reports no
+    change or the fetch fails. A missing *.json source is an error rather
+    than a new cache directory.
+    """
+    if os.path.isfile(source):
+        compiled = load_local(source, cache_dir)
+    elif source.endswith(".json") and not os.path.isdir(source):
+        raise FileNotFoundError(f"University list file not found: {source}")
+    else:
+        compiled = fetch_cached(source, url)
+    return compiled["list"], compiled["index"], compiled["digest"]
+
+
+def load_local(path, cache_dir):
+    """Read a local list file, reusing its compiled form from cache_dir.
+
+    The compiled form is cached per file path and reused while the file
+    keeps its mtime and size, or else its content digest, so a touched but
+    unchanged file is not parsed and indexed again.
+    """
+    stat = os.stat(path)
+    key = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, f"local-{key}.pickle")
+    cached = _read_pickle(cache_path)
+    if cached is not None and (cached["mtime_ns"], cached["size"]) == (stat.st_mtime_ns,
+                                                                        stat.st_size):
+        return cached["compiled"]
+
+    with open(path, "rb") as file:
+        content = file.read()
+    content_digest = hashlib.sha256(content).hexdigest()
+    if cached is not None and cached["content_digest"] == content_digest:
+        compiled = cached["compiled"]
+    else:
+        compiled = compile_university_list(json.loads(content))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_atomic(cache_path, pickle.dumps({
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "content_digest": content_digest,
+            "compiled": compiled,
+        }))
+    except OSError as error:
+        print(f"Caching the compiled university list failed ({error})")
+    return compiled
+
+
+def fetch_cached(cache_dir, url):
+    """Fetch the list into cache_dir and return its compiled form."""
+    os.makedirs(cache_dir, exist_ok=True)
+    meta = _read_json(os.path.join(cache_dir, META_FILE)) or {}
+
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = requests.get(url, headers=headers, timeout=(5, 10))
+        if response.status_code == 304:
+            compiled = _load_compiled(cache_dir, meta)
+            if compiled is not None:
+                print("University list not modified, using cached copy")
+                return compiled
+            # cache is unusable; fetch the full list again
+            response = requests.get(url, timeout=(5, 10))
+        response.raise_for_status()
+        university_list = json.loads(response.content)
+    except (requests.RequestException, ValueError) as error:
+        compiled = _load_compiled(cache_dir, meta)
+        if compiled is None:
+            raise
+        print(f"Fetching university list failed ({error}), using cached copy")
+        return compiled
+
+    compiled = compile_university_list(university_list)
+    _write_atomic(os.path.join(cache_dir, RAW_FILE), response.content)
+    _write_atomic(os.path.join(cache_dir, COMPILED_FILE), pickle.dumps(compiled))
+    _write_atomic(os.path.join(cache_dir, META_FILE), json.dumps({
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "digest": compiled["digest"],
+    }).encode("utf-8"))
+    return compiled
+
+
+def _load_compiled(cache_dir, meta):
+    """Load the compiled cache, rebuilding it from the raw copy if needed."""
+    try:
+        with open(os.path.join(cache_dir, COMPILED_FILE), "rb") as file:
+            compiled = pickle.load(file)
+        if (isinstance(compiled, dict) and compiled.get("version") == COMPILED_VERSION
+                and compiled.get("digest") == meta.get("digest")):
+            return compiled
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    university_list = _read_json(os.path.join(cache_dir, RAW_FILE))
+    if university_list is None:
+        return None
+    compiled = compile_university_list(university_list)
+    _write_atomic(os.path.join(cache_dir, COMPILED_FILE), pickle.dumps(compiled))
+    return compiled
+
+
+def _read_pickle(path):
+    """Load a cached local file entry, or None if it is missing or outdated."""
+    try:
+        with open(path, "rb") as file:
+            cached = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if (isinstance(cached, dict) and isinstance(cached.get("compiled"), dict)
+            and cached["compiled"].get("version") == COMPILED_VERSION):
+        return cached
+    return None
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
@@ -1,11 +1,61 @@
 """
 Ensures the project's `src/` directory is on sys.path so tests can import
-modules like `main` without per-file path hacks.
+modules like `main` without per-file path hacks, and provides a small
+scratch git repository for extractor tests.
 """
+import os
+import subprocess
 import sys
 from pathlib import Path
 
+import pytest
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 SRC_PATH = PROJECT_ROOT / "src"
 if str(SRC_PATH) not in sys.path:
     sys.path.insert(0, str(SRC_PATH))
+
+
+def run_git(repo_path, *args, env=None):
+    subprocess.run(["git", "-C", str(repo_path), *args], check=True,
+                   capture_output=True, env=env)
+
+
+def make_repo(repo_path):
+    """Build a small history with a rename, a binary file and a merge."""
+    run_git(repo_path, "init", "-q", "-b", "master")
+    run_git(repo_path, "config", "user.name", "Dev")
+    run_git(repo_path, "config", "user.email", "dev@example.com")
+
+    def commit(name, email, message, date):
+        env = {
+            **os.environ,
+            "GIT_AUTHOR_NAME": name,
+            "GIT_AUTHOR_EMAIL": email,
+            "GIT_AUTHOR_DATE": date,
+            "GIT_COMMITTER_NAME": "Dev",
+            "GIT_COMMITTER_EMAIL": "dev@example.com",
+            "GIT_COMMITTER_DATE": date,
+        }
+        run_git(repo_path, "add", "-A", env=env)
+        run_git(repo_path, "commit", "-q", "--allow-empty", "-m", message, env=env)
+
+    (repo_path / "a.txt").write_text("one\ntwo\n", encoding="utf-8")
+    commit("Alice", "alice@cs.foo.edu", "first\n\nbody", "2024-01-02T03:04:05+08:00")
+    (repo_path / "a.txt").rename(repo_path / "b.txt")
+    (repo_path / "blob.bin").write_bytes(b"\x00\x01\x02")
+    commit("Bob", "bob@bar.ac.cn", "rename <a> & add blob", "2024-02-03T04:05:06-04:30")
+    run_git(repo_path, "checkout", "-q", "-b", "side", "HEAD~1")
+    (repo_path / "c.txt").write_text("side\n", encoding="utf-8")
+    commit("Carol", "carol@example.com", "side work", "2024-03-04T05:06:07+00:00")
+    run_git(repo_path, "checkout", "-q", "master")
+    run_git(repo_path, "merge", "-q", "--no-ff", "--no-edit", "side")
+    commit("Alice", "alice@cs.foo.edu", "empty commit", "2024-04-05T06:07:08+02:00")
+
+
+@pytest.fixture
+def sample_repo(tmp_path):
+    repo_path = tmp_path / "repo"
+    repo_path.mkdir()
+    make_repo(repo_path)
+    return repo_path
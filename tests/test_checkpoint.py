@@ -0,0 +1,109 @@
+"""Tests for scan checkpoints and --resume in checkpoint.py."""
+import json
+import os
+
+import pytest
+
+import main as main_module
+from checkpoint import CHECKPOINT_FILE, Checkpointer, checkpoint_results, load_checkpoint, resume_point
+from domain_index import build_domain_index
+from git_log import count_commits, iter_log_commits
+from main import main
+from scan import scan_records
+
+UNI_LIST = [
+    {"name": "Foo Univ", "domains": ["foo.edu"]},
+    {"name": "Bar Univ", "domains": ["bar.ac.cn"]},
+]
+KEY = {"rev": "abc", "extractor": "log", "universities": "d"}
+
+
+def test_resumed_scan_matches_serial_scan(sample_repo, tmp_path):
+    index = build_domain_index(UNI_LIST)
+    serial, serial_scanned = scan_records(iter_log_commits(sample_repo, "master"), index)
+    path = tmp_path / "checkpoint.jsonl"
+
+    for stop in range(serial_scanned):
+        checkpoint = Checkpointer(path, KEY, every_commits=1, every_seconds=0)
+        records = iter_log_commits(sample_repo, "master")
+        scan_records((record for _, record in zip(range(stop + 1), records)), index,
+                     checkpoint=checkpoint)
+        saved = resume_point(load_checkpoint(path), KEY)
+        assert saved["scanned"] == stop + 1 and checkpoint.written == stop + 1
+
+        resumed = Checkpointer(path, KEY, resumed=saved)
+        results, scanned = scan_records(iter_log_commits(sample_repo, "master", skip=saved["scanned"]),
+                                        index, results=checkpoint_results(saved), checkpoint=resumed)
+        assert scanned == serial_scanned - stop - 1 and resumed.position == serial_scanned
+        assert results == serial and list(results["patches"]) == list(serial["patches"])
+
+
+def test_checkpoint_journal(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    checkpoint = Checkpointer(path, KEY, every_commits=3, every_seconds=0)
+    for sha in "abcdefg":
+        checkpoint.update(sha, "foo.edu" if sha in "bf" else None, {"commit": sha})
+    assert checkpoint.written == 2 and checkpoint.stats()["bytes"] == path.stat().st_size
+    saved = load_checkpoint(path)
+    assert saved["commit"] == "f" and saved["scanned"] == 6
+    assert saved["records"] == [["foo.edu", {"commit": "b"}], ["foo.edu", {"commit": "f"}]]
+
+    # a torn write leaves the last complete checkpoint
+    with open(path, "ab") as file:
+        file.write(b'{"scanned": 9, "comm')
+    assert load_checkpoint(path) == saved
+    resumed = Checkpointer(path, KEY, every_commits=1, every_seconds=0, resumed=saved)
+    resumed.update("g")
+    assert load_checkpoint(path)["scanned"] == 7 and len(load_checkpoint(path)["records"]) == 2
+
+    assert resume_point(load_checkpoint(path), dict(KEY, rev="other")) is None
+    assert resume_point(None, KEY) is None
+    checkpoint.remove()
+    assert not path.exists()
+    checkpoint.remove()
+
+
+def test_main_resume_matches_uninterrupted_run(sample_repo, tmp_path, monkeypatch):
+    uni_file = tmp_path / "unis.json"
+    uni_file.write_text(json.dumps(UNI_LIST), encoding="utf-8")
+    args = ["--path", str(sample_repo), "--university-list", str(uni_file)]
+
+    def outputs():
+        files = {}
+        for root, _, names in os.walk("."):
+            for name in names:
+                if name.endswith((".json", ".js", ".html")) and name != "unis.json":
+                    with open(os.path.join(root, name), "rb") as file:
+                        files[os.path.join(root, name)] = file.read()
+        summary = json.loads(files.pop(os.path.join(".", "summary.json")))
+        del files[os.path.join(".", "summary.js")]
+        del summary["meta"]["update"]
+        return summary, files
+
+    (tmp_path / "full").mkdir()
+    monkeypatch.chdir(tmp_path / "full")
+    main(args)
+    expected = outputs()
+
+    def interrupted(*call_args, **kwargs):
+        for count, record in enumerate(iter_log_commits(*call_args, **kwargs)):
+            if count == 2:
+                raise KeyboardInterrupt
+            yield record
+
+    (tmp_path / "resumed").mkdir()
+    monkeypatch.chdir(tmp_path / "resumed")
+    with monkeypatch.context() as patch:
+        patch.setattr(main_module, "iter_log_commits", interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            main(args + ["--checkpoint-every", "1"])
+    assert load_checkpoint()["scanned"] == 2
+
+    remaining = count_commits(sample_repo, "master") - 2
+    assert main(args + ["--resume", "--checkpoint-every", "1", "--profile"])["scanned"] == remaining
+    assert not os.path.exists(CHECKPOINT_FILE)
+    with open("metrics.json", encoding="utf-8") as file:
+        metrics = json.load(file)
+    assert metrics["stages"]["scan"]["checkpoints"]["written"] == remaining
+    os.remove("metrics.json")
+    assert outputs() == expected
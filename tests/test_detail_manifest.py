@@ -0,0 +1,148 @@
+"""Tests for incremental detail page regeneration with detail_manifest.py."""
+import json
+import os
+
+from conftest import run_git
+from detail_manifest import (MANIFEST_FILE, build_manifest, diff_manifests, page_layout, paginate,
+                             percentiles)
+from main import main
+
+UNI_LIST = [
+    {"name": "Foo Univ", "domains": ["foo.edu"]},
+    {"name": "Bar Univ", "domains": ["bar.ac.cn"]},
+]
+
+
+def test_diff_manifests():
+    result = [{"id": 1, "name": "Foo", "domains": ["foo.edu", "cs.foo.edu"]},
+              {"id": 2, "name": "Bar", "domains": ["bar.ac.cn"]}]
+    shas = {"foo.edu": ["a", "b", "c"], "cs.foo.edu": ["d"], "bar.ac.cn": ["e"]}
+    sizes = dict.fromkeys("abcdef", 1)
+    layout = page_layout(result, shas, sizes, page_bytes=2)
+    assert layout == {1: [["a", "b"], ["c", "d"]], 2: [["e"]]}
+    old = build_manifest(result, layout, {"format": "html"}, sizes, shells=True)
+    assert sorted(old["pages"]) == ["1/1", "1/2", "1/shell", "2/1", "2/shell"]
+    assert diff_manifests(old, old) == (set(), set())
+
+    new_shas = dict(shas, **{"cs.foo.edu": ["f"]})
+    new = build_manifest(result[:1], page_layout(result[:1], new_shas, sizes, page_bytes=2),
+                         {"format": "html"}, sizes, shells=True)
+    assert diff_manifests(old, new) == ({"1/2"}, {"2/1", "2/shell"})
+    assert diff_manifests(None, new) is None
+    assert diff_manifests(old, dict(new, settings={"format": "shared"})) is None
+
+
+def test_new_commit_changes_first_page_only():
+    result = [{"id": 1, "name": "Foo", "domains": ["foo.edu"]}]
+    shas = list("abcdefg")  # newest first
+    sizes = dict.fromkeys("abcdefghij", 1)
+    layout = page_layout(result, {"foo.edu": shas}, sizes, page_bytes=3)
+    # pages fill from the oldest patch, the newest page takes the rest
+    assert layout == {1: [["a"], ["b", "c", "d"], ["e", "f", "g"]]}
+    old = build_manifest(result, layout, {}, sizes)
+    for sha in "hi":
+        shas.insert(0, sha)
+        new = build_manifest(result, page_layout(result, {"foo.edu": shas}, sizes, page_bytes=3),
+                             {}, sizes)
+        assert diff_manifests(old, new) == ({"1/1"}, set())
+        old = new
+
+
+def test_paginate_by_bytes():
+    # a page closes before the patch that would overflow it
+    assert paginate([3, 3, 3, 1], page_bytes=7) == [(0, 2), (2, 4)]
+    # a patch over the budget still gets a page of its own
+    assert paginate([1, 50, 1], page_bytes=10) == [(0, 1), (1, 2), (2, 3)]
+    # capped patches count with the shown bytes only
+    assert paginate([1, 50, 1], page_bytes=10, patch_cap=5) == [(0, 3)]
+    assert paginate([], page_bytes=10) == []
+    assert percentiles([5, 1, 4, 2, 3]) == {"p50": 3, "p90": 5, "p99": 5, "max": 5}
+    assert percentiles([]) == {}
+
+
+def detail_files(out_dir):
+    return {
+        os.path.relpath(os.path.join(root, name), out_dir): os.stat(os.path.join(root, name)).st_mtime_ns
+        for root, _, files in os.walk(out_dir / "detail") for name in files
+    }
+
+
+def test_main_renders_only_changed_pages(sample_repo, tmp_path, monkeypatch):
+    uni_file = tmp_path / "unis.json"
+    uni_file.write_text(json.dumps(UNI_LIST), encoding="utf-8")
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    monkeypatch.chdir(out_dir)
+    args = ["--path", str(sample_repo), "--university-list", str(uni_file)]
+
+    main(args)
+    first = detail_files(out_dir)
+    assert (out_dir / MANIFEST_FILE).exists()
+    main(args)
+    assert detail_files(out_dir) == first
+
+    run_git(sample_repo, "-c", "user.name=Alice", "-c", "user.email=alice@cs.foo.edu",
+            "commit", "-q", "--allow-empty", "-m", "another")
+    main(args)
+    second = detail_files(out_dir)
+    # Foo Univ (id 1) got a commit, Bar Univ (id 2) did not
+    assert second["detail/en/2.html"] == first["detail/en/2.html"]
+    assert second["detail/en/1.html"] != first["detail/en/1.html"]
+
+    full_dir = tmp_path / "full"
+    full_dir.mkdir()
+    monkeypatch.chdir(full_dir)
+    main(args + ["--rebuild-detail"])
+    for path in second:
+        assert (full_dir / path).read_bytes() == (out_dir / path).read_bytes()
+
+    # pages of a university that left the ranking are removed
+    monkeypatch.chdir(out_dir)
+    uni_file.write_text(json.dumps(UNI_LIST[:1]), encoding="utf-8")
+    main(args)
+    assert not (out_dir / "detail" / "en" / "2.html").exists()
+    assert detail_files(out_dir)["detail/en/1.html"] == second["detail/en/1.html"]
+
+
+def test_mailmap_change_keeps_incremental_pages_current(sample_repo, tmp_path, monkeypatch):
+    uni_file = tmp_path / "unis.json"
+    uni_file.write_text(json.dumps(UNI_LIST), encoding="utf-8")
+    args = ["--path", str(sample_repo), "--university-list", str(uni_file)]
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    monkeypatch.chdir(out_dir)
+    main(args + ["--incremental"])
+
+    (sample_repo / ".mailmap").write_text("Mapped <mapped@example.com> <alice@cs.foo.edu>\n",
+                                          encoding="utf-8")
+    main(args + ["--incremental"])
+    full_dir = tmp_path / "full"
+    full_dir.mkdir()
+    monkeypatch.chdir(full_dir)
+    main(args)
+
+    pages = detail_files(out_dir)
+    assert set(pages) == set(detail_files(full_dir))
+    for path in pages:
+        assert (full_dir / path).read_bytes() == (out_dir / path).read_bytes()
+    assert b"alice@cs.foo.edu" in (full_dir / "detail" / "en" / "1.html").read_bytes()
+
+
+def test_main_lays_out_pages_by_bytes(sample_repo, tmp_path, monkeypatch, capsys):
+    uni_file = tmp_path / "unis.json"
+    uni_file.write_text(json.dumps(UNI_LIST), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    args = ["--path", str(sample_repo), "--university-list", str(uni_file), "--page-bytes", "1"]
+
+    main(args + ["--patch-cap", "40"])
+    # Foo Univ has two patches, and a page over the budget holds one
+    assert os.path.exists("detail/en/1_2.html") and not os.path.exists("detail/en/1_3.html")
+    full = sorted(os.listdir("detail/_full"))
+    assert len(full) == 3 and all(len(name) == len("0" * 40 + ".txt") for name in full)
+    assert 'href="../_full/' in (tmp_path / "detail" / "en" / "2.html").read_text(encoding="utf-8")
+    manifest = json.loads((tmp_path / MANIFEST_FILE).read_text(encoding="utf-8"))
+    assert len(manifest["sizes"]) == 3
+    assert "Page bytes over 3 pages: p50 40" in capsys.readouterr().out
+
+    main(args + ["--patch-cap", "0"])
+    assert not os.path.exists("detail/_full")
@@ -0,0 +1,120 @@
+"""Tests for the compressed patch store behind --detail-format store."""
+import json
+import os
+
+from conftest import run_git
+from detail_store import (STORE_DIR, STORE_INDEX_FILE, VIEWER_FILE, DetailStore, item_pages,
+                          load_store_index, render_viewer)
+from main import DETAIL_PAGE_CSS, generate_html_page, main
+
+UNI_LIST = [
+    {"name": "Foo Univ", "domains": ["foo.edu"]},
+    {"name": "Bar Univ", "domains": ["bar.ac.cn"]},
+]
+
+
+def test_store_round_trip_and_repack(tmp_path):
+    root = tmp_path / "store"
+    store = DetailStore(str(root), chunk_bytes=20)
+    texts = {sha: f"patch {sha} ä\n" * 2 for sha in "abcdef"}
+    for sha, text in texts.items():
+        store.append(sha, text)
+    assert store.finish(texts) == 0
+    assert {sha: store.patch(sha) for sha in texts} == texts
+    # every patch exceeds chunk_bytes, so each fills a chunk of its own
+    assert len(store.chunks) == 6 and store.written == 6
+    store.save(str(tmp_path / "index.json"))
+
+    reopened = DetailStore(str(root), load_store_index(str(tmp_path / "index.json")), chunk_bytes=100)
+    assert reopened.missing(["a", "g"]) == ["g"]
+    reopened.append("g", "new patch\n")
+    reopened.finish(["a", "g"])
+    assert sorted(os.listdir(root)) == sorted(f"{name}.gz" for name in reopened.chunks)
+    # the chunks of b-f are deleted, a keeps its chunk
+    assert len(reopened.chunks) == 2
+    assert reopened.patch("a") == texts["a"] and reopened.patch("g") == "new patch\n"
+
+
+def test_sparse_chunks_are_repacked(tmp_path):
+    store = DetailStore(str(tmp_path), chunk_bytes=1000)
+    for sha in "abcd":
+        store.append(sha, sha * 100)
+    store.finish("abcd")
+    old_chunks = set(store.chunks)
+    assert store.finish("a") == 1
+    assert not old_chunks & set(store.chunks)
+    assert store.patch("a") == "a" * 100 and store.chunks[store.locations["a"][0]] == 100
+
+
+def test_missing_chunks_start_an_empty_store(tmp_path):
+    store = DetailStore(str(tmp_path / "store"))
+    store.append("a", "text")
+    store.finish("a")
+    os.remove(store.chunk_path(store.locations["a"][0]))
+    index = {"version": 1, "chunks": store.chunks, "patches": store.locations}
+    assert DetailStore(str(tmp_path / "store"), index).missing(["a"]) == ["a"]
+
+
+def test_other_settings_start_an_empty_store(tmp_path):
+    store = DetailStore(str(tmp_path / "store"), settings={"render": 1})
+    store.append("a", "text")
+    store.finish("a")
+    store.save(str(tmp_path / "index.json"))
+    index = load_store_index(str(tmp_path / "index.json"))
+    assert DetailStore(str(tmp_path / "store"), index, settings={"render": 1}).missing(["a"]) == []
+    assert DetailStore(str(tmp_path / "store"), index, settings={"render": 2}).missing(["a"]) == ["a"]
+    assert not os.listdir(tmp_path / "store")
+
+
+def test_item_pages_follow_the_layout():
+    item = {"id": 3, "name": "Foo", "domains": ["foo.edu", "cs.foo.edu"]}
+    locations = {"a": ["x", 0, 5], "b": ["y", 0, 6], "c": ["x", 5, 7]}
+    assert item_pages(item, [["a", "b"], ["c"]], locations) == {
+        "name": "Foo", "chunks": ["x", "y"], "pages": [[[0, 0, 5], [1, 0, 6]], [[0, 5, 7]]],
+    }
+
+
+def test_viewer_renders_like_the_html_pages():
+    page = render_viewer(DETAIL_PAGE_CSS, {"en": {"patches_contributed_by": "</script>{name}"}})
+    assert "<\\/script>{name}" in page and DETAIL_PAGE_CSS in page
+    html, _ = generate_html_page(1, "Foo", ["x"], 1)
+    # the viewer builds the same patch cards as the HTML pages
+    assert '<div class="patch-card"><pre>' in html and "'<div class=\"patch-card\"><pre>'" in page
+
+
+def test_main_store_fetches_only_new_patches(sample_repo, tmp_path, monkeypatch):
+    uni_file = tmp_path / "unis.json"
+    uni_file.write_text(json.dumps(UNI_LIST), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    args = ["--path", str(sample_repo), "--university-list", str(uni_file),
+            "--detail-format", "store", "--profile"]
+
+    main(args[:-3])  # html pages first, replaced by the store below
+    main(args)
+    assert not os.path.exists("detail/en") and not os.path.exists("detail-manifest.json")
+    assert os.path.exists(VIEWER_FILE)
+    summary = json.loads((tmp_path / "summary.json").read_text(encoding="utf-8"))
+    assert summary["meta"]["detail_viewer"] == "detail/view.html"
+    index = load_store_index(STORE_INDEX_FILE)
+    store = DetailStore(STORE_DIR, index, settings=index["settings"])
+    foo = json.loads((tmp_path / STORE_DIR / "1.json").read_text(encoding="utf-8"))
+    assert foo["name"] == "Foo Univ" and len(foo["pages"]) == 1 and len(foo["pages"][0]) == 2
+    assert all(store.patch(sha).startswith(f"commit {sha}") for sha in store.locations)
+
+    run_git(sample_repo, "-c", "user.name=Alice", "-c", "user.email=alice@cs.foo.edu",
+            "commit", "-q", "--allow-empty", "-m", "another")
+    main(args)
+    metrics = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert metrics["stages"]["fetch_patches"]["items"] == 1
+    assert len(load_store_index(STORE_INDEX_FILE)["patches"]) == len(store.locations) + 1
+
+    # a store filled with other fetch settings, e.g. with .mailmap applied, is refetched
+    index = load_store_index(STORE_INDEX_FILE)
+    (tmp_path / STORE_INDEX_FILE).write_text(json.dumps(dict(index, settings=None)), encoding="utf-8")
+    main(args)
+    metrics = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert metrics["stages"]["fetch_patches"]["items"] == len(index["patches"])
+    assert load_store_index(STORE_INDEX_FILE)["settings"] == index["settings"]
+
+    main(args[:-3])
+    assert not os.path.exists(STORE_DIR) and not os.path.exists(STORE_INDEX_FILE)
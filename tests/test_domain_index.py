@@ -0,0 +1,26 @@
+"""Tests for the university domain index in domain_index.py."""
+from domain_index import build_domain_index, domain_suffixes, lookup_university
+from main import get_university
+
+
+def test_domain_suffixes():
+    assert list(domain_suffixes("cs.foo.edu")) == ["cs.foo.edu", "foo.edu", "edu"]
+    assert list(domain_suffixes("localhost")) == ["localhost"]
+
+
+def test_lookup_university_matches_get_university():
+    uni_list = [
+        {"name": "Foo Univ", "domains": ["foo.edu", "cs.foo.edu"]},
+        {"name": "Bar Univ", "domains": ["bar.ac.cn"]},
+        {"name": "Lab", "domains": ["lab.cs.foo.edu", "bar.ac.cn"]},
+    ]
+    index = build_domain_index(uni_list)
+    for domain in ["cs.foo.edu", "mail.foo.edu", "x.lab.cs.foo.edu", "lab.cs.foo.edu",
+                   "bar.ac.cn", "mail.bar.ac.cn", "unknown.org", "edu", ""]:
+        assert lookup_university(domain, index) is get_university(domain, uni_list)
+
+    # exact match first, then the earliest university owning a parent domain
+    assert lookup_university("lab.cs.foo.edu", index)["name"] == "Lab"
+    assert lookup_university("x.lab.cs.foo.edu", index)["name"] == "Foo Univ"
+    assert lookup_university("bar.ac.cn", index)["name"] == "Bar Univ"
+    assert lookup_university("unknown.org", index) is None
@@ -1,4 +1,8 @@
 """Unit tests for functions in main.py."""
+import json
+from pathlib import Path
+
+from model import Author, Commit
 from main import (
     SUPPORTED_LOCALES,
     get_university,
@@ -7,11 +11,15 @@ from main import (
     merge_university_results,
     add_rankings,
     create_pagination_html,
+    cap_patch,
     escape_html_content,
     generate_html_page,
+    render_html_page,
+    render_patch_content,
     generate_all_html_files,
     message,
     write_result_files,
+    write_sharded_result_files,
 )
 
 
@@ -29,20 +37,26 @@ def test_get_university():
 
 
 def test_transform_author_data():
+    def author(email, name, count):
+        return Author(email, name, [Commit("c", "s", 0, 0, 1, 1, 0)] * count)
+
     authors_map = {
         "foo.edu": {
-            "a@foo.edu": ["NameA", 2, []],
-            "b@foo.edu": ["NameB", 5, []],
-            "c@foo.edu": ["NameC", 3, []],
+            "a@foo.edu": author("a@foo.edu", "NameA", 2),
+            "b@foo.edu": author("b@foo.edu", "NameB", 5),
+            "c@foo.edu": author("c@foo.edu", "NameC", 3),
         }
     }
     authors = transform_author_data(authors_map, "foo.edu")
-    assert [a["email"] for a in authors] == ["b@foo.edu", "c@foo.edu", "a@foo.edu"]
+    assert [a.email for a in authors] == ["b@foo.edu", "c@foo.edu", "a@foo.edu"]
     # sort by count desc
-    assert authors[0]["name"] == "NameB" and authors[0]["count"] == 5
+    assert authors[0].name == "NameB" and authors[0].count == 5
+    assert authors[0].to_json() == {
+        "email": "b@foo.edu", "name": "NameB", "count": 5, "commits": authors[0].commits,
+    }
 
 def test_create_domain_result():
-    authors_map = {"foo.edu": {"x@foo.edu": ["NameX", 1, ["commit1"]]}}
+    authors_map = {"foo.edu": {"x@foo.edu": Author("x@foo.edu", "NameX", ["commit1"])}}
     university_info = {"name": "Foo Univ", "domains": ["foo.edu"]}
 
     known = create_domain_result(
@@ -76,7 +90,7 @@ def test_merge_university_results():
             "university": {},
             "count": 3,
             "lines": 10,
-            "authors": [{"count": 3}],
+            "authors": [Author("a@foo.edu", "A", ["c1"])],
         },
         {
             "name": "Foo Univ",
@@ -84,7 +98,7 @@ def test_merge_university_results():
             "university": {},
             "count": 2,
             "lines": 5,
-            "authors": [{"count": 2}],
+            "authors": [Author("b@cs.foo.edu", "B", ["c2", "c3"])],
         },
         {
             "name": "Bar Univ",
@@ -92,7 +106,7 @@ def test_merge_university_results():
             "university": {},
             "count": 3,
             "lines": 9,
-            "authors": [{"count": 3}],
+            "authors": [Author("c@bar.ac.cn", "C", ["c4"])],
         },
     ]
     merged = merge_university_results(items)
@@ -103,7 +117,7 @@ def test_merge_university_results():
     foo = matches[0]
     assert set(foo["domains"]) == {"foo.edu", "cs.foo.edu"}
     assert foo["count"] == 5 and foo["lines"] == 15
-    assert len(foo["authors"]) == 2
+    assert [a.email for a in foo["authors"]] == ["b@cs.foo.edu", "a@foo.edu"]
 
 
 def test_add_rankings():
@@ -230,6 +244,24 @@ def test_generate_html_page():
     assert 'A <B> "C"' not in html_title
 
 
+def test_oversized_patches_are_capped():
+    sha = "ab" * 20
+    patch = f"commit {sha}\n" + "é<line>\n" * 100
+    assert cap_patch(patch, 0) is None and cap_patch("short", 100) is None
+    shown, shown_bytes, total = cap_patch(patch, 64)
+    # the cut falls on the last line break within the cap
+    assert shown == f"commit {sha}\né<line>\n" and shown_bytes == 48 + 9
+    assert total == len(patch.encode("utf-8"))
+
+    full = []
+    content = render_patch_content(["small", patch], patch_cap=64, full_patches=full)
+    assert full == [(f"{sha}.txt", patch)]
+    assert "<pre>small</pre>" in content and "é&lt;line&gt;" in content
+    assert f'href="../_full/{sha}.txt"' in content and content.count("&lt;line&gt;") == 1
+    html = render_html_page(1, "T", content, 1, 1, locale="ja")
+    assert "パッチ全文を表示</a>" in html and "<!--full-patch-->" not in html
+
+
 def test_supported_locale_messages():
     for locale in SUPPORTED_LOCALES:
         assert message(locale, "back_to_rankings")
@@ -267,3 +299,80 @@ def test_write_result_files(tmp_path, monkeypatch):
     result_js = (tmp_path / "result.js").read_text(encoding="utf-8")
     assert result_js.startswith("window.__LINUX_EDU_RANK_RESULT__ = ")
     assert '"repo": "Test"' in result_js
+
+
+def test_write_sharded_result_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "authors").mkdir()
+    (tmp_path / "authors" / "99.json").write_text("[]", encoding="utf-8")
+    authors = [{"email": "a@foo.edu", "name": "A", "count": 1, "commits": []}]
+    payload = {
+        "meta": {"repo": "Test"},
+        "data": [{"id": 1, "rank": 1, "name": "Foo Univ", "count": 1, "authors": authors}],
+    }
+
+    write_sharded_result_files(payload)
+
+    summary = json.loads((tmp_path / "summary.json").read_text(encoding="utf-8"))
+    assert summary == {"meta": {"repo": "Test"},
+                       "data": [{"id": 1, "rank": 1, "name": "Foo Univ", "count": 1}]}
+    assert (tmp_path / "summary.js").read_text(encoding="utf-8").startswith(
+        "window.__LINUX_EDU_RANK_SUMMARY__ = ")
+    assert json.loads((tmp_path / "authors" / "1.json").read_text(encoding="utf-8")) == authors
+    assert '"a@foo.edu"' in (tmp_path / "authors" / "1.js").read_text(encoding="utf-8")
+    # shards from a previous run are removed
+    assert not (tmp_path / "authors" / "99.json").exists()
+    assert not (tmp_path / "result.json").exists()
+
+    write_sharded_result_files(payload, compact=True)
+    compact = (tmp_path / "summary.json").read_text(encoding="utf-8")
+    assert "\n" not in compact and json.loads(compact) == summary
+
+
+def test_generate_all_html_files_parallel_matches_serial(tmp_path, monkeypatch):
+    processed_result = [
+        {"id": 1, "name": "Foo Univ", "domains": ["foo.edu", "cs.foo.edu"]},
+        {"id": 2, "name": "Bar Univ", "domains": ["bar.ac.cn"]},
+    ]
+    result_detailed = {
+        "foo.edu": [f"foo <{i}>" for i in range(13)],
+        "cs.foo.edu": ["cs & patch"],
+        "bar.ac.cn": ["bar"],
+    }
+    outputs = {}
+    for jobs in (1, 2):
+        (tmp_path / str(jobs)).mkdir()
+        monkeypatch.chdir(tmp_path / str(jobs))
+        generate_all_html_files(processed_result, result_detailed, locales=("en", "ko"), jobs=jobs)
+        outputs[jobs] = {
+            path.relative_to(tmp_path / str(jobs)): path.read_text(encoding="utf-8")
+            for path in (tmp_path / str(jobs)).rglob("*.html")
+        }
+
+    assert len(outputs[1]) == 6
+    assert outputs[1] == outputs[2]
+    patches = result_detailed["foo.edu"] + result_detailed["cs.foo.edu"]
+    title = message("ko", "patches_contributed_by").format(name="Foo Univ")
+    for page in (1, 2):
+        html, fname = generate_html_page(1, title, patches, page, locale="ko")
+        assert outputs[1][Path("detail") / "ko" / fname] == html
+
+
+def test_generate_all_html_files_shared_detail(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    processed_result = [{"id": 3, "name": "Foo Univ", "domains": ["foo.edu"]}]
+    result_detailed = {"foo.edu": [f"<patch {i}>" for i in range(12)]}
+
+    generate_all_html_files(processed_result, result_detailed, locales=("en", "ja"), shared=True)
+
+    shared = tmp_path / "detail" / "_shared"
+    assert sorted(p.name for p in shared.iterdir()) == [
+        "3.js", "3_2.js", "detail.css", "detail.js"
+    ]
+    assert "&lt;patch 11&gt;" in (shared / "3_2.js").read_text(encoding="utf-8")
+    # one thin shell per locale, no per-page copies of the patches
+    assert not (tmp_path / "detail" / "en" / "3_2.html").exists()
+    en_html = (tmp_path / "detail" / "en" / "3.html").read_text(encoding="utf-8")
+    ja_html = (tmp_path / "detail" / "ja" / "3.html").read_text(encoding="utf-8")
+    assert 'data-page-num="2"' in en_html and "patch 0" not in en_html
+    assert "../../index.html?lang=ja" in ja_html and 'data-prev="前へ"' in ja_html
@@ -0,0 +1,50 @@
+"""Tests for the cat-file/diff-tree coprocess backend in git_batch.py."""
+from domain_index import build_domain_index
+from git_batch import GitBatch, parse_commit_object
+from git_log import iter_log_commits
+from scan import scan_batch, scan_batch_shard, scan_records, scan_sharded
+
+UNI_LIST = [
+    {"name": "Foo Univ", "domains": ["foo.edu"]},
+    {"name": "Bar Univ", "domains": ["bar.ac.cn"]},
+]
+
+
+def test_parse_commit_object():
+    data = (
+        b"tree 4b825dc642cb6eb9a060e54bf8d69288fbee4904\n"
+        b"parent 1111111111111111111111111111111111111111\n"
+        b"author Jos\xe9 <jose@foo.edu> 1704135845 +0800\n"
+        b"committer C <c@example.com> 1704135845 +0800\n"
+        b"encoding ISO-8859-1\n"
+        b"\n"
+        b"Fix caf\xe9\n\nBody\n"
+    )
+    record = parse_commit_object("abc", data)
+    assert record == {
+        "commit": "abc",
+        "name": "José",
+        "email": "jose@foo.edu",
+        "summary": "Fix café",
+        "date": "2024-01-02T03:04:05+08:00",
+        "parents": ["1111111111111111111111111111111111111111"],
+    }
+
+
+def test_batch_records_match_log_records(sample_repo):
+    expected = list(iter_log_commits(sample_repo, "master"))
+    with GitBatch(sample_repo) as batch:
+        records = [batch.add_stats(record) for record in batch.iter_commits("master")]
+        assert records == expected
+        assert [r["commit"] for r in batch.iter_commits("master", skip=1, max_count=2)] == [
+            r["commit"] for r in expected[1:3]
+        ]
+
+
+def test_scan_batch_matches_serial_scan(sample_repo):
+    index = build_domain_index(UNI_LIST)
+    serial, serial_scanned = scan_records(iter_log_commits(sample_repo, "master"), index)
+
+    assert scan_batch(sample_repo, "master", index) == (serial, serial_scanned)
+    assert scan_sharded(sample_repo, "master", serial_scanned, 3, index,
+                        scan_batch_shard) == (serial, serial_scanned)
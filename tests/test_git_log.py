@@ -0,0 +1,60 @@
+"""Tests for the streaming git extractor in git_log.py."""
+import git
+
+from git_log import (
+    SHOW_OPTIONS,
+    iter_commit_emails,
+    iter_commit_records,
+    iter_log_commits,
+    iter_show_patches,
+    parse_raw_date,
+)
+
+
+def test_parse_raw_date():
+    assert parse_raw_date("1704135845 +0800") == "2024-01-02T03:04:05+08:00"
+    assert parse_raw_date("1706949306 -0430") == "2024-02-03T04:05:06-04:30"
+
+
+def test_iter_log_commits_matches_gitpython(sample_repo):
+    repo = git.Repo(sample_repo)
+
+    records = list(iter_log_commits(sample_repo, "master"))
+    commits = list(repo.iter_commits("master"))
+
+    assert [r["commit"] for r in records] == [c.hexsha for c in commits]
+    for record, commit in zip(records, commits):
+        stats = commit.stats.total
+        assert record["name"] == commit.author.name
+        assert record["email"] == commit.author.email
+        assert record["summary"] == commit.summary
+        assert record["date"] == commit.authored_datetime.isoformat()
+        assert record["files"] == stats["files"]
+        assert record["insertions"] == stats["insertions"]
+        assert record["deletions"] == stats["deletions"]
+
+
+def test_two_phase_readers_match_iter_log_commits(sample_repo):
+    records = list(iter_log_commits(sample_repo, "master"))
+
+    emails = list(iter_commit_emails(sample_repo, "master"))
+    assert emails == [(r["commit"], r["email"]) for r in records]
+
+    # records come back in the requested order, not in log order
+    picked = [records[2]["commit"], records[0]["commit"], records[-1]["commit"]]
+    assert list(iter_commit_records(sample_repo, picked)) == [
+        records[2], records[0], records[-1]
+    ]
+    assert not list(iter_commit_records(sample_repo, []))
+
+
+def test_iter_show_patches_matches_git_show(sample_repo):
+    repo = git.Repo(sample_repo)
+    shas = [c.hexsha for c in repo.iter_commits("master")]
+
+    patches = list(iter_show_patches(sample_repo, shas))
+
+    assert [sha for sha, _ in patches] == shas
+    for sha, text in patches:
+        assert text == repo.git.show(*SHOW_OPTIONS, sha)
+    assert not list(iter_show_patches(sample_repo, []))
@@ -0,0 +1,42 @@
+"""Tests for the streaming JSON/JS writer in json_stream.py."""
+import json
+
+from json_stream import iter_json, write_json_and_js
+from main import dump_json
+from model import Author, Commit
+
+PAYLOAD = {
+    "meta": {"repo": "Linux", "sources": [], "extra": {}},
+    "data": [
+        {"id": 1, "name": "北京大学 \"PKU\"\n", "domains": ["pku.edu.cn"], "university": None,
+         "authors": [Author("a@pku.edu.cn", "Ä", [Commit("c1", "fix </script>", 0, 480, 1, 2, 3)])],
+         "ratio": 0.5, "flags": [True, False, None], "nested": {"1": [], "x": {"y": [1, 2]}}},
+        {"id": 2, "authors": []},
+    ],
+    "empty": [],
+}
+
+
+def test_iter_json_matches_dump_json():
+    for value in (PAYLOAD, PAYLOAD["data"], {}, [], "text", {1: {2: [3]}, None: True}):
+        for compact in (False, True):
+            expected = dump_json(value, compact)
+            assert expected == json.dumps(json.loads(expected), ensure_ascii=False,
+                                          **({"separators": (",", ":")} if compact else
+                                             {"indent": 2}))
+            for depth in range(5):
+                assert "".join(iter_json(value, compact, depth)) == expected
+
+
+def test_iter_json_pieces_are_bounded_by_one_element():
+    pieces = list(iter_json(PAYLOAD, depth=2))
+    # the largest piece is the biggest university, re-indented to its level
+    assert max(pieces, key=len) == dump_json(PAYLOAD["data"][0]).replace("\n", "\n    ")
+
+
+def test_write_json_and_js(tmp_path):
+    write_json_and_js(PAYLOAD, tmp_path / "out.json", tmp_path / "out.js", "var x = ", compact=True)
+    assert (tmp_path / "out.json").read_text(encoding="utf-8") == dump_json(PAYLOAD, True)
+    assert (tmp_path / "out.js").read_text(encoding="utf-8") == (
+        f"var x = {dump_json(PAYLOAD, True)};\n"
+    )
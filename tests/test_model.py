@@ -0,0 +1,33 @@
+"""Tests for the slotted commit and author records in model.py."""
+import json
+
+from model import Author, authors_from_json, commit_from_json, commit_from_record, to_json
+from state import load_state, save_state
+
+
+def record(date, sha="c1"):
+    return {"commit": sha, "name": "A", "email": "a@foo.edu", "summary": "fix: x",
+            "date": date, "files": 2, "insertions": 7, "deletions": 3}
+
+
+def test_commit_serializes_to_result_schema():
+    for date in ("2024-01-02T03:04:05+08:00", "2024-02-03T04:05:06-04:30",
+                 "1969-12-31T23:59:59+00:00"):
+        commit = commit_from_record(record(date))
+        assert commit.to_json() == {
+            "commit": "c1", "summary": "fix: x", "date": date, "files": 2, "lines": "-3/+7",
+        }
+        assert commit_from_json(commit.to_json()) == commit
+
+
+def test_authors_round_trip_through_state(tmp_path):
+    author = Author("a@foo.edu", "A", [commit_from_record(record("2024-01-02T03:04:05+08:00")),
+                                       commit_from_record(record("2023-05-06T07:08:09+02:00", "c0"))])
+    assert json.loads(json.dumps(author, default=to_json))["count"] == 2
+
+    authors_map = {"foo.edu": {"a@foo.edu": author}}
+    assert authors_from_json(json.loads(json.dumps(authors_map, default=to_json))) == authors_map
+
+    path = tmp_path / "state.json"
+    save_state({"commit": "abc", "authors": authors_map}, path)
+    assert load_state(path)["authors"] == authors_map
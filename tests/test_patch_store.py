@@ -0,0 +1,36 @@
+"""Tests for the on-disk patch store in patch_store.py."""
+from main import generate_all_html_files
+from patch_store import PatchStore
+
+
+def test_patch_store_reads_back_slices(tmp_path):
+    store = PatchStore(str(tmp_path / "store"))
+    store.append("foo.edu", "first")
+    store.append("bar.edu", "bar é")
+    store.append("foo.edu", "second\udcff")
+    store.append("foo.edu", "third")
+
+    assert store.count("foo.edu") == 3 and store.count("none.edu") == 0
+    patches = store.patches(["foo.edu", "bar.edu"])
+    assert len(patches) == 4
+    assert patches[1:3] == ["second\udcff", "third"]
+    assert patches[3] == "bar é"
+    assert list(patches) == ["first", "second\udcff", "third", "bar é"]
+
+    store.remove()
+    assert not (tmp_path / "store").exists()
+
+
+def test_generate_all_html_files_from_patch_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = PatchStore("store")
+    for i in range(12):
+        store.append("foo.edu" if i < 7 else "cs.foo.edu", f"patch-{i}")
+    processed_result = [{"id": 1, "name": "Foo Univ", "domains": ["foo.edu", "cs.foo.edu"]}]
+
+    generate_all_html_files(processed_result, store, locales=("en",))
+
+    page1 = (tmp_path / "detail" / "en" / "1.html").read_text(encoding="utf-8")
+    page2 = (tmp_path / "detail" / "en" / "1_2.html").read_text(encoding="utf-8")
+    assert "patch-0" in page1 and "patch-9" in page1 and "patch-10" not in page1
+    assert "patch-10" in page2 and "patch-11" in page2
@@ -0,0 +1,65 @@
+"""Tests for the precompression stage in precompress.py."""
+import gzip
+import json
+
+import precompress
+from main import main
+
+
+def test_precompress_writes_gzip_siblings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "summary.json").write_text('{"a": 1}', encoding="utf-8")
+    (tmp_path / "detail" / "en").mkdir(parents=True)
+    (tmp_path / "detail" / "en" / "1.html").write_text("<p>patch</p>" * 100, encoding="utf-8")
+    (tmp_path / "detail" / "en" / "2.html").write_text("é", encoding="utf-8")
+
+    for jobs in (1, 2):
+        report, _ = precompress.precompress(["summary.json", "detail", "missing"], ("gz",), jobs)
+        assert list(report) == ["summary.json", "detail"]
+        assert report["detail"]["files"] == 2
+        assert report["detail"]["raw"] == 1200 + 2
+        assert report["detail"]["gz"] < report["detail"]["raw"]
+
+    page = tmp_path / "detail" / "en" / "1.html"
+    assert gzip.decompress((tmp_path / "detail" / "en" / "1.html.gz").read_bytes()) == page.read_bytes()
+    # compressed output is reproducible
+    first = (tmp_path / "summary.json.gz").read_bytes()
+    (tmp_path / "summary.json").write_text('{"a": 1}', encoding="utf-8")
+    precompress.precompress(["summary.json"], ("gz",))
+    assert (tmp_path / "summary.json.gz").read_bytes() == first
+
+    # siblings newer than their file are reused
+    sibling = tmp_path / "detail" / "en" / "2.html.gz"
+    sibling.write_bytes(b"kept")
+    report, _ = precompress.precompress(["detail"], ("gz",))
+    assert sibling.read_bytes() == b"kept" and report["detail"]["gz"] < report["detail"]["raw"]
+    (tmp_path / "detail" / "en" / "2.html").write_text("ü", encoding="utf-8")
+    precompress.precompress(["detail"], ("gz",))
+    assert gzip.decompress(sibling.read_bytes()) == "ü".encode("utf-8")
+
+
+def test_brotli_is_optional(monkeypatch):
+    monkeypatch.setattr(precompress, "brotli", None)
+    assert precompress.available_formats() == ("gz",)
+
+    lines = precompress.format_report(
+        {"detail": {"files": 2, "raw": 1000, "gz": 250}}, 1.25
+    )
+    assert "br" not in lines[0]
+    assert "25.0%" in lines[1] and lines[2].startswith("total")
+    assert lines[-1] == "Precompressed 2 files in 1.2s"
+
+
+def test_main_precompresses_slices(sample_repo, tmp_path, monkeypatch):
+    uni_file = tmp_path / "unis.json"
+    uni_file.write_text(json.dumps([{"name": "Foo Univ", "domains": ["foo.edu"]}]),
+                        encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    main(["--path", str(sample_repo), "--university-list", str(uni_file),
+          "--slices", "--precompress"])
+
+    assert (tmp_path / "summary.json.gz").exists()
+    slice_files = list((tmp_path / "slices").rglob("*.json"))
+    assert slice_files
+    for path in slice_files:
+        assert gzip.decompress(path.with_name(path.name + ".gz").read_bytes()) == path.read_bytes()
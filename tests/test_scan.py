@@ -0,0 +1,80 @@
+"""Tests for commit matching and sharded scanning in scan.py."""
+import json
+
+import git
+
+from domain_index import build_domain_index
+from git_log import count_commits, iter_commit_emails, iter_log_commits
+from main import main
+from scan import (
+    match_commits,
+    scan_gitpython,
+    scan_matched,
+    scan_records,
+    scan_sharded,
+    university_email_domain,
+)
+
+UNI_LIST = [
+    {"name": "Foo Univ", "domains": ["foo.edu"]},
+    {"name": "Bar Univ", "domains": ["bar.ac.cn"]},
+]
+
+
+def test_university_email_domain():
+    index = build_domain_index(UNI_LIST)
+    cache = set()
+    assert university_email_domain("a@cs.foo.edu", index, cache) == "cs.foo.edu"
+    assert university_email_domain("b@example.com", index, cache) is None
+    assert cache == {"example.com"}
+    assert university_email_domain("", index, cache) is None
+
+
+def test_scan_sharded_matches_serial_scan(sample_repo):
+    index = build_domain_index(UNI_LIST)
+    serial, serial_scanned = scan_records(iter_log_commits(sample_repo, "master"), index)
+    assert serial["patches"] == {"cs.foo.edu": 2, "bar.ac.cn": 1}
+
+    for jobs in (2, 5):
+        sharded, scanned = scan_sharded(sample_repo, "master", serial_scanned, jobs, index)
+        assert scanned == serial_scanned
+        assert sharded == serial
+        assert list(sharded["patches"]) == list(serial["patches"])
+
+
+def test_two_phase_scan_matches_serial_scan(sample_repo):
+    index = build_domain_index(UNI_LIST)
+    serial, serial_scanned = scan_records(iter_log_commits(sample_repo, "master"), index)
+
+    matched, scanned = match_commits(iter_commit_emails(sample_repo, "master"), index)
+    assert scanned == serial_scanned
+    assert sorted(sha for sha, _ in matched) == sorted(
+        sha for shas in serial["shas"].values() for sha in shas
+    )
+    assert scan_matched(sample_repo, matched) == serial
+
+
+def test_gitpython_scan_streams_commits(sample_repo):
+    index = build_domain_index(UNI_LIST)
+    serial, serial_scanned = scan_records(iter_log_commits(sample_repo, "master"), index)
+    assert count_commits(sample_repo, "master") == serial_scanned
+
+    commits = git.Repo(sample_repo).iter_commits("master")
+    results, scanned = scan_gitpython(commits, index)
+    assert scanned == serial_scanned
+    assert results == serial
+    assert next(commits, None) is None
+
+
+def test_main_twophase_with_jobs_warns(sample_repo, tmp_path, monkeypatch, capsys):
+    uni_file = tmp_path / "unis.json"
+    uni_file.write_text(json.dumps(UNI_LIST), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    args = ["--path", str(sample_repo), "--university-list", str(uni_file)]
+
+    main(args)
+    serial = (tmp_path / "summary.json").read_text(encoding="utf-8")
+    main(args + ["--extractor", "twophase", "--jobs", "2"])
+    assert "--jobs does not shard the twophase scan" in capsys.readouterr().out
+    assert json.loads((tmp_path / "summary.json").read_text(encoding="utf-8"))["data"] == \
+        json.loads(serial)["data"]
@@ -0,0 +1,62 @@
+"""Tests for the sharded search index in search_index.py."""
+import json
+
+from model import Author, Commit
+from search_index import (SEARCH_DIR, build_postings, delta_encode, shard_file, split_shards,
+                          tokenize, write_search_index)
+
+RESULT = [
+    {"id": 1, "name": "Foo University", "domains": ["cs.foo.edu"], "authors": [
+        Author("alice@cs.foo.edu", "Alice", [
+            Commit("a1", "mm: fix page_alloc leak", 0, 0, 1, 1, 1),
+            Commit("a2", "net: add foo driver", 0, 0, 1, 1, 1),
+        ]),
+        Author("dave@cs.foo.edu", "Dave", [Commit("d1", "mm: cleanup", 0, 0, 1, 1, 1)]),
+    ]},
+    {"id": 2, "name": "北京大学", "domains": ["pku.edu.cn"], "authors": [
+        Author("bob@pku.edu.cn", "Bob", [Commit("b1", "MM: fix 北京 typo", 0, 0, 1, 1, 1)]),
+    ]},
+]
+
+
+def test_tokenize():
+    assert tokenize("mm/page_alloc: Fix a LEAK in x86") == {"mm", "page_alloc", "fix", "leak", "in", "x86"}
+    assert tokenize("北京大学 a " + "x" * 41) == {"北京大学"}
+
+
+def test_build_postings():
+    postings = build_postings(RESULT)
+    assert postings["foo"] == {"u": [1], "a": {1: [0, 1]}, "c": {1: [1]}}
+    # positions count through all commits of the university's authors
+    assert postings["mm"] == {"c": {1: [0, 2], 2: [0]}}
+    assert postings["fix"] == {"c": {1: [0], 2: [0]}}
+    assert postings["北京大学"] == {"u": [2]}
+    assert postings["alice"] == {"a": {1: [0]}}
+    assert delta_encode([3, 5, 9]) == [3, 2, 4]
+
+
+def test_split_shards_keys_tokens_by_longest_prefix():
+    sizes = {"aa": 5, "aab": 5, "aac": 5, "aacd": 5, "ab": 5, "bcd": 5}
+    shards = split_shards(sizes, max_bytes=10)
+    assert shards == {"aa": ["aa"], "aab": ["aab"], "aac": ["aac", "aacd"], "ab": ["ab"], "bc": ["bcd"]}
+    for prefix, tokens in shards.items():
+        for token in tokens:
+            assert max((key for key in shards if token.startswith(key)), key=len) == prefix
+    assert shard_file("ab12") == "ab12"
+    assert shard_file("北京") == "_e58c97e4baac"
+
+
+def test_write_search_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / SEARCH_DIR).mkdir()
+    (tmp_path / SEARCH_DIR / "stale.json").write_text("{}")
+    stats = write_search_index(RESULT)
+    index = json.loads((tmp_path / SEARCH_DIR / "index.json").read_text(encoding="utf-8"))
+    assert index["stats"] == stats
+    assert stats["tokens"] == len(build_postings(RESULT))
+    assert stats["shards"] == len(index["shards"])
+    assert not (tmp_path / SEARCH_DIR / "stale.json").exists()
+    shard = json.loads((tmp_path / SEARCH_DIR / f'{index["shards"]["mm"]}.json').read_text(encoding="utf-8"))
+    assert shard == {"mm": {"c": {"1": [0, 2], "2": [0]}}}
+    js = (tmp_path / SEARCH_DIR / f'{index["shards"]["北京"]}.js').read_text(encoding="utf-8")
+    assert js.startswith('(window.__LINUX_EDU_RANK_SEARCH__ = window.__LINUX_EDU_RANK_SEARCH__ || {})["北京"] = ')
@@ -0,0 +1,160 @@
+"""Tests for the ranking query service in serve.py."""
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import run_git
+from main import main
+from serve import (QueryError, RankingIndex, RankingService, make_server, page, page_newest_first,
+                   parse_time, query_values)
+
+UNI_LIST = [
+    {"name": "Foo Univ", "domains": ["foo.edu"]},
+    {"name": "Bar Univ", "domains": ["bar.ac.cn"]},
+]
+
+
+def commit(sha, summary, day, lines=1):
+    return {"commit": sha, "summary": summary, "date": f"2024-01-{day:02d}T12:00:00+08:00",
+            "files": 1, "lines": f"-0/+{lines}"}
+
+
+DATA = [
+    {"id": 1, "rank": 1, "name": "Foo Univ", "domains": ["cs.foo.edu", "foo.edu"], "university": None,
+     "count": 4, "lines": 13, "contributor_count": 2, "authors": [
+         {"email": "a@cs.foo.edu", "name": "A", "count": 3, "commits": [
+             commit("a3", "net: fix leak", 9, 5), commit("a2", "mm: cleanup", 5), commit("a1", "net: add", 1)]},
+         {"email": "b@foo.edu", "name": "B", "count": 1, "commits": [commit("b1", "net: fix typo", 7, 6)]},
+     ]},
+    {"id": 2, "rank": 2, "name": "Bar Univ", "domains": ["bar.ac.cn"], "university": None,
+     "count": 3, "lines": 3, "contributor_count": 1, "authors": [
+         {"email": "c@bar.ac.cn", "name": "C", "count": 3, "commits": [
+             commit("c3", "drm: fix", 8), commit("c2", "net: fix crash", 6), commit("c1", "drm: add", 2)]},
+     ]},
+]
+
+
+@pytest.fixture(name="index")
+def fixture_index():
+    return RankingIndex({"repo": "test"}, json.loads(json.dumps(DATA)))
+
+
+def shas(entries):
+    return [entry.commit.sha for entry in entries]
+
+
+def test_parse_time():
+    assert parse_time("2024-01-01") == parse_time("2024-01-01T00:00:00+00:00") == 1704067200
+    assert parse_time("2024-01-01T00:00:00Z") == 1704067200
+    assert parse_time("2024-01-01T08:00:00+08:00") == 1704067200
+
+
+def test_commit_pages_read_newest_first(index):
+    since = parse_time("2024-01-03")
+    for filters in ({}, {"university": 1}, {"university": 1, "since": since},
+                    {"domain": "foo.edu"}, {"university": 2, "summary": "fix"}):
+        entries, start, end = index.select_range(**filters)
+        for offset, limit in ((0, 2), (1, 2), (2, 50), (9, 1)):
+            values = {"offset": str(offset), "limit": str(limit)}
+            expected = page(index.select(**filters)[::-1], values)
+            assert page_newest_first(entries, values, start, end) == expected
+    # an unfiltered range is answered from the index list itself
+    assert index.select_range(university=1)[0] is index.lists[("university", 1)]
+
+
+def test_select_filters(index):
+    assert shas(index.select()) == ["a1", "c1", "a2", "c2", "b1", "c3", "a3"]
+    assert shas(index.select(university=1, since=parse_time("2024-01-05"))) == ["a2", "b1", "a3"]
+    assert shas(index.select(domain="foo.edu")) == ["b1"]
+    assert shas(index.select(email="a@cs.foo.edu", until=parse_time("2024-01-05T12:00:00+08:00"))) == ["a1"]
+    assert shas(index.select(summary="NET fix")) == ["c2", "b1", "a3"]
+    # a university filter with fewer commits than the word postings checks each summary
+    assert shas(index.select(university=2, summary="fix")) == ["c2", "c3"]
+    assert shas(index.select(email="c@bar.ac.cn", university=1)) == []
+    with pytest.raises(QueryError):
+        index.select(summary="a")
+
+
+def test_rankings_over_a_date_range(index):
+    assert index.university_rows() is index.universities
+    rows = index.university_rows(since=parse_time("2024-01-06"))
+    assert [(row["id"], row["rank"], row["count"], row["lines"], row["contributor_count"]) for row in rows] == [
+        (1, 1, 2, 11, 2), (2, 1, 2, 2, 1)]
+    rows = index.university_rows(summary="drm")
+    assert [(row["id"], row["rank"], row["count"]) for row in rows] == [(2, 1, 2)]
+
+    authors = index.author_rows(university=1, since=parse_time("2024-01-04"))
+    assert [(row["email"], row["count"], row["lines"], row["last"].sha) for row in authors] == [
+        ("a@cs.foo.edu", 2, 6, "a3"), ("b@foo.edu", 1, 6, "b1")]
+    # prefix sums and the summary scan agree
+    assert [row["email"] for row in index.author_rows(summary="net")] == [
+        "a@cs.foo.edu", "b@foo.edu", "c@bar.ac.cn"]
+    assert index.author_rows() is index.author_rows()
+    assert index.author_rows(domain="bar.ac.cn", university=1) == []
+
+
+def test_query_values():
+    assert query_values("limit=5&limit=7&email=", ("limit", "email")) == {"limit": "7", "email": ""}
+    with pytest.raises(QueryError):
+        query_values("bogus=1", ("limit",))
+
+
+def get(port, path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}") as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_service_answers_and_reloads(sample_repo, tmp_path, monkeypatch):
+    uni_file = tmp_path / "unis.json"
+    uni_file.write_text(json.dumps(UNI_LIST), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    args = ["--path", str(sample_repo), "--university-list", str(uni_file), "--legacy-result"]
+    main(args)
+
+    service = RankingService(str(tmp_path))
+    assert service.reload() and not service.reload()
+    legacy = RankingService(result_file=str(tmp_path / "result.json"))
+    legacy.reload()
+    assert legacy.index.universities == service.index.universities
+
+    server = make_server(service, port=0)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        status, body = get(port, "/api/universities?limit=1")
+        assert status == 200 and body["total"] == 2 and body["items"][0]["name"] == "Foo Univ"
+        status, body = get(port, "/api/authors?domain=cs.foo.edu")
+        assert [(row["email"], row["count"]) for row in body["items"]] == [("alice@cs.foo.edu", 2)]
+        status, body = get(port, "/api/commits?university=2&since=2000-01-01")
+        assert body["total"] == 1 and body["items"][0]["email"] == "bob@bar.ac.cn"
+        assert get(port, "/api/commits?since=yesterday")[0] == 400
+        assert get(port, "/api/authors?limit=0")[0] == 400
+        assert get(port, "/nothing")[0] == 404
+
+        run_git(sample_repo, "-c", "user.name=Bob", "-c", "user.email=bob@bar.ac.cn",
+                "commit", "-q", "--allow-empty", "-m", "net: another")
+        main(args)
+        stop = threading.Event()
+        watcher = threading.Thread(target=service.watch, args=(stop, 0.01))
+        watcher.start()
+        while service.reloads == 0:
+            stop.wait(0.01)
+        stop.set()
+        watcher.join()
+        status, body = get(port, "/api/universities?summary=another")
+        assert body["items"][0]["name"] == "Bar Univ" and body["items"][0]["count"] == 1
+        assert get(port, "/api/meta")[1]["reloads"] == 1
+
+        (tmp_path / "summary.json").write_text("{broken", encoding="utf-8")
+        with pytest.raises(ValueError):
+            service.reload()
+        assert get(port, "/api/meta")[1]["commits"] == 4
+    finally:
+        server.shutdown()
+        server.server_close()
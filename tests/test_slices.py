@@ -0,0 +1,93 @@
+"""Tests for year/month/release slices in slices.py."""
+import json
+import subprocess
+
+from conftest import run_git
+from main import main
+from model import Author, Commit, parse_date
+from slices import bucket_commits, map_releases, month_range, monthly_trends, ordered_keys
+
+UNI_LIST = [
+    {"name": "Foo Univ", "domains": ["foo.edu"]},
+    {"name": "Bar Univ", "domains": ["bar.ac.cn"]},
+]
+
+
+def commit(sha, date, deletions, insertions):
+    return Commit(sha, sha, *parse_date(date), 1, insertions, deletions)
+
+
+def test_bucket_commits_splits_by_year_month_and_release():
+    authors_map = {
+        "foo.edu": {
+            "a@foo.edu": Author("a@foo.edu", "A", [commit("c1", "2024-12-31T23:00:00+08:00", 1, 2),
+                                                   commit("c2", "2025-01-02T00:00:00+08:00", 0, 5)]),
+        },
+        "bar.ac.cn": {"b@bar.ac.cn": Author("b@bar.ac.cn", "B",
+                                            [commit("c3", "2025-01-05T00:00:00+00:00", 4, 0)])},
+    }
+    buckets = bucket_commits(authors_map, {"c1": "v6.12"})
+
+    assert set(buckets["year"]) == {"2024", "2025"}
+    patches_map, lines_map, authors = buckets["month"]["2025-01"]
+    assert patches_map == {"foo.edu": 1, "bar.ac.cn": 1}
+    assert lines_map == {"foo.edu": 5, "bar.ac.cn": 4}
+    assert authors["foo.edu"]["a@foo.edu"].count == 1
+    assert buckets["release"]["v6.12"][0] == {"foo.edu": 1}
+    assert buckets["release"]["unreleased"][0] == {"foo.edu": 1, "bar.ac.cn": 1}
+    assert ordered_keys("release", ["unreleased", "v6.12"], {"c1": "v6.12"}) == [
+        "v6.12", "unreleased"
+    ]
+
+
+def test_monthly_trends():
+    assert month_range("2024-11", "2025-02") == ["2024-11", "2024-12", "2025-01", "2025-02"]
+    ranked = [
+        {"id": 1, "authors": [Author("a@x", "A", [commit("c1", "2024-11-01T00:00:00+00:00", 0, 1),
+                                                  commit("c2", "2025-01-01T00:00:00+00:00", 0, 1)])]},
+        {"id": 2, "authors": [Author("b@x", "B", [commit("c3", "2024-12-01T00:00:00+00:00", 0, 1)])]},
+    ]
+    assert monthly_trends(ranked) == {
+        "months": ["2024-11", "2024-12", "2025-01"],
+        "data": {1: {"start": 0, "counts": [1, 0, 1]}, 2: {"start": 1, "counts": [1]}},
+    }
+
+
+def test_map_releases_uses_release_ranges(sample_repo):
+    shas = subprocess.run(["git", "-C", str(sample_repo), "rev-list", "--first-parent", "master"],
+                          check=True, capture_output=True, text=True).stdout.split()
+    # shas: empty commit, merge, rename, first
+    run_git(sample_repo, "tag", "v1.0", shas[3])
+    run_git(sample_repo, "tag", "v1.1-rc1", shas[2])
+    run_git(sample_repo, "tag", "v1.1", shas[1])
+
+    releases = map_releases(sample_repo, shas)
+    assert releases[shas[3]] == "v1.0"
+    assert releases[shas[2]] == "v1.1" and releases[shas[1]] == "v1.1"
+    assert shas[0] not in releases
+
+
+def test_main_writes_slices(sample_repo, tmp_path, monkeypatch):
+    uni_file = tmp_path / "unis.json"
+    uni_file.write_text(json.dumps(UNI_LIST), encoding="utf-8")
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    monkeypatch.chdir(out_dir)
+    run_git(sample_repo, "tag", "v1.0", "master~1")
+
+    main(["--path", str(sample_repo), "--university-list", str(uni_file), "--slices"])
+
+    index = json.loads((out_dir / "slices" / "index.json").read_text(encoding="utf-8"))
+    assert index == {"year": ["2024"], "month": ["2024-01", "2024-02", "2024-04"],
+                     "release": ["v1.0", "unreleased"]}
+    summary = json.loads((out_dir / "summary.json").read_text(encoding="utf-8"))
+    totals = {item["id"]: item["count"] for item in summary["data"]}
+    for kind, keys in index.items():
+        counted = {}
+        for key in keys:
+            ranking = json.loads((out_dir / "slices" / kind / f"{key}.json").read_text(encoding="utf-8"))
+            for item in ranking["data"]:
+                counted[item["id"]] = counted.get(item["id"], 0) + item["count"]
+        assert counted == totals
+    trends = json.loads((out_dir / "slices" / "trends.json").read_text(encoding="utf-8"))
+    assert trends["months"] == ["2024-01", "2024-02", "2024-03", "2024-04"]
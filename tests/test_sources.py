@@ -0,0 +1,116 @@
+"""Tests for multi-source scanning and de-duplication in sources.py."""
+import json
+import subprocess
+from argparse import ArgumentTypeError
+
+import pytest
+
+from conftest import run_git
+from domain_index import build_domain_index
+from main import main
+from sources import parse_source, resolve_sources, scan_sources, sources_meta
+from stages import git_process_count
+
+UNI_LIST = [
+    {"name": "Foo Univ", "domains": ["foo.edu"]},
+    {"name": "Bar Univ", "domains": ["bar.ac.cn"]},
+]
+
+
+def git_output(repo_path, *args):
+    return subprocess.run(["git", "-C", str(repo_path), *args], check=True,
+                          capture_output=True, text=True).stdout.strip()
+
+
+@pytest.fixture
+def stable_clone(sample_repo, tmp_path):
+    """A clone whose stable branch backports master's second commit and adds one."""
+    clone = tmp_path / "stable"
+    run_git(tmp_path, "clone", "-q", str(sample_repo), str(clone))
+    run_git(clone, "config", "user.name", "Dev")
+    run_git(clone, "config", "user.email", "dev@example.com")
+    first = git_output(clone, "rev-list", "--max-parents=0", "HEAD")
+    backport = git_output(clone, "log", "--format=%H", "--author=bob", "master")
+    run_git(clone, "checkout", "-q", "-b", "stable", first)
+    run_git(clone, "cherry-pick", backport)
+    (clone / "fix.txt").write_text("fix\n", encoding="utf-8")
+    run_git(clone, "add", "fix.txt")
+    run_git(clone, "-c", "user.email=dan@foo.edu", "commit", "-q", "-m", "stable fix")
+    return clone
+
+
+def test_parse_source():
+    assert parse_source("/src/linux:master:Mainline") == {
+        "path": "/src/linux", "branch": "master", "label": "Mainline"
+    }
+    assert parse_source("next:master")["label"] == "master"
+    with pytest.raises(ArgumentTypeError):
+        parse_source("/src/linux")
+
+
+def test_scan_sources_counts_shared_commits_once(sample_repo, stable_clone):
+    index = build_domain_index(UNI_LIST)
+    sources = resolve_sources([
+        parse_source(f"{sample_repo}:master:Mainline"),
+        parse_source(f"{stable_clone}:stable:Stable"),
+    ])
+    # the clone contains master's head, so its shared history is not rescanned
+    assert sources[1]["exclude"] == [sources[0]["commit"]]
+    assert [s["label"] for s in sources_meta(sources)["sources"]] == ["Mainline", "Stable"]
+
+    git_before = git_process_count()
+    results, scanned, commit_paths, duplicates = scan_sources(sources, index)
+    # the `git log` of every source worker is counted here
+    assert git_process_count() - git_before == 2
+    assert scanned == 5 + 2
+    assert duplicates == 0
+    assert results["patches"] == {"cs.foo.edu": 2, "bar.ac.cn": 2, "foo.edu": 1}
+    stable_head = git_output(stable_clone, "rev-parse", "stable")
+    assert commit_paths[stable_head] == str(stable_clone)
+
+    # the cherry-picked backport has the same patch id as the original
+    results, _, commit_paths, duplicates = scan_sources(sources, index, dedupe_patch_id=True)
+    assert duplicates == 1
+    assert results["patches"] == {"cs.foo.edu": 2, "bar.ac.cn": 1, "foo.edu": 1}
+    assert len(commit_paths) == 4
+
+
+def test_same_diff_within_a_source_is_counted(sample_repo, stable_clone):
+    # a patch is landed, reverted and landed again on the stable branch
+    for message in ("land", "reland"):
+        (stable_clone / "feature.txt").write_text("feature\n", encoding="utf-8")
+        run_git(stable_clone, "add", "feature.txt")
+        run_git(stable_clone, "-c", "user.email=dan@foo.edu", "commit", "-q", "-m", message)
+        if message == "land":
+            run_git(stable_clone, "revert", "--no-edit", "HEAD")
+    sources = resolve_sources([
+        parse_source(f"{sample_repo}:master:Mainline"),
+        parse_source(f"{stable_clone}:stable:Stable"),
+    ])
+
+    results, _, _, duplicates = scan_sources(sources, build_domain_index(UNI_LIST),
+                                             dedupe_patch_id=True)
+    # only the backport repeats a patch of another source
+    assert duplicates == 1
+    assert results["patches"]["foo.edu"] == 3
+
+
+def test_main_with_sources(sample_repo, stable_clone, tmp_path, monkeypatch):
+    uni_file = tmp_path / "unis.json"
+    uni_file.write_text(json.dumps(UNI_LIST), encoding="utf-8")
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    monkeypatch.chdir(out_dir)
+
+    main(["--university-list", str(uni_file), "--dedupe-patch-id",
+          "--source", f"{sample_repo}:master:Mainline",
+          "--source", f"{stable_clone}:stable:Stable"])
+
+    summary = json.loads((out_dir / "summary.json").read_text(encoding="utf-8"))
+    assert summary["meta"]["repo"] == "Mainline + Stable"
+    assert len(summary["meta"]["sources"]) == 2
+    foo = next(item for item in summary["data"] if item["name"] == "Foo Univ")
+    assert foo["count"] == 3
+    page = (out_dir / "detail" / "en" / f'{foo["id"]}.html').read_text(encoding="utf-8")
+    assert "stable fix" in page and "empty commit" in page
+    assert not (out_dir / "state.json").exists()
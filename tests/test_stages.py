@@ -0,0 +1,90 @@
+"""Tests for pipeline stage timing in stages.py and main()."""
+import json
+import subprocess
+
+from domain_index import build_domain_index
+from git_log import count_commits, git_command, open_repo
+from main import main
+from scan import scan_sharded
+from stages import StageTimer, format_metrics, git_process_count
+
+UNI_LIST = [
+    {"name": "Foo Univ", "domains": ["foo.edu"]},
+    {"name": "Bar Univ", "domains": ["bar.ac.cn"]},
+]
+
+
+def test_stage_timer_accumulates_stages_in_order():
+    timer = StageTimer()
+    timer.begin("load")
+    timer.begin("scan")
+    timer.end()
+    timer.begin("load")
+    timer.end()
+    timer.end()
+    assert list(timer.seconds) == ["load", "scan"]
+    assert all(seconds >= 0 for seconds in timer.seconds.values())
+
+
+def test_stage_metrics_count_items_and_git_processes(sample_repo):
+    timer = StageTimer()
+    timer.begin("version")
+    count_commits(sample_repo, "HEAD")
+    timer.add_items(3)
+    timer.begin("gitpython")
+    open_repo(sample_repo).git.rev_parse("HEAD")
+    timer.begin("idle")
+    # neither a command that is only built nor a direct launch is counted
+    git_command(sample_repo, "--version")
+    subprocess.run(["git", "--version"], capture_output=True, check=True)
+    timer.end()
+
+    metrics = timer.metrics()
+    assert metrics["stages"]["version"]["git_processes"] == 1
+    assert metrics["stages"]["version"]["items"] == 3
+    assert metrics["stages"]["version"]["items_per_second"] > 0
+    assert metrics["stages"]["gitpython"]["git_processes"] == 1
+    assert metrics["stages"]["idle"]["git_processes"] == 0
+    assert metrics["stages"]["idle"]["items_per_second"] is None
+    assert metrics["total"]["git_processes"] == 2
+    assert metrics["total"]["lifetime_peak_rss"] >= metrics["stages"]["version"]["lifetime_peak_rss"]
+    lines = format_metrics(metrics)
+    assert lines[1].startswith("version") and lines[-1].startswith("total")
+
+
+def test_sharded_scan_counts_worker_git_processes(sample_repo):
+    before = git_process_count()
+    _, scanned = scan_sharded(str(sample_repo), "master", 5, 2, build_domain_index(UNI_LIST))
+    assert scanned == 5
+    # every shard runs its own `git log`
+    assert git_process_count() - before == 2
+
+
+def test_main_reports_stage_timings(sample_repo, tmp_path, monkeypatch):
+    uni_file = tmp_path / "unis.json"
+    uni_file.write_text(json.dumps(UNI_LIST), encoding="utf-8")
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    monkeypatch.chdir(out_dir)
+
+    stats = main(["--path", str(sample_repo), "--university-list", str(uni_file)])
+
+    assert stats["scanned"] > 0
+    assert list(stats["stages"]) == [
+        "university_list", "enumerate", "scan", "state", "process_results",
+        "write_results", "fetch_patches", "detail_pages",
+    ]
+    assert (out_dir / "summary.json").exists() and (out_dir / "detail" / "en").is_dir()
+    assert not (out_dir / "metrics.json").exists()
+
+    main(["--path", str(sample_repo), "--university-list", str(uni_file),
+          "--profile", "--profile-memory", "--profile-scan", "scan.prof"])
+
+    metrics = json.loads((out_dir / "metrics.json").read_text(encoding="utf-8"))
+    assert metrics["stages"]["scan"]["items"] == stats["scanned"]
+    # every detail page is unchanged since the first run, so no patch is fetched
+    assert metrics["stages"]["fetch_patches"]["git_processes"] == 0
+    assert metrics["stages"]["detail_pages"]["items"] == 0
+    assert metrics["total"]["git_processes"] >= 3
+    assert "traced_peak" in metrics["stages"]["scan"] and metrics["top_allocations"]
+    assert (out_dir / "scan.prof").exists()
@@ -0,0 +1,66 @@
+"""Tests for incremental state handling in state.py."""
+import git
+
+from model import Author
+from state import (
+    incremental_base,
+    load_state,
+    merge_authors,
+    merge_counts,
+    merge_shas,
+    save_state,
+    university_list_digest,
+)
+from conftest import run_git
+
+
+def test_save_and_load_state(tmp_path):
+    path = tmp_path / "state.json"
+    assert load_state(path) is None
+
+    save_state({"commit": "abc", "patches": {"foo.edu": 1}}, path)
+    state = load_state(path)
+    assert state["commit"] == "abc" and state["patches"] == {"foo.edu": 1}
+
+    path.write_text("{broken", encoding="utf-8")
+    assert load_state(path) is None
+
+
+def test_university_list_digest():
+    uni_list = [{"name": "Foo Univ", "domains": ["foo.edu"]}]
+    assert university_list_digest(uni_list) == university_list_digest(list(uni_list))
+    assert university_list_digest(uni_list) != university_list_digest(
+        [{"name": "Foo Univ", "domains": ["foo.edu", "cs.foo.edu"]}]
+    )
+
+
+def test_merge_keeps_newest_first():
+    assert merge_counts({"b": 1, "a": 2}, {"a": 3, "c": 4}) == {"b": 1, "a": 5, "c": 4}
+    assert list(merge_counts({"b": 1, "a": 2}, {"a": 3, "c": 4})) == ["b", "a", "c"]
+
+    merged = merge_authors(
+        {"a": {"x@a": Author("x@a", "New X", ["c3"])}},
+        {"a": {"y@a": Author("y@a", "Y", ["c2"]), "x@a": Author("x@a", "Old X", ["c1"])},
+         "b": {"z@b": Author("z@b", "Z", ["c0"])}},
+    )
+    assert merged["a"] == {"x@a": Author("x@a", "New X", ["c3", "c1"]),
+                           "y@a": Author("y@a", "Y", ["c2"])}
+    assert list(merged) == ["a", "b"]
+
+    assert merge_shas({"a": ["c3"]}, {"a": ["c1"], "b": ["c0"]}) == {"a": ["c3", "c1"], "b": ["c0"]}
+
+
+def test_incremental_base_fallbacks(sample_repo):
+    repo = git.Repo(sample_repo)
+    head = repo.commit("master").hexsha
+    state = {"branch": "master", "commit": head, "universities": "d"}
+
+    assert incremental_base(None, repo, "master", "d") is None
+    assert incremental_base(state, repo, "master", "d") is state
+    assert incremental_base(state, repo, "side", "d") is None
+    assert incremental_base(state, repo, "master", "other") is None
+    assert incremental_base({**state, "commit": "0" * 40}, repo, "master", "d") is None
+
+    # rewrite history so the saved head is no longer an ancestor
+    run_git(sample_repo, "commit", "-q", "--amend", "--allow-empty", "-m", "rewritten")
+    assert incremental_base(state, repo, "master", "d") is None
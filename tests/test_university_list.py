@@ -0,0 +1,109 @@
+"""Tests for university list loading and caching in university_list.py."""
+import json
+
+import pytest
+import requests
+
+import university_list
+from domain_index import lookup_university
+from state import university_list_digest
+
+UNI_LIST = [{"name": "Foo Univ", "domains": ["foo.edu"]}]
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}")
+
+
+def test_load_university_list_from_file(tmp_path):
+    path = tmp_path / "unis.json"
+    path.write_text(json.dumps(UNI_LIST), encoding="utf-8")
+
+    uni_list, index, digest = university_list.load_university_list(
+        str(path), cache_dir=str(tmp_path / "cache")
+    )
+
+    assert uni_list == UNI_LIST
+    assert lookup_university("cs.foo.edu", index)["name"] == "Foo Univ"
+    assert digest == university_list_digest(UNI_LIST)
+
+
+def test_local_file_reuses_compiled_form(tmp_path, monkeypatch):
+    path = tmp_path / "unis.json"
+    path.write_text(json.dumps(UNI_LIST), encoding="utf-8")
+    cache_dir = str(tmp_path / "cache")
+    compiled = []
+    compile_list = university_list.compile_university_list
+    monkeypatch.setattr(university_list, "compile_university_list",
+                        lambda uni_list: compiled.append(uni_list) or compile_list(uni_list))
+
+    university_list.load_university_list(str(path), cache_dir=cache_dir)
+    university_list.load_university_list(str(path), cache_dir=cache_dir)
+    # a new mtime with the same content is recognized by its digest
+    path.write_text(json.dumps(UNI_LIST), encoding="utf-8")
+    university_list.load_university_list(str(path), cache_dir=cache_dir)
+    assert len(compiled) == 1
+
+    changed = UNI_LIST + [{"name": "Bar Univ", "domains": ["bar.ac.cn"]}]
+    path.write_text(json.dumps(changed), encoding="utf-8")
+    uni_list, _, digest = university_list.load_university_list(str(path), cache_dir=cache_dir)
+    assert uni_list == changed and digest == university_list_digest(changed)
+    assert len(compiled) == 2
+
+
+def test_missing_json_file_raises(tmp_path, monkeypatch):
+    def fake_get(url, headers=None, timeout=None):
+        raise AssertionError("no fetch for a missing file")
+
+    monkeypatch.setattr(university_list.requests, "get", fake_get)
+    missing = tmp_path / "unis.jsn.json"
+    with pytest.raises(FileNotFoundError, match="unis.jsn.json"):
+        university_list.load_university_list(str(missing))
+    assert not missing.exists()
+
+
+def test_cached_fetch_is_conditional_and_survives_failures(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    calls = []
+    responses = [
+        FakeResponse(200, UNI_LIST, {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024"}),
+        FakeResponse(304),
+        requests.ConnectionError("offline"),
+    ]
+
+    def fake_get(url, headers=None, timeout=None):
+        calls.append(headers or {})
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(university_list.requests, "get", fake_get)
+
+    first = university_list.load_university_list(cache_dir)
+    assert first[0] == UNI_LIST and calls[0] == {}
+
+    # not modified: the conditional headers are sent and the cache is used
+    second = university_list.load_university_list(cache_dir)
+    assert calls[1] == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024"}
+    assert second[0] == UNI_LIST and second[2] == first[2]
+
+    # network failure falls back to the cached copy
+    third = university_list.load_university_list(cache_dir)
+    assert third[0] == UNI_LIST
+
+
+def test_fetch_failure_without_cache_raises(tmp_path, monkeypatch):
+    def fake_get(url, headers=None, timeout=None):
+        raise requests.ConnectionError("offline")
+
+    monkeypatch.setattr(university_list.requests, "get", fake_get)
+    with pytest.raises(requests.ConnectionError):
+        university_list.load_university_list(str(tmp_path / "cache"))